@@ -58,6 +58,7 @@ import urllib
 import urlparse
 import xml.sax
 import copy
+from binascii import crc32
 
 import auth
 import auth_handler
@@ -385,9 +386,12 @@ class HTTPRequest(object):
 
 class HTTPResponse(httplib.HTTPResponse):
 
+    READ_CHUNK_SIZE = 64 * 1024
+
     def __init__(self, *args, **kwargs):
         httplib.HTTPResponse.__init__(self, *args, **kwargs)
         self._cached_response = ''
+        self._crc32 = None
 
     def read(self, amt=None):
         """Read the response.
@@ -411,6 +415,34 @@ class HTTPResponse(httplib.HTTPResponse):
         else:
             return httplib.HTTPResponse.read(self, amt)
 
+    def read_crc32(self):
+        """Read the response and compute its crc32 checksum.
+
+        The body is read and cached exactly as ``read()`` does, but the
+        checksum is updated as each chunk arrives from the socket rather
+        than by scanning the whole body again afterwards.
+
+        :rtype: tuple
+        :return: The response body and its (unsigned) crc32 checksum.
+
+        """
+        if self._crc32 is None:
+            if self._cached_response:
+                checksum = crc32(self._cached_response)
+            else:
+                chunks = []
+                checksum = 0
+                while True:
+                    chunk = httplib.HTTPResponse.read(self,
+                                                      self.READ_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    checksum = crc32(chunk, checksum)
+                    chunks.append(chunk)
+                self._cached_response = ''.join(chunks)
+            self._crc32 = checksum & 0xffffffff
+        return self._cached_response, self._crc32
+
 
 class AWSAuthConnection(object):
     def __init__(self, host, aws_access_key_id=None,
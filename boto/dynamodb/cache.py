@@ -0,0 +1,249 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+"""
+An optional in-process read-through cache for items fetched with
+:meth:`boto.dynamodb.layer2.Layer2.get_item`.
+"""
+import threading
+import time
+
+from boto.utils import LRUCache
+from boto.dynamodb import exceptions as dynamodb_exceptions
+
+
+_NOT_FOUND = object()
+
+
+class _PendingFetch(object):
+    """
+    A GetItem request that is in flight.  Other threads asking for
+    the same key wait on ``event`` and share its outcome.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.response = None
+        self.error = None
+        self.invalidated = False
+
+
+class ItemCache(object):
+    """
+    A read-through cache of the items of a single table, with LRU
+    eviction and a time to live for each entry.
+
+    Entries are keyed by the hash and range key of the item, and
+    within an item by the ``attributes_to_get`` that were requested,
+    so that a write to an item invalidates every projection of it.
+    Concurrent misses for the same key are coalesced into a single
+    GetItem request.  Consistent reads always go to Amazon DynamoDB,
+    but their result is used to refresh the cache.
+
+    :ivar hits: The number of reads answered from the cache.
+    :ivar misses: The number of reads that required a GetItem request.
+    :ivar negative_hits: The number of hits on a cached missing item.
+        These are also counted in ``hits``.
+    :ivar coalesced: The number of misses that waited for a request
+        issued by another thread rather than issuing their own.
+    :ivar invalidations: The number of items invalidated by writes.
+    """
+
+    def __init__(self, max_items=1000, ttl=60, negative_ttl=None):
+        """
+        :type max_items: int
+        :param max_items: The maximum number of items held in the
+            cache.  The least recently used item is evicted first.
+
+        :type ttl: int|float
+        :param ttl: The number of seconds an item stays in the cache.
+
+        :type negative_ttl: int|float
+        :param negative_ttl: The number of seconds the absence of an
+            item is remembered.  The default of None disables
+            negative caching.
+        """
+        self.max_items = max_items
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.coalesced = 0
+        self.invalidations = 0
+        self._entries = LRUCache(max_items)
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'ItemCache(%d items, %d hits, %d misses)' % (
+            len(self._entries), self.hits, self.misses)
+
+    @property
+    def hit_ratio(self):
+        """The fraction of reads answered from the cache."""
+        total = self.hits + self.misses
+        if not total:
+            return 0.0
+        return float(self.hits) / total
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, item_key, projection):
+        if item_key not in self._entries:
+            return None
+        projections = self._entries[item_key]
+        entry = projections.get(projection)
+        if entry is None:
+            return None
+        expires, attrs = entry
+        if expires < time.time():
+            del projections[projection]
+            if not projections:
+                del self._entries[item_key]
+            return None
+        return attrs
+
+    def _store(self, item_key, projection, attrs):
+        if attrs is _NOT_FOUND:
+            if self.negative_ttl is None:
+                return
+            expires = time.time() + self.negative_ttl
+        else:
+            expires = time.time() + self.ttl
+        if item_key in self._entries:
+            projections = self._entries[item_key]
+        else:
+            projections = {}
+            self._entries[item_key] = projections
+        projections[projection] = (expires, attrs)
+
+    def _copy(self, attrs):
+        if attrs is _NOT_FOUND:
+            raise dynamodb_exceptions.DynamoDBKeyNotFoundError(
+                "Key does not exist.")
+        d = {}
+        for name, value in attrs.iteritems():
+            if isinstance(value, set):
+                value = set(value)
+            d[name] = value
+        return {'Item': d}
+
+    def get(self, hash_key, range_key, attributes_to_get, consistent_read,
+            fetch):
+        """
+        Return the GetItem response for the item, either from the
+        cache or by calling ``fetch``.  On a cache hit the response
+        only contains a copy of the ``Item``.
+
+        :type fetch: callable
+        :param fetch: A function of no arguments that issues the
+            GetItem request and returns its (decoded) response, or
+            raises ``DynamoDBKeyNotFoundError``.
+        """
+        item_key = (hash_key, range_key)
+        projection = None
+        if attributes_to_get:
+            projection = tuple(sorted(attributes_to_get))
+        pending_key = (item_key, projection)
+        self._lock.acquire()
+        try:
+            if not consistent_read:
+                attrs = self._lookup(item_key, projection)
+                if attrs is not None:
+                    self.hits += 1
+                    if attrs is _NOT_FOUND:
+                        self.negative_hits += 1
+                    return self._copy(attrs)
+            self.misses += 1
+            pending = self._pending.get(pending_key)
+            if pending is not None and not consistent_read:
+                self.coalesced += 1
+                owner = False
+            else:
+                pending = _PendingFetch()
+                self._pending[pending_key] = pending
+                owner = True
+        finally:
+            self._lock.release()
+        if not owner:
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            return self._copy(pending.response['Item'])
+        try:
+            try:
+                pending.response = fetch()
+            except dynamodb_exceptions.DynamoDBKeyNotFoundError, e:
+                pending.error = e
+                attrs = _NOT_FOUND
+            except Exception, e:
+                pending.error = e
+                raise
+            else:
+                attrs = pending.response['Item']
+            self._lock.acquire()
+            try:
+                if not pending.invalidated:
+                    self._store(item_key, projection, attrs)
+            finally:
+                self._lock.release()
+        finally:
+            self._lock.acquire()
+            try:
+                if self._pending.get(pending_key) is pending:
+                    del self._pending[pending_key]
+            finally:
+                self._lock.release()
+            pending.event.set()
+        if pending.error is not None:
+            raise pending.error
+        response = dict(pending.response)
+        response.update(self._copy(attrs))
+        return response
+
+    def invalidate(self, hash_key, range_key=None):
+        """
+        Drop every cached projection of the item and make sure that
+        reads already in flight for it do not repopulate the cache.
+        """
+        item_key = (hash_key, range_key)
+        self._lock.acquire()
+        try:
+            if item_key in self._entries:
+                del self._entries[item_key]
+                self.invalidations += 1
+            for (pending_item_key, _), pending in self._pending.items():
+                if pending_item_key == item_key:
+                    pending.invalidated = True
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        """Drop every entry from the cache."""
+        self._lock.acquire()
+        try:
+            self._entries = LRUCache(self.max_items)
+            for pending in self._pending.values():
+                pending.invalidated = True
+        finally:
+            self._lock.release()
@@ -0,0 +1,115 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+from boto.utils import TokenBucket
+
+
+class ThroughputGovernor(object):
+    """
+    Paces the requests made through a
+    :class:`boto.dynamodb.table.Table` so that they use no more than a
+    fraction of the provisioned throughput of the table.
+
+    Each request waits until the read or write bucket is out of debt
+    and then the ConsumedCapacityUnits reported in the response are
+    taken from the bucket, so the pace follows the actual cost of the
+    requests rather than an estimate.  The buckets are refilled at
+    ``read_fraction * table.read_units`` and
+    ``write_fraction * table.write_units`` units per second, read from
+    the table on every request so that a refresh of the table or a
+    call to ``update_throughput`` is picked up.
+
+    A governor only applies to the Table object it is attached to, so
+    a background job can use its own Table object limited to a part
+    of the capacity while the rest of the application keeps using an
+    unrestricted one.
+
+    :ivar consumed_read_units: The read units consumed so far.
+    :ivar consumed_write_units: The write units consumed so far.
+    """
+
+    def __init__(self, table, read_fraction=1.0, write_fraction=1.0,
+                 burst_seconds=1):
+        """
+        :type table: :class:`boto.dynamodb.table.Table`
+        :param table: The table whose provisioned throughput is used.
+
+        :type read_fraction: float
+        :param read_fraction: The fraction of ReadCapacityUnits that
+            may be used, e.g. 0.25 for a quarter of the capacity.
+
+        :type write_fraction: float
+        :param write_fraction: The fraction of WriteCapacityUnits that
+            may be used.
+
+        :type burst_seconds: int|float
+        :param burst_seconds: The number of seconds worth of unused
+            capacity that may be spent at once.
+        """
+        self.table = table
+        self.read_fraction = read_fraction
+        self.write_fraction = write_fraction
+        self.burst_seconds = burst_seconds
+        self.consumed_read_units = 0
+        self.consumed_write_units = 0
+        self._read_bucket = TokenBucket(self.read_rate,
+                                        self.read_rate * burst_seconds)
+        self._write_bucket = TokenBucket(self.write_rate,
+                                         self.write_rate * burst_seconds)
+
+    def __repr__(self):
+        return 'ThroughputGovernor(%s, read=%s/s, write=%s/s)' % (
+            self.table.name, self.read_rate, self.write_rate)
+
+    @property
+    def read_rate(self):
+        """The number of read units per second allowed."""
+        return self.table.read_units * self.read_fraction
+
+    @property
+    def write_rate(self):
+        """The number of write units per second allowed."""
+        return self.table.write_units * self.write_fraction
+
+    def _sync(self, bucket, rate):
+        if bucket.rate != rate:
+            bucket.rate = rate
+            bucket.capacity = rate * self.burst_seconds
+
+    def wait_for_read(self):
+        """Block until a read request may be issued."""
+        self._sync(self._read_bucket, self.read_rate)
+        self._read_bucket.acquire(0)
+
+    def wait_for_write(self):
+        """Block until a write request may be issued."""
+        self._sync(self._write_bucket, self.write_rate)
+        self._write_bucket.acquire(0)
+
+    def consume_read(self, units):
+        """Record the ConsumedCapacityUnits of a read request."""
+        self.consumed_read_units += units
+        self._read_bucket.consume(units)
+
+    def consume_write(self, units):
+        """Record the ConsumedCapacityUnits of a write request."""
+        self.consumed_write_units += units
+        self._write_bucket.consume(units)
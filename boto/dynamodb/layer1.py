@@ -21,7 +21,6 @@
 # IN THE SOFTWARE.
 #
 import time
-from binascii import crc32
 
 import boto
 from boto.connection import AWSAuthConnection
@@ -125,14 +124,22 @@ class Layer1(AWSAuthConnection):
         boto.log.debug('RequestId: %s' % request_id)
         boto.perflog.debug('%s: id=%s time=%sms',
                            headers['X-Amz-Target'], request_id, int(elapsed))
+        # The body has already been read, and cached, by _retry_handler.
         response_body = response.read()
         boto.log.debug(response_body)
         return json.loads(response_body, object_hook=object_hook)
 
     def _retry_handler(self, response, i, next_sleep):
         status = None
-        if response.status == 400:
+        # Read the body only once, computing its checksum as it is
+        # streamed in when it has to be validated.
+        expected_crc32 = response.getheader('x-amz-crc32')
+        actual_crc32 = None
+        if self._validate_checksums and expected_crc32 is not None:
+            response_body, actual_crc32 = response.read_crc32()
+        else:
             response_body = response.read()
+        if response.status == 400:
             boto.log.debug(response_body)
             data = json.loads(response_body)
             if self.ThruputError in data.get('__type'):
@@ -154,11 +161,9 @@ class Layer1(AWSAuthConnection):
             else:
                 raise self.ResponseError(response.status, response.reason,
                                          data)
-        expected_crc32 = response.getheader('x-amz-crc32')
-        if self._validate_checksums and expected_crc32 is not None:
-            boto.log.debug('Validating crc32 checksum for body: %s',
-                           response.read())
-            actual_crc32 = crc32(response.read()) & 0xffffffff
+        if actual_crc32 is not None:
+            boto.log.debug('Validating crc32 checksum %s for body',
+                           actual_crc32)
             expected_crc32 = int(expected_crc32)
             if actual_crc32 != expected_crc32:
                 msg = ("The calculated checksum %s did not match the expected "
@@ -27,8 +27,9 @@ from boto.dynamodb.table import Table
 from boto.dynamodb.schema import Schema
 from boto.dynamodb.item import Item
 from boto.dynamodb.batch import BatchList, BatchWriteList
+from boto.dynamodb.cache import ItemCache
 from boto.dynamodb.types import get_dynamodb_type, dynamize_value, \
-        convert_num, convert_binary
+        convert_num, convert_binary, Dynamizer
 
 
 def item_object_hook(dct):
@@ -36,6 +37,9 @@ def item_object_hook(dct):
     A custom object hook for use when decoding JSON item bodys.
     This hook will transform Amazon DynamoDB JSON responses to something
     that maps directly to native Python types.
+
+    Layer2 no longer uses this hook, it decodes the items in its
+    responses with a :class:`boto.dynamodb.types.Dynamizer` instead.
     """
     if len(dct.keys()) > 1:
         return dct
@@ -69,18 +73,24 @@ def table_generator(tgen):
         if response is True:
             pass
         elif 'LastEvaluatedKey' in response:
-            lek = response['LastEvaluatedKey']
-            esk = tgen.table.layer2.dynamize_last_evaluated_key(lek)
-            tgen.kwargs['exclusive_start_key'] = esk
+            # The key is still in its Amazon DynamoDB encoded form so
+            # it can be sent back as is.
+            tgen.kwargs['exclusive_start_key'] = response['LastEvaluatedKey']
         else:
             break
+        governor = tgen.table.governor
+        if governor is not None:
+            governor.wait_for_read()
         response = tgen.callable(**tgen.kwargs)
         if 'ConsumedCapacityUnits' in response:
             tgen.consumed_units += response['ConsumedCapacityUnits']
+            if governor is not None:
+                governor.consume_read(response['ConsumedCapacityUnits'])
+        decode_item = tgen.table.layer2.dynamizer.decode_item
         for item in response['Items']:
             if tgen.max_results and n == tgen.max_results:
                 break
-            yield tgen.item_class(tgen.table, attrs=item)
+            yield tgen.item_class(tgen.table, attrs=decode_item(item))
             n += 1
 
 
@@ -118,6 +128,8 @@ class Layer2(object):
                              is_secure, port, proxy, proxy_port,
                              debug, security_token, region,
                              validate_certs=validate_certs)
+        self.dynamizer = Dynamizer()
+        self._item_caches = {}
 
     def dynamize_attribute_updates(self, pending_updates):
         """
@@ -132,14 +144,11 @@ class Layer2(object):
                 d[attr_name] = {"Action": action}
             else:
                 d[attr_name] = {"Action": action,
-                                "Value": dynamize_value(value)}
+                                "Value": self.dynamizer.encode(value)}
         return d
 
     def dynamize_item(self, item):
-        d = {}
-        for attr_name in item:
-            d[attr_name] = dynamize_value(item[attr_name])
-        return d
+        return self.dynamizer.encode_item(item)
 
     def dynamize_range_key_condition(self, range_key_condition):
         """
@@ -176,7 +185,7 @@ class Layer2(object):
                 elif attr_value is False:
                     attr_value = {'Exists': False}
                 else:
-                    val = dynamize_value(expected_value[attr_name])
+                    val = self.dynamizer.encode(expected_value[attr_name])
                     attr_value = {'Value': val}
                 d[attr_name] = attr_value
         return d
@@ -189,10 +198,10 @@ class Layer2(object):
         d = None
         if last_evaluated_key:
             hash_key = last_evaluated_key['HashKeyElement']
-            d = {'HashKeyElement': dynamize_value(hash_key)}
+            d = {'HashKeyElement': self.dynamizer.encode(hash_key)}
             if 'RangeKeyElement' in last_evaluated_key:
                 range_key = last_evaluated_key['RangeKeyElement']
-                d['RangeKeyElement'] = dynamize_value(range_key)
+                d['RangeKeyElement'] = self.dynamizer.encode(range_key)
         return d
 
     def build_key_from_values(self, schema, hash_key, range_key=None):
@@ -216,13 +225,13 @@ class Layer2(object):
             type defined in the schema.
         """
         dynamodb_key = {}
-        dynamodb_value = dynamize_value(hash_key)
+        dynamodb_value = self.dynamizer.encode(hash_key)
         if dynamodb_value.keys()[0] != schema.hash_key_type:
             msg = 'Hashkey must be of type: %s' % schema.hash_key_type
             raise TypeError(msg)
         dynamodb_key['HashKeyElement'] = dynamodb_value
         if range_key is not None:
-            dynamodb_value = dynamize_value(range_key)
+            dynamodb_value = self.dynamizer.encode(range_key)
             if dynamodb_value.keys()[0] != schema.range_key_type:
                 msg = 'RangeKey must be of type: %s' % schema.range_key_type
                 raise TypeError(msg)
@@ -381,6 +390,99 @@ class Layer2(object):
             schema['RangeKeyElement'] = range_key
         return Schema(schema)
 
+    def enable_item_cache(self, table, max_items=1000, ttl=60,
+                          negative_ttl=None):
+        """
+        Start caching the items read from a table with
+        :meth:`get_item`.  The cache is shared by every Table object
+        for that table name which uses this Layer2, and items are
+        invalidated when they are written through this Layer2 with
+        :meth:`put_item`, :meth:`update_item`, :meth:`delete_item` or
+        :meth:`batch_write_item`.  Writes made by other processes are
+        only seen once the cached entry expires.
+
+        :type table: :class:`boto.dynamodb.table.Table`
+        :param table: The Table object whose items will be cached.
+
+        :type max_items: int
+        :param max_items: The maximum number of items held in the
+            cache.  The least recently used item is evicted first.
+
+        :type ttl: int|float
+        :param ttl: The number of seconds an item stays in the cache.
+
+        :type negative_ttl: int|float
+        :param negative_ttl: The number of seconds the absence of an
+            item is remembered.  The default of None disables
+            negative caching.
+
+        :rtype: :class:`boto.dynamodb.cache.ItemCache`
+        :return: The cache, which also holds the hit and miss counts.
+        """
+        cache = ItemCache(max_items, ttl, negative_ttl)
+        self._item_caches[table.name] = cache
+        return cache
+
+    def disable_item_cache(self, table):
+        """
+        Stop caching the items of a table and drop its cache.
+
+        :type table: :class:`boto.dynamodb.table.Table`
+        :param table: The Table object whose items are cached.
+        """
+        self._item_caches.pop(table.name, None)
+
+    def get_item_cache(self, table):
+        """
+        Return the :class:`boto.dynamodb.cache.ItemCache` of a table,
+        or None if its items are not cached.
+
+        :type table: :class:`boto.dynamodb.table.Table`
+        :param table: The Table object whose items are cached.
+        """
+        return self._item_caches.get(table.name)
+
+    def _invalidate_cached_item(self, table, hash_key, range_key=None):
+        cache = self._item_caches.get(table.name)
+        if cache is not None:
+            cache.invalidate(hash_key, range_key)
+
+    def _get_item_response(self, table, hash_key, range_key,
+                           attributes_to_get, consistent_read):
+        key = self.build_key_from_values(table.schema, hash_key, range_key)
+        if table.governor is not None:
+            table.governor.wait_for_read()
+        response = self.layer1.get_item(table.name, key,
+                                        attributes_to_get, consistent_read)
+        if table.governor is not None:
+            table.governor.consume_read(
+                response.get('ConsumedCapacityUnits', 0))
+        response['Item'] = self.dynamizer.decode_item(response['Item'])
+        return response
+
+    def _wait_for_governors(self, batch_list, write=False):
+        governors = {}
+        for batch in batch_list:
+            if batch.table.governor is not None:
+                governors[batch.table.name] = batch.table.governor
+        for governor in governors.itervalues():
+            if write:
+                governor.wait_for_write()
+            else:
+                governor.wait_for_read()
+        return governors
+
+    def _consume_governors(self, governors, response, write=False):
+        for table_name, governor in governors.iteritems():
+            table_response = response.get('Responses', {}).get(table_name)
+            if not table_response:
+                continue
+            units = table_response.get('ConsumedCapacityUnits', 0)
+            if write:
+                governor.consume_write(units)
+            else:
+                governor.consume_read(units)
+
     def get_item(self, table, hash_key, range_key=None,
                  attributes_to_get=None, consistent_read=False,
                  item_class=Item):
@@ -415,10 +517,18 @@ class Layer2(object):
             to generate the items. This should be a subclass of
             :class:`boto.dynamodb.item.Item`
         """
-        key = self.build_key_from_values(table.schema, hash_key, range_key)
-        response = self.layer1.get_item(table.name, key,
-                                        attributes_to_get, consistent_read,
-                                        object_hook=item_object_hook)
+        cache = self._item_caches.get(table.name)
+        if cache is None:
+            response = self._get_item_response(table, hash_key, range_key,
+                                               attributes_to_get,
+                                               consistent_read)
+        else:
+            def fetch():
+                return self._get_item_response(table, hash_key, range_key,
+                                               attributes_to_get,
+                                               consistent_read)
+            response = cache.get(hash_key, range_key, attributes_to_get,
+                                 consistent_read, fetch)
         item = item_class(table, hash_key, range_key, response['Item'])
         if 'ConsumedCapacityUnits' in response:
             item.consumed_units = response['ConsumedCapacityUnits']
@@ -437,8 +547,17 @@ class Layer2(object):
             request.
         """
         request_items = batch_list.to_dict()
-        return self.layer1.batch_get_item(request_items,
-                                          object_hook=item_object_hook)
+        governors = self._wait_for_governors(batch_list)
+        response = self.layer1.batch_get_item(request_items)
+        self._consume_governors(governors, response)
+        decode_item = self.dynamizer.decode_item
+        for table_response in response.get('Responses', {}).itervalues():
+            if 'Items' in table_response:
+                table_response['Items'] = map(decode_item,
+                                              table_response['Items'])
+        for table_request in response.get('UnprocessedKeys', {}).itervalues():
+            table_request['Keys'] = map(decode_item, table_request['Keys'])
+        return response
 
     def batch_write_item(self, batch_list):
         """
@@ -451,8 +570,45 @@ class Layer2(object):
             batch of objects that you wish to put or delete.
         """
         request_items = batch_list.to_dict()
-        return self.layer1.batch_write_item(request_items,
-                                            object_hook=item_object_hook)
+        governors = self._wait_for_governors(batch_list, write=True)
+        try:
+            response = self.layer1.batch_write_item(request_items)
+            self._consume_governors(governors, response, write=True)
+        finally:
+            for batch in batch_list:
+                for item in batch.puts:
+                    self._invalidate_cached_item(batch.table, item.hash_key,
+                                                 item.range_key)
+                for key in batch.deletes:
+                    if not isinstance(key, tuple):
+                        key = (key, None)
+                    self._invalidate_cached_item(batch.table, *key)
+        decode_item = self.dynamizer.decode_item
+        for requests in response.get('UnprocessedItems', {}).itervalues():
+            for request in requests:
+                if 'PutRequest' in request:
+                    put = request['PutRequest']
+                    put['Item'] = decode_item(put['Item'])
+                if 'DeleteRequest' in request:
+                    delete = request['DeleteRequest']
+                    delete['Key'] = decode_item(delete['Key'])
+        return response
+
+    def _wait_for_write(self, item):
+        if item.table.governor is not None:
+            item.table.governor.wait_for_write()
+
+    def _consume_write(self, item, response):
+        if 'ConsumedCapacityUnits' in response:
+            item.consumed_units = response['ConsumedCapacityUnits']
+            if item.table.governor is not None:
+                item.table.governor.consume_write(item.consumed_units)
+
+    def _decode_attributes(self, response):
+        if 'Attributes' in response:
+            response['Attributes'] = self.dynamizer.decode_item(
+                response['Attributes'])
+        return response
 
     def put_item(self, item, expected_value=None, return_values=None):
         """
@@ -477,13 +633,16 @@ class Layer2(object):
             of the old item is returned.
         """
         expected_value = self.dynamize_expected_value(expected_value)
-        response = self.layer1.put_item(item.table.name,
-                                        self.dynamize_item(item),
-                                        expected_value, return_values,
-                                        object_hook=item_object_hook)
-        if 'ConsumedCapacityUnits' in response:
-            item.consumed_units = response['ConsumedCapacityUnits']
-        return response
+        self._wait_for_write(item)
+        try:
+            response = self.layer1.put_item(item.table.name,
+                                            self.dynamize_item(item),
+                                            expected_value, return_values)
+        finally:
+            self._invalidate_cached_item(item.table, item.hash_key,
+                                         item.range_key)
+        self._consume_write(item, response)
+        return self._decode_attributes(response)
 
     def update_item(self, item, expected_value=None, return_values=None):
         """
@@ -517,15 +676,17 @@ class Layer2(object):
         key = self.build_key_from_values(item.table.schema,
                                          item.hash_key, item.range_key)
         attr_updates = self.dynamize_attribute_updates(item._updates)
-
-        response = self.layer1.update_item(item.table.name, key,
-                                           attr_updates,
-                                           expected_value, return_values,
-                                           object_hook=item_object_hook)
+        self._wait_for_write(item)
+        try:
+            response = self.layer1.update_item(item.table.name, key,
+                                               attr_updates,
+                                               expected_value, return_values)
+        finally:
+            self._invalidate_cached_item(item.table, item.hash_key,
+                                         item.range_key)
         item._updates.clear()
-        if 'ConsumedCapacityUnits' in response:
-            item.consumed_units = response['ConsumedCapacityUnits']
-        return response
+        self._consume_write(item, response)
+        return self._decode_attributes(response)
 
     def delete_item(self, item, expected_value=None, return_values=None):
         """
@@ -551,10 +712,16 @@ class Layer2(object):
         expected_value = self.dynamize_expected_value(expected_value)
         key = self.build_key_from_values(item.table.schema,
                                          item.hash_key, item.range_key)
-        return self.layer1.delete_item(item.table.name, key,
-                                       expected=expected_value,
-                                       return_values=return_values,
-                                       object_hook=item_object_hook)
+        self._wait_for_write(item)
+        try:
+            response = self.layer1.delete_item(item.table.name, key,
+                                               expected=expected_value,
+                                               return_values=return_values)
+        finally:
+            self._invalidate_cached_item(item.table, item.hash_key,
+                                         item.range_key)
+        self._consume_write(item, response)
+        return self._decode_attributes(response)
 
     def query(self, table, hash_key, range_key_condition=None,
               attributes_to_get=None, request_limit=None,
@@ -633,14 +800,13 @@ class Layer2(object):
         else:
             esk = None
         kwargs = {'table_name': table.name,
-                  'hash_key_value': dynamize_value(hash_key),
+                  'hash_key_value': self.dynamizer.encode(hash_key),
                   'range_key_conditions': rkc,
                   'attributes_to_get': attributes_to_get,
                   'limit': request_limit,
                   'consistent_read': consistent_read,
                   'scan_index_forward': scan_index_forward,
-                  'exclusive_start_key': esk,
-                  'object_hook': item_object_hook}
+                  'exclusive_start_key': esk}
         return TableGenerator(table, self.layer1.query,
                               max_results, item_class, kwargs)
 
@@ -720,7 +886,6 @@ class Layer2(object):
                   'attributes_to_get': attributes_to_get,
                   'limit': request_limit,
                   'count': count,
-                  'exclusive_start_key': esk,
-                  'object_hook': item_object_hook}
+                  'exclusive_start_key': esk}
         return TableGenerator(table, self.layer1.scan,
                               max_results, item_class, kwargs)
@@ -21,30 +21,63 @@
 # IN THE SOFTWARE.
 #
 
+import threading
+from collections import deque
+from Queue import Queue
+
+from boto.waiter import Waiter, register_resource_type
 from boto.dynamodb.batch import BatchList
+from boto.dynamodb.governor import ThroughputGovernor
 from boto.dynamodb.schema import Schema
 from boto.dynamodb.item import Item
 from boto.dynamodb import exceptions as dynamodb_exceptions
-import time
+
+
+MAX_BATCH_GET_KEYS = 100
+"""The maximum number of keys Amazon DynamoDB accepts in one BatchGetItem"""
+
+_END_SENTINEL = object()
+
 
 class TableBatchGenerator(object):
     """
     A low-level generator used to page through results from
     batch_get_item operations.
 
+    Keys are consumed from a deque, one batch of at most 100 keys at a
+    time, and any ``UnprocessedKeys`` returned by Amazon DynamoDB are
+    put back on the same deque.  When ``max_concurrent_requests`` is
+    greater than one, that many BatchGetItem requests are kept in
+    flight by a small pool of threads and items are yielded as each
+    response arrives, so the order of the results is not guaranteed.
+
     :ivar consumed_units: An integer that holds the number of
         ConsumedCapacityUnits accumulated thus far for this
         generator.
     """
 
-    def __init__(self, table, keys, attributes_to_get=None, consistent_read=False):
+    def __init__(self, table, keys, attributes_to_get=None,
+                 consistent_read=False, max_concurrent_requests=1):
         self.table = table
         self.keys = keys
         self.consumed_units = 0
         self.attributes_to_get = attributes_to_get
         self.consistent_read = consistent_read
+        self.max_concurrent_requests = max(1, max_concurrent_requests)
+
+    def _next_batch(self, pending):
+        batch = []
+        while pending and len(batch) < MAX_BATCH_GET_KEYS:
+            batch.append(pending.popleft())
+        return batch
+
+    def _submit(self, keys):
+        batch = BatchList(self.table.layer2)
+        batch.add_batch(self.table, keys, self.attributes_to_get,
+                        self.consistent_read)
+        return batch.submit()
 
-    def _queue_unprocessed(self, res):
+    def _queue_unprocessed(self, res, pending):
         if not u'UnprocessedKeys' in res:
             return
         if not self.table.name in res[u'UnprocessedKeys']:
@@ -55,25 +88,80 @@ class TableBatchGenerator(object):
         for key in keys:
             h = key[u'HashKeyElement']
             r = key[u'RangeKeyElement'] if u'RangeKeyElement' in key else None
-            self.keys.append((h, r))
+            pending.append((h, r))
+
+    def _process_response(self, res, pending):
+        # re-queue unprocessed keys before handing back the items so
+        # that they are picked up by the next batch.
+        self._queue_unprocessed(res, pending)
+        if not self.table.name in res[u'Responses']:
+            return []
+        response = res[u'Responses'][self.table.name]
+        self.consumed_units += response[u'ConsumedCapacityUnits']
+        return response[u'Items']
 
     def __iter__(self):
-        while self.keys:
-            # Build the next batch
-            batch = BatchList(self.table.layer2)
-            batch.add_batch(self.table, self.keys[:100], self.attributes_to_get)
-            res = batch.submit()
-
-            # parse the results
-            if not self.table.name in res[u'Responses']:
-                continue
-            self.consumed_units += res[u'Responses'][self.table.name][u'ConsumedCapacityUnits']
-            for elem in res[u'Responses'][self.table.name][u'Items']:
+        pending = deque(self.keys)
+        if self.max_concurrent_requests > 1:
+            return self._concurrent_generator(pending)
+        return self._serial_generator(pending)
+
+    def _serial_generator(self, pending):
+        while pending:
+            res = self._submit(self._next_batch(pending))
+            for elem in self._process_response(res, pending):
                 yield elem
 
-            # re-queue un processed keys
-            self.keys = self.keys[100:]
-            self._queue_unprocessed(res)
+    def _concurrent_generator(self, pending):
+        worker_queue = Queue()
+        result_queue = Queue()
+        threads = []
+        for _ in xrange(self.max_concurrent_requests):
+            thread = BatchGetWorkerThread(self._submit, worker_queue,
+                                          result_queue)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        in_flight = 0
+        try:
+            while pending or in_flight:
+                while pending and in_flight < self.max_concurrent_requests:
+                    worker_queue.put(self._next_batch(pending))
+                    in_flight += 1
+                res = result_queue.get()
+                in_flight -= 1
+                if isinstance(res, Exception):
+                    raise res
+                for elem in self._process_response(res, pending):
+                    yield elem
+        finally:
+            for _ in threads:
+                worker_queue.put(_END_SENTINEL)
+
+
+class BatchGetWorkerThread(threading.Thread):
+    """
+    Submits the batches of keys found on ``worker_queue`` and puts
+    each response (or the exception raised while fetching it) on
+    ``result_queue``.  Used by :class:`TableBatchGenerator`.
+    """
+
+    def __init__(self, submit, worker_queue, result_queue):
+        threading.Thread.__init__(self)
+        self._submit = submit
+        self._worker_queue = worker_queue
+        self._result_queue = result_queue
+
+    def run(self):
+        while True:
+            keys = self._worker_queue.get()
+            if keys is _END_SENTINEL:
+                return
+            try:
+                result = self._submit(keys)
+            except Exception, e:
+                result = e
+            self._result_queue.put(result)
 
 
 class Table(object):
@@ -97,6 +185,9 @@ class Table(object):
     :ivar write_units: The WriteCapacityUnits of the tables
         Provisioned Throughput.
     :ivar schema: The Schema object associated with the table.
+    :ivar governor: The
+        :class:`boto.dynamodb.governor.ThroughputGovernor` pacing the
+        requests made through this Table object, or None.
     """
 
     def __init__(self, layer2, response):
@@ -112,6 +203,7 @@ class Table(object):
         """
         self.layer2 = layer2
         self._dict = {}
+        self.governor = None
         self.update_from_response(response)
 
     def __repr__(self):
@@ -176,17 +268,14 @@ class Table(object):
             parameter controls the number of seconds of delay between
             calls to update_table in Amazon DynamoDB.  Default is 5 seconds.
         """
-        done = False
-        while not done:
+        if wait_for_active:
+            waiter = Waiter(min_interval=retry_seconds,
+                            max_interval=retry_seconds)
+            waiter.add(self, 'ACTIVE')
+            waiter.wait()
+        else:
             response = self.layer2.describe_table(self.name)
             self.update_from_response(response)
-            if wait_for_active:
-                if self.status == 'ACTIVE':
-                    done = True
-                else:
-                    time.sleep(retry_seconds)
-            else:
-                done = True
 
     def update_throughput(self, read_units, write_units):
         """
@@ -200,6 +289,34 @@ class Table(object):
         """
         self.layer2.update_throughput(self, read_units, write_units)
 
+    def limit_throughput(self, read_fraction=1.0, write_fraction=1.0,
+                         burst_seconds=1):
+        """
+        Pace the requests made through this Table object so that they
+        use at most a fraction of the provisioned throughput, based on
+        the ConsumedCapacityUnits reported by Amazon DynamoDB.  This
+        covers get_item, query, scan, batch_get_item and the writes
+        made with items of this table.  Other Table objects for the
+        same table are not affected.
+
+        :type read_fraction: float
+        :param read_fraction: The fraction of ReadCapacityUnits that
+            may be used, e.g. 0.25 for a quarter of the capacity.
+
+        :type write_fraction: float
+        :param write_fraction: The fraction of WriteCapacityUnits that
+            may be used.
+
+        :type burst_seconds: int|float
+        :param burst_seconds: The number of seconds worth of unused
+            capacity that may be spent at once.
+
+        :rtype: :class:`boto.dynamodb.governor.ThroughputGovernor`
+        """
+        self.governor = ThroughputGovernor(self, read_fraction,
+                                           write_fraction, burst_seconds)
+        return self.governor
+
     def delete(self):
         """
         Delete this table and all items in it.  After calling this
@@ -207,6 +324,44 @@ class Table(object):
         """
         self.layer2.delete_table(self)
 
+    @property
+    def item_cache(self):
+        """
+        The :class:`boto.dynamodb.cache.ItemCache` used by
+        :meth:`get_item`, or None if items are not cached.
+        """
+        return self.layer2.get_item_cache(self)
+
+    def enable_item_cache(self, max_items=1000, ttl=60, negative_ttl=None):
+        """
+        Cache the items read with :meth:`get_item` in this process.
+        Items are invalidated when they are written through the same
+        Layer2 object.  See
+        :meth:`boto.dynamodb.layer2.Layer2.enable_item_cache`.
+
+        :type max_items: int
+        :param max_items: The maximum number of items held in the
+            cache.  The least recently used item is evicted first.
+
+        :type ttl: int|float
+        :param ttl: The number of seconds an item stays in the cache.
+
+        :type negative_ttl: int|float
+        :param negative_ttl: The number of seconds the absence of an
+            item is remembered.  The default of None disables
+            negative caching.
+
+        :rtype: :class:`boto.dynamodb.cache.ItemCache`
+        """
+        return self.layer2.enable_item_cache(self, max_items, ttl,
+                                             negative_ttl)
+
+    def disable_item_cache(self):
+        """
+        Stop caching the items of this table.
+        """
+        self.layer2.disable_item_cache(self)
+
     def get_item(self, hash_key, range_key=None,
                  attributes_to_get=None, consistent_read=False,
                  item_class=Item):
@@ -472,7 +627,8 @@ class Table(object):
                                 request_limit, max_results, count,
                                 exclusive_start_key, item_class=item_class)
 
-    def batch_get_item(self, keys, attributes_to_get=None):
+    def batch_get_item(self, keys, attributes_to_get=None,
+                       consistent_read=False, max_concurrent_requests=1):
         """
         Return a set of attributes for a multiple items from a single table
         using their primary keys. This abstraction removes the 100 Items per
@@ -494,7 +650,28 @@ class Table(object):
             If supplied, only the specified attribute names will
             be returned.  Otherwise, all attributes will be returned.
 
+        :type consistent_read: bool
+        :param consistent_read: If True, a consistent read
+            request is issued.  Otherwise, an eventually consistent
+            request is issued.
+
+        :type max_concurrent_requests: int
+        :param max_concurrent_requests: The number of BatchGetItem
+            requests to keep in flight at once.  With the default of 1
+            the batches are submitted one after another.  With a higher
+            value items are returned in the order the responses arrive.
+
         :return: A TableBatchGenerator (generator) object which will iterate over all results
         :rtype: :class:`boto.dynamodb.table.TableBatchGenerator`
         """
-        return TableBatchGenerator(self, keys, attributes_to_get)
+        return TableBatchGenerator(self, keys, attributes_to_get,
+                                   consistent_read, max_concurrent_requests)
+
+
+def _describe_tables(layer2, names):
+    return dict((name, layer2.describe_table(name)) for name in names)
+
+
+register_resource_type(Table, 'status', _describe_tables, id_attr='name',
+                       connection_attr='layer2',
+                       update=Table.update_from_response)
@@ -136,3 +136,123 @@ class Binary(object):
 
     def __hash__(self):
         return hash(self.value)
+
+
+def _encode_num(n):
+    # DynamoDB stores booleans as numbers. True is 1, False is 0.
+    if isinstance(n, bool):
+        return str(int(n))
+    return str(n)
+
+
+def _encode_str(s):
+    return s
+
+
+def _encode_binary(b):
+    return b.encode()
+
+
+class Dynamizer(object):
+    """
+    Converts whole items between native Python values and the typed
+    attribute maps used by Amazon DynamoDB, in a single pass.
+
+    Scalar values are dispatched on their exact type, and the elements
+    of a set are typed and converted in the same walk over the set,
+    rather than going through :func:`get_dynamodb_type` once per
+    candidate type.  Values of other types (subclasses of the builtin
+    types, for example) fall back to :func:`dynamize_value`.
+
+    Decoding does not rely on a ``json`` object_hook being called for
+    every dict in a response.  Instead, only the attribute maps of the
+    items are walked, which lets the JSON decoder use its fast path
+    for the rest of the document.
+    """
+
+    _scalar_types = {int: 'N', long: 'N', float: 'N', bool: 'N',
+                     str: 'S', unicode: 'S', Binary: 'B'}
+
+    _scalar_encoders = {'N': _encode_num, 'S': _encode_str,
+                        'B': _encode_binary}
+
+    _decoders = {'S': lambda s: s,
+                 'N': convert_num,
+                 'B': convert_binary,
+                 'SS': set,
+                 'NS': lambda ns: set(map(convert_num, ns)),
+                 'BS': lambda bs: set(map(convert_binary, bs))}
+
+    def encode(self, val):
+        """
+        Take a Python value and return a dict consisting of the
+        Amazon DynamoDB type specification and the value that needs
+        to be sent to Amazon DynamoDB.  If the type of the value is
+        not supported, raise a TypeError.
+        """
+        val_type = type(val)
+        dynamodb_type = self._scalar_types.get(val_type)
+        if dynamodb_type is not None:
+            return {dynamodb_type: self._scalar_encoders[dynamodb_type](val)}
+        if val_type is set or val_type is frozenset:
+            return self._encode_set(val)
+        return dynamize_value(val)
+
+    def _encode_set(self, val):
+        set_type = None
+        values = []
+        for n in val:
+            dynamodb_type = self._scalar_types.get(type(n))
+            if dynamodb_type is None:
+                dynamodb_type = get_dynamodb_type(n)
+            if set_type is None:
+                set_type = dynamodb_type
+                encoder = self._scalar_encoders.get(set_type)
+            if dynamodb_type != set_type or encoder is None:
+                msg = 'Unsupported type "%s" for value "%s"' % (type(val), val)
+                raise TypeError(msg)
+            values.append(encoder(n))
+        # An empty set is sent as a number set, as dynamize_value does.
+        return {(set_type or 'N') + 'S': values}
+
+    def encode_item(self, item):
+        """
+        Convert a dict of attribute names to Python values into the
+        attribute map expected by Layer1.
+        """
+        encode = self.encode
+        d = {}
+        for attr_name, attr_value in item.iteritems():
+            d[attr_name] = encode(attr_value)
+        return d
+
+    def decode(self, attr):
+        """
+        Take a single Amazon DynamoDB typed value, such as
+        ``{'N': '12'}``, and return the corresponding Python value.
+        Anything that is not a typed value is returned unchanged.
+        """
+        if len(attr) == 1:
+            for dynamodb_type in attr:
+                if dynamodb_type in self._decoders:
+                    return self._decoders[dynamodb_type](attr[dynamodb_type])
+        return attr
+
+    def decode_item(self, attrs):
+        """
+        Convert an attribute map, as found in the Item, Items,
+        Attributes or Key elements of a response, into a dict of
+        attribute names to Python values.
+        """
+        decoders = self._decoders
+        d = {}
+        for attr_name, attr in attrs.iteritems():
+            d[attr_name] = attr
+            if len(attr) == 1:
+                for dynamodb_type in attr:
+                    if dynamodb_type == 'S':
+                        d[attr_name] = attr['S']
+                    elif dynamodb_type in decoders:
+                        d[attr_name] = decoders[dynamodb_type](
+                            attr[dynamodb_type])
+        return d
@@ -367,6 +367,21 @@ class AutoScaleConnection(AWSQueryConnection):
         return self.get_list('DescribeScalingActivities',
                              params, [('member', Activity)])
 
+    def activity_tailer(self, group_names=None, **kwargs):
+        """
+        Create a :class:`boto.ec2.autoscale.tailer.ActivityTailer` that
+        polls the activities of many groups concurrently and reports
+        only the new and changed ones.
+
+        :type group_names: list
+        :param group_names: The groups to follow, by default all of
+            them.
+
+        :rtype: :class:`boto.ec2.autoscale.tailer.ActivityTailer`
+        """
+        from boto.ec2.autoscale.tailer import ActivityTailer
+        return ActivityTailer(self, group_names, **kwargs)
+
     def get_termination_policies(self):
         """Gets all valid termination policies.
 
@@ -756,3 +771,36 @@ class AutoScaleConnection(AWSQueryConnection):
         for i, tag in enumerate(tags):
             tag.build_params(params, i + 1)
         return self.get_status('DeleteTags', params, verb='POST')
+
+    def apply_tags(self, desired, replace=False, propagate_at_launch=False,
+                   num_threads=4):
+        """
+        Bring the tags of many Auto Scaling groups to a desired state,
+        with up to 50 tags per CreateOrUpdateTags or DeleteTags request
+        and concurrent requests.  Only the tags that differ from the
+        known tags of a group are sent.
+
+        :type desired: dict
+        :param desired: The tags each group should have, keyed by
+            group name or by
+            :class:`boto.ec2.autoscale.group.AutoScalingGroup`, whose
+            ``tags`` are taken as its current tags.  The value of a
+            tag is either a string or a ``(value, propagate_at_launch)``
+            tuple.
+
+        :type replace: bool
+        :param replace: Whether to delete the current tags of the
+            groups passed as objects that are not in the desired tags.
+
+        :type propagate_at_launch: bool
+        :param propagate_at_launch: Whether tags given as a string are
+            applied to the instances launched by the group.
+
+        :type num_threads: int
+        :param num_threads: The number of concurrent requests.
+
+        :rtype: :class:`boto.ec2.tagging.TagResult`
+        """
+        from boto.ec2.tagging import tag_groups
+        return tag_groups(self, desired, replace, propagate_at_launch,
+                          num_threads)
@@ -55,11 +55,13 @@ class Tag(object):
             self.key = value
         elif name == 'Value':
             self.value = value
-        elif name == 'PropogateAtLaunch':
+        elif name in ('PropagateAtLaunch', 'PropogateAtLaunch'):
             if value.lower() == 'true':
-                self.propogate_at_launch = True
+                self.propagate_at_launch = True
             else:
-                self.propogate_at_launch = False
+                self.propagate_at_launch = False
+            # Kept for code written against the misspelled attribute.
+            self.propogate_at_launch = self.propagate_at_launch
         elif name == 'ResourceId':
             self.resource_id = value
         elif name == 'ResourceType':
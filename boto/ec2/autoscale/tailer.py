@@ -0,0 +1,277 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+"""
+Follow the scaling activities of many Auto Scaling groups.
+"""
+import logging
+import threading
+import time
+import Queue
+
+
+TERMINAL_STATUS_CODES = ('Successful', 'Failed', 'Cancelled')
+"""The status codes of activities that will not change any more"""
+
+_END_SENTINEL = object()
+log = logging.getLogger('boto.ec2.autoscale.tailer')
+
+
+class ActivityEvent(object):
+    """
+    A new scaling activity, or a change of the status or progress of
+    a known one.
+
+    :ivar group_name: The name of the Auto Scaling group.
+    :ivar activity: The :class:`boto.ec2.autoscale.activity.Activity`.
+    :ivar old_status_code: The previous StatusCode, None if the
+        activity is new.
+    :ivar old_progress: The previous Progress, None if the activity
+        is new.
+    """
+
+    def __init__(self, group_name, activity, old_status_code=None,
+                 old_progress=None):
+        self.group_name = group_name
+        self.activity = activity
+        self.old_status_code = old_status_code
+        self.old_progress = old_progress
+
+    def __repr__(self):
+        return 'ActivityEvent(%s, %s, %s -> %s)' % (
+            self.group_name, self.activity.activity_id,
+            self.old_status_code, self.activity.status_code)
+
+    @property
+    def is_new(self):
+        return self.old_status_code is None and self.old_progress is None
+
+    @property
+    def is_done(self):
+        return self.activity.status_code in TERMINAL_STATUS_CODES
+
+
+class _GroupState(object):
+
+    def __init__(self, known=None, cutoff=None):
+        # activity_id -> (start_time, status_code, progress) of the
+        # activities at or after the cutoff.
+        self.known = dict(known or {})
+        self.cutoff = cutoff
+
+    def update_cutoff(self):
+        # Everything older than the newest activity and than the
+        # oldest unfinished one is final and need not be fetched again.
+        if not self.known:
+            return
+        newest = max(start for start, _, _ in self.known.itervalues())
+        pending = [start for start, status, _ in self.known.itervalues()
+                   if status not in TERMINAL_STATUS_CODES]
+        self.cutoff = min([newest] + pending)
+        for activity_id, (start, _, _) in self.known.items():
+            if start < self.cutoff:
+                del self.known[activity_id]
+
+
+class ActivityTailer(object):
+    """
+    Polls DescribeScalingActivities for many Auto Scaling groups with
+    a bounded pool of threads and reports only the activities that are
+    new or whose status or progress changed since the previous poll.
+
+    The activities are returned newest first, so each poll of a group
+    pages only until it reaches activities older than both the newest
+    activity seen and the oldest one still in progress; in the steady
+    state that is a single small page per group.
+
+    On the first poll of a group, its finished activities are recorded
+    without being reported unless ``include_history`` is True; the
+    activities still in progress are reported.
+
+    :ivar requests: The number of DescribeScalingActivities requests.
+    :ivar errors: The exception of the last poll of each group that
+        failed, keyed by group name.
+    """
+
+    def __init__(self, connection, group_names=None, num_threads=10,
+                 page_size=20, include_history=False):
+        """
+        :type connection: :class:`boto.ec2.autoscale.AutoScaleConnection`
+        :param connection: The connection used to poll.
+
+        :type group_names: list
+        :param group_names: The groups to follow.  If not given, all
+            the groups of the region are followed, listed again on
+            each poll.
+
+        :type num_threads: int
+        :param num_threads: The maximum number of concurrent requests.
+
+        :type page_size: int
+        :param page_size: The MaxRecords of each request.
+
+        :type include_history: bool
+        :param include_history: Whether the first poll of a group also
+            reports the finished activities of its first page.
+        """
+        self.connection = connection
+        self.group_names = group_names
+        self.num_threads = num_threads
+        self.page_size = page_size
+        self.include_history = include_history
+        self.requests = 0
+        self.errors = {}
+        self._groups = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'ActivityTailer(%d groups)' % len(self._groups)
+
+    def get_group_names(self):
+        """Return the names of the groups to poll."""
+        if self.group_names is not None:
+            return list(self.group_names)
+        names = []
+        next_token = None
+        while True:
+            groups = self.connection.get_all_groups(next_token=next_token)
+            self._count_request()
+            names.extend(group.name for group in groups)
+            next_token = getattr(groups, 'next_token', None)
+            if not next_token:
+                return names
+
+    def _count_request(self):
+        self._lock.acquire()
+        try:
+            self.requests += 1
+        finally:
+            self._lock.release()
+
+    def _poll_group(self, name):
+        previous = self._groups.get(name)
+        first = previous is None
+        # Work on a copy so that a failed request does not lose the
+        # changes already seen on the earlier pages.
+        if first:
+            state = _GroupState()
+        else:
+            state = _GroupState(previous.known, previous.cutoff)
+        events = []
+        next_token = None
+        while True:
+            activities = self.connection.get_all_activities(
+                name, max_records=self.page_size, next_token=next_token)
+            self._count_request()
+            reached_cutoff = False
+            for activity in activities:
+                start = activity.start_time
+                if state.cutoff is not None and start < state.cutoff:
+                    reached_cutoff = True
+                    break
+                known = state.known.get(activity.activity_id)
+                current = (start, activity.status_code, activity.progress)
+                state.known[activity.activity_id] = current
+                if known is None:
+                    if (not first or self.include_history or
+                        activity.status_code not in TERMINAL_STATUS_CODES):
+                        events.append(ActivityEvent(name, activity))
+                elif known[1:] != current[1:]:
+                    events.append(ActivityEvent(name, activity, known[1],
+                                                known[2]))
+            next_token = getattr(activities, 'next_token', None)
+            if first or reached_cutoff or not next_token:
+                break
+        state.update_cutoff()
+        self._groups[name] = state
+        events.reverse()
+        return events
+
+    def poll(self):
+        """
+        Describe the recent activities of every group once.
+
+        :rtype: list
+        :return: The :class:`ActivityEvent` of the new and changed
+            activities, oldest first within each group.
+        """
+        names = self.get_group_names()
+        results = {}
+        pending = Queue.Queue()
+        for name in names:
+            pending.put(name)
+
+        def work():
+            while True:
+                name = pending.get()
+                if name is _END_SENTINEL:
+                    return
+                try:
+                    result = self._poll_group(name)
+                except Exception, e:
+                    log.error('Unable to describe the activities of %s: %s',
+                              name, e)
+                    result = e
+                self._lock.acquire()
+                try:
+                    results[name] = result
+                finally:
+                    self._lock.release()
+
+        threads = []
+        for _ in xrange(min(self.num_threads, len(names))):
+            pending.put(_END_SENTINEL)
+            thread = threading.Thread(target=work)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+        events = []
+        for name in sorted(results):
+            result = results[name]
+            if isinstance(result, Exception):
+                self.errors[name] = result
+            else:
+                self.errors.pop(name, None)
+                events.extend(result)
+        return events
+
+    def follow(self, interval=15, timeout=None):
+        """
+        Poll every ``interval`` seconds and yield each
+        :class:`ActivityEvent`, until ``timeout`` seconds have passed
+        or forever.
+        """
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout
+        while True:
+            started = time.time()
+            for event in self.poll():
+                yield event
+            if deadline is not None and time.time() >= deadline:
+                return
+            delay = started + interval - time.time()
+            if deadline is not None:
+                delay = min(delay, deadline - time.time())
+            if delay > 0:
+                time.sleep(delay)
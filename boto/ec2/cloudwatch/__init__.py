@@ -343,6 +343,21 @@ class CloudWatchConnection(AWSQueryConnection):
 
         return self.get_status('PutMetricData', params, verb="POST")
 
+    def metric_buffer(self, namespace, **kwargs):
+        """
+        Create a :class:`boto.ec2.cloudwatch.buffer.MetricBuffer` that
+        aggregates metric values and publishes them periodically with
+        this connection.  The keyword arguments are passed to the
+        buffer.
+
+        :type namespace: str
+        :param namespace: The default namespace of the metrics.
+
+        :rtype: :class:`boto.ec2.cloudwatch.buffer.MetricBuffer`
+        """
+        from boto.ec2.cloudwatch.buffer import MetricBuffer
+        return MetricBuffer(self, namespace, **kwargs)
+
     def describe_alarms(self, action_prefix=None, alarm_name_prefix=None,
                         alarm_names=None, max_records=None, state_value=None,
                         next_token=None):
@@ -0,0 +1,297 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+"""
+An in-process buffer aggregating metric values before they are sent to
+CloudWatch with PutMetricData.
+"""
+import datetime
+import logging
+import threading
+
+
+MAX_METRIC_DATA = 20
+"""The maximum number of metric data CloudWatch accepts in one request"""
+
+log = logging.getLogger('boto.ec2.cloudwatch.buffer')
+
+
+def _freeze_dimensions(dimensions):
+    if not dimensions:
+        return ()
+    frozen = []
+    for name, value in dimensions.iteritems():
+        if isinstance(value, (list, tuple)):
+            value = tuple(value)
+        frozen.append((name, value))
+    return tuple(sorted(frozen))
+
+
+class StatisticSet(object):
+    """
+    The sum, count, minimum and maximum of the values of a metric,
+    along with the time of the first of them.
+    """
+
+    def __init__(self, timestamp):
+        self.timestamp = timestamp
+        self.sum = 0.0
+        self.samplecount = 0
+        self.minimum = None
+        self.maximum = None
+
+    def __repr__(self):
+        return 'StatisticSet(sum=%s, count=%d, min=%s, max=%s)' % (
+            self.sum, self.samplecount, self.minimum, self.maximum)
+
+    def add(self, value, count=1):
+        self.sum += value * count
+        self.samplecount += count
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def merge(self, other):
+        self.timestamp = min(self.timestamp, other.timestamp)
+        self.sum += other.sum
+        self.samplecount += other.samplecount
+        for value in (other.minimum, other.maximum):
+            if value is not None:
+                if self.minimum is None or value < self.minimum:
+                    self.minimum = value
+                if self.maximum is None or value > self.maximum:
+                    self.maximum = value
+
+    def to_statistics(self):
+        """Return the dict expected by ``put_metric_data``."""
+        return {'maximum': self.maximum, 'minimum': self.minimum,
+                'samplecount': self.samplecount, 'sum': self.sum}
+
+
+class MetricBuffer(object):
+    """
+    Aggregates the values put to it and publishes them periodically.
+
+    The values of a metric, identified by its namespace, name, unit
+    and dimensions, are summed up into a :class:`StatisticSet` until
+    the next flush, so a metric updated on every request of a web
+    server only costs one data point per ``flush_interval``.  A
+    background thread flushes the buffer every ``flush_interval``
+    seconds, sending up to 20 metrics per PutMetricData request.  The
+    metrics of a failed request are merged back into the buffer and
+    sent with the next flush.
+
+    :ivar values: The number of values put to the buffer.
+    :ivar published: The number of metric data published.
+    :ivar requests: The number of PutMetricData requests made.
+    :ivar errors: The number of PutMetricData requests that failed.
+    """
+
+    def __init__(self, connection, namespace, flush_interval=60,
+                 max_metrics=10000, autostart=True):
+        """
+        :type connection: :class:`boto.ec2.cloudwatch.CloudWatchConnection`
+        :param connection: The connection used to publish the metrics.
+
+        :type namespace: str
+        :param namespace: The default namespace of the metrics.
+
+        :type flush_interval: int|float
+        :param flush_interval: The number of seconds between flushes.
+
+        :type max_metrics: int
+        :param max_metrics: The maximum number of distinct metrics held
+            in the buffer.  Values of new metrics are dropped once the
+            limit is reached, for instance while CloudWatch is not
+            reachable.
+
+        :type autostart: bool
+        :param autostart: Whether to start the flushing thread.  When
+            False, :meth:`flush` must be called by the application.
+        """
+        self.connection = connection
+        self.namespace = namespace
+        self.flush_interval = flush_interval
+        self.max_metrics = max_metrics
+        self.values = 0
+        self.published = 0
+        self.requests = 0
+        self.errors = 0
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closing = threading.Event()
+        self._thread = None
+        if autostart:
+            self._thread = threading.Thread(target=self._flush_loop)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def __repr__(self):
+        return 'MetricBuffer(%s, %d metrics)' % (self.namespace, len(self))
+
+    def __len__(self):
+        return len(self._metrics)
+
+    def put(self, name, value, unit=None, dimensions=None, count=1,
+            namespace=None):
+        """
+        Add a value to a metric.
+
+        :type name: str
+        :param name: The name of the metric.
+
+        :type value: float
+        :param value: The value.
+
+        :type unit: str
+        :param unit: The unit of the metric, see
+            :meth:`boto.ec2.cloudwatch.CloudWatchConnection.put_metric_data`.
+
+        :type dimensions: dict
+        :param dimensions: The dimensions of the metric.
+
+        :type count: int
+        :param count: The number of times the value was observed.
+
+        :type namespace: str
+        :param namespace: The namespace of the metric, if not the
+            default namespace of the buffer.
+        """
+        key = (namespace or self.namespace, name, unit,
+               _freeze_dimensions(dimensions))
+        self._lock.acquire()
+        try:
+            stats = self._metrics.get(key)
+            if stats is None:
+                if len(self._metrics) >= self.max_metrics:
+                    log.warning('Dropping a value of %s, the buffer is full',
+                                name)
+                    return
+                stats = StatisticSet(datetime.datetime.utcnow())
+                self._metrics[key] = stats
+            stats.add(value, count)
+            self.values += count
+        finally:
+            self._lock.release()
+
+    def increment(self, name, count=1, dimensions=None, namespace=None):
+        """Add ``count`` to a metric whose unit is Count."""
+        self.put(name, count, unit='Count', dimensions=dimensions,
+                 namespace=namespace)
+
+    def _merge(self, metrics):
+        self._lock.acquire()
+        try:
+            for key, stats in metrics:
+                current = self._metrics.get(key)
+                if current is None:
+                    self._metrics[key] = stats
+                else:
+                    current.merge(stats)
+        finally:
+            self._lock.release()
+
+    def flush(self):
+        """
+        Publish the metrics held in the buffer.
+
+        :rtype: int
+        :return: The number of metric data published.
+        """
+        self._flush_lock.acquire()
+        try:
+            self._lock.acquire()
+            try:
+                metrics, self._metrics = self._metrics, {}
+            finally:
+                self._lock.release()
+            by_namespace = {}
+            for key, stats in metrics.iteritems():
+                by_namespace.setdefault(key[0], []).append((key, stats))
+            published = 0
+            for namespace, items in sorted(by_namespace.iteritems()):
+                for i in xrange(0, len(items), MAX_METRIC_DATA):
+                    batch = items[i:i + MAX_METRIC_DATA]
+                    if self._publish(namespace, batch):
+                        published += len(batch)
+                    else:
+                        self._merge(batch)
+            return published
+        finally:
+            self._flush_lock.release()
+
+    def _publish(self, namespace, batch):
+        names = []
+        units = []
+        dimensions = []
+        statistics = []
+        timestamps = []
+        for (_, name, unit, dims), stats in batch:
+            names.append(name)
+            units.append(unit or 'None')
+            dimensions.append(dict(dims))
+            statistics.append(stats.to_statistics())
+            timestamps.append(stats.timestamp)
+        try:
+            self.connection.put_metric_data(
+                namespace, names, timestamp=timestamps, unit=units,
+                dimensions=dimensions, statistics=statistics)
+        except Exception:
+            log.exception('Error publishing %d metrics to %s',
+                          len(batch), namespace)
+            ok = False
+        else:
+            ok = True
+        self._lock.acquire()
+        try:
+            self.requests += 1
+            if ok:
+                self.published += len(batch)
+            else:
+                self.errors += 1
+        finally:
+            self._lock.release()
+        return ok
+
+    def _flush_loop(self):
+        while not self._closing.is_set():
+            self._closing.wait(self.flush_interval)
+            if self._closing.is_set():
+                return
+            try:
+                self.flush()
+            except Exception:
+                log.exception('Error flushing the metric buffer')
+
+    def close(self):
+        """Stop the flushing thread and flush the buffer a last time."""
+        self._closing.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,316 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+"""
+Memory efficient versions of the objects returned by the EC2 Describe
+requests.
+
+The classes of this module are subclasses of the regular ones with
+``__slots__`` for every attribute the parser sets, so that parsed
+objects do not carry an instance dictionary.  Values that repeat
+across a fleet, such as availability zones, instance types and
+states, are shared rather than copied for each object, and tag sets
+are only allocated when a resource has tags or its ``tags`` are
+accessed.  Attributes that are not known in advance are still stored,
+in an instance dictionary created on demand.
+
+To get compact objects, use a :class:`CompactEC2Connection`::
+
+    from boto.ec2.compact import CompactEC2Connection
+    ec2 = CompactEC2Connection()
+    reservations = ec2.get_all_instances()
+"""
+from boto.resultset import ResultSet
+from boto.ec2.connection import EC2Connection
+from boto.ec2.group import Group
+from boto.ec2.instance import Instance, InstancePlacement, InstanceState
+from boto.ec2.instance import Reservation
+from boto.ec2.securitygroup import GroupOrCIDR, IPPermissions
+from boto.ec2.securitygroup import IPPermissionsList, SecurityGroup
+from boto.ec2.snapshot import Snapshot
+from boto.ec2.tag import TagSet
+from boto.ec2.volume import AttachmentSet, Volume
+
+
+_shared_values = {}
+
+
+def share(value):
+    """
+    Return a string equal to ``value``, shared with every other value
+    passed to this function.  Only used for values with few distinct
+    values, such as zones and states, as shared values are never freed.
+    """
+    if value is None:
+        return None
+    return _shared_values.setdefault(value, value)
+
+
+def _share_element(elements, name, value):
+    # The text of the elements containing other elements, which the
+    # parser sets as attributes, is whitespace and is shared as well.
+    if name in elements or not value.strip():
+        return share(value)
+    return value
+
+
+def _slot_names(obj):
+    names = []
+    for cls in type(obj).__mro__:
+        names.extend(cls.__dict__.get('__slots__', ()))
+    return names
+
+
+def _copy_state(obj, updated):
+    """
+    Copy the attributes of ``updated`` to ``obj``, whether they are
+    stored in slots or in an instance dictionary.
+    """
+    for name in _slot_names(updated):
+        try:
+            setattr(obj, name, getattr(updated, name))
+        except AttributeError:
+            pass
+    obj.__dict__.update(getattr(updated, '__dict__', {}))
+
+
+class _LazyTags(object):
+    """
+    Stores the tags of a tagged object in a ``_tags`` slot, creating
+    the TagSet the first time it is needed.  The empty TagSet assigned
+    by :class:`boto.ec2.ec2object.TaggedEC2Object` is not kept.
+    """
+
+    __slots__ = ()
+
+    def _get_tags(self):
+        if self._tags is None:
+            self._tags = TagSet()
+        return self._tags
+
+    def _set_tags(self, tags):
+        if type(tags) is TagSet and not tags:
+            tags = None
+        self._tags = tags
+
+    tags = property(_get_tags, _set_tags)
+
+
+class CompactGroup(Group, object):
+
+    __slots__ = ('id', 'name', 'item')
+
+    def endElement(self, name, value, connection):
+        Group.endElement(self, name, share(value), connection)
+
+
+class CompactInstanceState(InstanceState):
+
+    __slots__ = ('code', 'name', 'instanceState', 'currentState',
+                 'previousState')
+
+    def endElement(self, name, value, connection):
+        InstanceState.endElement(self, name, share(value), connection)
+
+
+class CompactInstancePlacement(InstancePlacement):
+
+    __slots__ = ('zone', 'group_name', 'tenancy', 'placement')
+
+    def endElement(self, name, value, connection):
+        InstancePlacement.endElement(self, name, share(value), connection)
+
+
+class CompactInstance(_LazyTags, Instance):
+
+    __slots__ = ('connection', 'region', '_tags', 'id', 'dns_name',
+                 'public_dns_name', 'private_dns_name', 'key_name',
+                 'instance_type', 'launch_time', 'image_id', 'kernel',
+                 'ramdisk', 'product_codes', 'ami_launch_index', 'monitored',
+                 'spot_instance_request_id', 'subnet_id', 'vpc_id',
+                 'private_ip_address', 'ip_address', 'requester_id',
+                 '_in_monitoring_element', 'persistent', 'root_device_name',
+                 'root_device_type', 'block_device_mapping', 'state_reason',
+                 'group_name', 'client_token', 'eventsSet', 'events',
+                 'groups', 'platform', 'interfaces', 'hypervisor',
+                 'virtualization_type', 'architecture', 'instance_profile',
+                 'ebs_optimized', '_previous_state', '_state', '_placement',
+                 'item', 'reason', 'monitoring', 'networkInterfaceSet',
+                 'sourceDestCheck', 'instanceLifecycle')
+
+    SharedElements = frozenset(['imageId', 'keyName', 'instanceType',
+                                'rootDeviceName', 'rootDeviceType',
+                                'platform', 'kernelId', 'ramdiskId',
+                                'subnetId', 'vpcId', 'hypervisor',
+                                'virtualizationType', 'architecture'])
+
+    def __init__(self, connection=None):
+        Instance.__init__(self, connection)
+        self._state = CompactInstanceState()
+        self._placement = CompactInstancePlacement()
+
+    def startElement(self, name, attrs, connection):
+        if name == 'groupSet':
+            self.groups = ResultSet([('item', CompactGroup)])
+            return self.groups
+        elif name == 'previousState':
+            self._previous_state = CompactInstanceState()
+            return self._previous_state
+        return Instance.startElement(self, name, attrs, connection)
+
+    def endElement(self, name, value, connection):
+        value = _share_element(self.SharedElements, name, value)
+        Instance.endElement(self, name, value, connection)
+
+    def _update(self, updated):
+        _copy_state(self, updated)
+
+
+class CompactReservation(Reservation):
+
+    __slots__ = ('connection', 'region', 'id', 'owner_id', 'groups',
+                 'instances', 'item', 'requesterId')
+
+    def startElement(self, name, attrs, connection):
+        if name == 'instancesSet':
+            self.instances = ResultSet([('item', CompactInstance)])
+            return self.instances
+        elif name == 'groupSet':
+            self.groups = ResultSet([('item', CompactGroup)])
+            return self.groups
+        return None
+
+    def endElement(self, name, value, connection):
+        value = _share_element(('ownerId',), name, value)
+        Reservation.endElement(self, name, value, connection)
+
+
+class CompactAttachmentSet(AttachmentSet):
+
+    __slots__ = ('id', 'instance_id', 'status', 'attach_time', 'device',
+                 'item', 'attachmentSet', 'deleteOnTermination')
+
+    def endElement(self, name, value, connection):
+        value = _share_element(('status', 'device', 'deleteOnTermination'),
+                               name, value)
+        AttachmentSet.endElement(self, name, value, connection)
+
+
+class CompactVolume(_LazyTags, Volume):
+
+    __slots__ = ('connection', 'region', '_tags', 'id', 'create_time',
+                 'status', 'size', 'snapshot_id', 'attach_data', 'zone',
+                 'type', 'iops', 'item')
+
+    SharedElements = frozenset(['status', 'availabilityZone', 'volumeType',
+                                'snapshotId'])
+
+    def startElement(self, name, attrs, connection):
+        if name == 'attachmentSet':
+            self.attach_data = CompactAttachmentSet()
+            return self.attach_data
+        return Volume.startElement(self, name, attrs, connection)
+
+    def endElement(self, name, value, connection):
+        value = _share_element(self.SharedElements, name, value)
+        Volume.endElement(self, name, value, connection)
+
+    def _update(self, updated):
+        _copy_state(self, updated)
+
+
+class CompactSnapshot(_LazyTags, Snapshot):
+
+    __slots__ = ('connection', 'region', '_tags', 'id', 'volume_id',
+                 'status', 'progress', 'start_time', 'owner_id',
+                 'owner_alias', 'volume_size', 'description', 'item')
+
+    SharedElements = frozenset(['status', 'progress', 'ownerId',
+                                'ownerAlias'])
+
+    def endElement(self, name, value, connection):
+        value = _share_element(self.SharedElements, name, value)
+        Snapshot.endElement(self, name, value, connection)
+
+
+class CompactGroupOrCIDR(GroupOrCIDR):
+
+    __slots__ = ('owner_id', 'group_id', 'name', 'cidr_ip', 'userId',
+                 'groupId', 'groupName', 'item', 'groups', 'ipRanges')
+
+    def endElement(self, name, value, connection):
+        GroupOrCIDR.endElement(self, name, share(value), connection)
+
+
+class CompactIPPermissions(IPPermissions):
+
+    __slots__ = ('parent', 'ip_protocol', 'from_port', 'to_port', 'grants',
+                 'item', 'groups', 'ipRanges')
+
+    def startElement(self, name, attrs, connection):
+        if name == 'item':
+            self.grants.append(CompactGroupOrCIDR(self))
+            return self.grants[-1]
+        return None
+
+    def endElement(self, name, value, connection):
+        IPPermissions.endElement(self, name, share(value), connection)
+
+
+class CompactIPPermissionsList(IPPermissionsList):
+
+    __slots__ = ()
+
+    def startElement(self, name, attrs, connection):
+        if name == 'item':
+            self.append(CompactIPPermissions(self))
+            return self[-1]
+        return None
+
+
+class CompactSecurityGroup(_LazyTags, SecurityGroup):
+
+    __slots__ = ('connection', 'region', '_tags', 'id', 'owner_id', 'name',
+                 'description', 'vpc_id', 'rules', 'rules_egress', 'status',
+                 'item', 'ipPermissions', 'ipPermissionsEgress')
+
+    def __init__(self, connection=None, owner_id=None,
+                 name=None, description=None, id=None):
+        SecurityGroup.__init__(self, connection, owner_id, name,
+                               description, id)
+        self.rules = CompactIPPermissionsList()
+        self.rules_egress = CompactIPPermissionsList()
+
+    def endElement(self, name, value, connection):
+        value = _share_element(('ownerId', 'vpcId'), name, value)
+        SecurityGroup.endElement(self, name, value, connection)
+
+
+class CompactEC2Connection(EC2Connection):
+    """
+    An :class:`boto.ec2.connection.EC2Connection` whose Describe
+    requests for instances, volumes, snapshots and security groups
+    return the compact objects of this module.
+    """
+
+    ReservationClass = CompactReservation
+    VolumeClass = CompactVolume
+    SnapshotClass = CompactSnapshot
+    SecurityGroupClass = CompactSecurityGroup
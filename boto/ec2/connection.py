@@ -69,6 +69,10 @@ class EC2Connection(AWSQueryConnection):
     DefaultRegionEndpoint = boto.config.get('Boto', 'ec2_region_endpoint',
                                             'ec2.us-east-1.amazonaws.com')
     ResponseError = EC2ResponseError
+    ReservationClass = Reservation
+    VolumeClass = Volume
+    SnapshotClass = Snapshot
+    SecurityGroupClass = SecurityGroup
 
     def __init__(self, aws_access_key_id=None, aws_secret_access_key=None,
                  is_secure=True, host=None, port=None,
@@ -467,7 +471,7 @@ class EC2Connection(AWSQueryConnection):
                         UserWarning)
             self.build_filter_params(params, filters)
         return self.get_list('DescribeInstances', params,
-                             [('item', Reservation)], verb='POST')
+                             [('item', self.ReservationClass)], verb='POST')
 
     def get_all_instance_status(self, instance_ids=None,
                                 max_results=None, next_token=None,
@@ -711,7 +715,7 @@ class EC2Connection(AWSQueryConnection):
             params['IamInstanceProfile.Arn'] = instance_profile_arn
         if ebs_optimized:
             params['EbsOptimized'] = 'true'
-        return self.get_object('RunInstances', params, Reservation,
+        return self.get_object('RunInstances', params, self.ReservationClass,
                                verb='POST')
 
     def terminate_instances(self, instance_ids=None):
@@ -954,7 +958,8 @@ class EC2Connection(AWSQueryConnection):
 
     def get_spot_price_history(self, start_time=None, end_time=None,
                                instance_type=None, product_description=None,
-                               availability_zone=None):
+                               availability_zone=None, max_results=None,
+                               next_token=None):
         """
         Retrieve the recent history of spot instances pricing.
 
@@ -985,8 +990,17 @@ class EC2Connection(AWSQueryConnection):
             should be returned.  If not specified, data for all
             availability zones will be returned.
 
+        :type max_results: int
+        :param max_results: The maximum number of price changes per
+            response.
+
+        :type next_token: str
+        :param next_token: The ``next_token`` of the previous page of
+            results, to get the next page.
+
         :rtype: list
-        :return: A list tuples containing price and timestamp.
+        :return: A list tuples containing price and timestamp.  If the
+            response is truncated, its ``next_token`` attribute is set.
         """
         params = {}
         if start_time:
@@ -999,9 +1013,27 @@ class EC2Connection(AWSQueryConnection):
             params['ProductDescription'] = product_description
         if availability_zone:
             params['AvailabilityZone'] = availability_zone
+        if max_results:
+            params['MaxResults'] = max_results
+        if next_token:
+            params['NextToken'] = next_token
         return self.get_list('DescribeSpotPriceHistory', params,
                              [('item', SpotPriceHistory)], verb='POST')
 
+    def spot_price_aggregator(self, cache_path=None):
+        """
+        Create a :class:`boto.ec2.spotprice.SpotPriceAggregator` that
+        streams the spot price history into compact time series.
+
+        :type cache_path: str
+        :param cache_path: A file where the series are saved, so that
+            later runs only download the new price changes.
+
+        :rtype: :class:`boto.ec2.spotprice.SpotPriceAggregator`
+        """
+        from boto.ec2.spotprice import SpotPriceAggregator
+        return SpotPriceAggregator(self, cache_path)
+
     def request_spot_instances(self, price, image_id, count=1, type='one-time',
                                valid_from=None, valid_until=None,
                                launch_group=None, availability_zone_group=None,
@@ -1546,7 +1578,7 @@ class EC2Connection(AWSQueryConnection):
         if filters:
             self.build_filter_params(params, filters)
         return self.get_list('DescribeVolumes', params,
-                             [('item', Volume)], verb='POST')
+                             [('item', self.VolumeClass)], verb='POST')
 
     def get_all_volume_status(self, volume_ids=None,
                               max_results=None, next_token=None,
@@ -1803,7 +1835,7 @@ class EC2Connection(AWSQueryConnection):
         if filters:
             self.build_filter_params(params, filters)
         return self.get_list('DescribeSnapshots', params,
-                             [('item', Snapshot)], verb='POST')
+                             [('item', self.SnapshotClass)], verb='POST')
 
     def create_snapshot(self, volume_id, description=None):
         """
@@ -2204,7 +2236,8 @@ class EC2Connection(AWSQueryConnection):
             self.build_filter_params(params, filters)
 
         return self.get_list('DescribeSecurityGroups', params,
-                             [('item', SecurityGroup)], verb='POST')
+                             [('item', self.SecurityGroupClass)],
+                             verb='POST')
 
     def create_security_group(self, name, description, vpc_id=None):
         """
@@ -3233,6 +3266,63 @@ class EC2Connection(AWSQueryConnection):
         self.build_tag_param_list(params, tags)
         return self.get_status('DeleteTags', params, verb='POST')
 
+    def apply_tags(self, desired, current=None, replace=False,
+                   num_threads=4):
+        """
+        Bring the tags of many resources to a desired state.
+
+        The desired tags of each resource are compared with its known
+        tags, and the resources needing the same changes are tagged
+        together, with up to 200 resources per CreateTags or DeleteTags
+        request.  The requests are made concurrently.  The TagSet of
+        the objects passed is updated as the requests succeed.
+
+        :type desired: dict
+        :param desired: The tags each resource should have, keyed by
+            resource id or by :class:`boto.ec2.ec2object.TaggedEC2Object`,
+            whose ``tags`` are taken as its current tags.
+
+        :type current: dict
+        :param current: The current tags of resources, keyed by id,
+            e.g. from :meth:`boto.ec2.inventory.Inventory.get_tags`.
+            The tags of resources given by id with no current tags are
+            all created.
+
+        :type replace: bool
+        :param replace: Whether to delete the current tags that are not
+            in the desired tags.
+
+        :type num_threads: int
+        :param num_threads: The number of concurrent requests.
+
+        :rtype: :class:`boto.ec2.tagging.TagResult`
+        """
+        from boto.ec2.tagging import tag_resources
+        return tag_resources(self, desired, current, replace, num_threads)
+
+    def get_inventory(self, path=None, max_age=None, collections=None):
+        """
+        Return an indexed copy of the instances, volumes, security
+        groups and tags of the region.
+
+        :type path: str
+        :param path: A file in which the inventory is saved.  If it
+            holds a recent enough snapshot, no request is made.
+
+        :type max_age: int
+        :param max_age: The maximum age in seconds of a snapshot read
+            from ``path``.  By default any snapshot is used.
+
+        :type collections: list
+        :param collections: The names of the collections to load, any
+            of 'instances', 'volumes', 'security_groups' and 'tags'.
+            Defaults to all of them.
+
+        :rtype: :class:`boto.ec2.inventory.Inventory`
+        """
+        from boto.ec2.inventory import load_inventory
+        return load_inventory(self, path, max_age, collections)
+
     # Network Interface methods
 
     def get_all_network_interfaces(self, filters=None):
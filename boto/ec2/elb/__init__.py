@@ -379,6 +379,21 @@ class ELBConnection(AWSQueryConnection):
         return self.get_list('DescribeInstanceHealth', params,
                              [('member', InstanceState)])
 
+    def health_monitor(self, load_balancer_names=None, **kwargs):
+        """
+        Create a :class:`boto.ec2.elb.health.HealthMonitor` that polls
+        the health of many load balancers concurrently and reports
+        only the changes of state.
+
+        :type load_balancer_names: list
+        :param load_balancer_names: The load balancers to monitor, by
+            default all of them.
+
+        :rtype: :class:`boto.ec2.elb.health.HealthMonitor`
+        """
+        from boto.ec2.elb.health import HealthMonitor
+        return HealthMonitor(self, load_balancer_names, **kwargs)
+
     def configure_health_check(self, name, health_check):
         """
         Define a health check for the EndPoints.
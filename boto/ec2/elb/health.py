@@ -0,0 +1,264 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+"""
+Monitor the health of the instances of many load balancers at once.
+"""
+import logging
+import threading
+import time
+import Queue
+
+
+_END_SENTINEL = object()
+log = logging.getLogger('boto.ec2.elb.health')
+
+
+class HealthEvent(object):
+    """
+    A change of the state of an instance behind a load balancer.
+
+    :ivar load_balancer_name: The name of the load balancer.
+    :ivar instance_id: The id of the instance.
+    :ivar old_state: The previous state, e.g. ``'InService'``, or None
+        the first time the instance is seen.
+    :ivar new_state: The new state, or None if the instance is no
+        longer registered with the load balancer.
+    :ivar reason_code: The ReasonCode of the new state.
+    :ivar description: The Description of the new state.
+    :ivar timestamp: The time the change was seen, in seconds since
+        the epoch.
+    """
+
+    def __init__(self, load_balancer_name, instance_id, old_state,
+                 new_state, reason_code=None, description=None,
+                 timestamp=None):
+        self.load_balancer_name = load_balancer_name
+        self.instance_id = instance_id
+        self.old_state = old_state
+        self.new_state = new_state
+        self.reason_code = reason_code
+        self.description = description
+        if timestamp is None:
+            timestamp = time.time()
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return 'HealthEvent(%s, %s, %s -> %s)' % (
+            self.load_balancer_name, self.instance_id, self.old_state,
+            self.new_state)
+
+
+class HealthMonitor(object):
+    """
+    Polls DescribeInstanceHealth for many load balancers with a
+    bounded pool of threads and reports the changes of state.
+
+    The last known :class:`boto.ec2.elb.instancestate.InstanceState`
+    of each (load balancer, instance) is kept in ``states``, and each
+    poll returns a :class:`HealthEvent` only for the instances whose
+    state changed, appeared or were deregistered.  A load balancer
+    whose poll fails keeps its last known states and its error is kept
+    in ``errors`` until it is polled successfully again.
+
+    The monitor can also poll in a background thread every
+    ``interval`` seconds and pass each event to ``handler``.
+
+    :ivar states: The last known InstanceState, keyed by
+        ``(load_balancer_name, instance_id)``.
+    :ivar errors: The exception of the last poll of each load balancer
+        that failed, keyed by name.
+    :ivar polls: The number of complete polls.
+    """
+
+    def __init__(self, connection, load_balancer_names=None, num_threads=10,
+                 interval=30, handler=None):
+        """
+        :type connection: :class:`boto.ec2.elb.ELBConnection`
+        :param connection: The connection used to poll.
+
+        :type load_balancer_names: list
+        :param load_balancer_names: The load balancers to monitor.  If
+            not given, all the load balancers of the region are
+            monitored, listed again on each poll.
+
+        :type num_threads: int
+        :param num_threads: The maximum number of concurrent requests.
+
+        :type interval: int|float
+        :param interval: The number of seconds between the start of
+            two polls made by the background thread.
+
+        :type handler: callable
+        :param handler: Called with each :class:`HealthEvent` by the
+            background thread.
+        """
+        self.connection = connection
+        self.load_balancer_names = load_balancer_names
+        self.num_threads = num_threads
+        self.interval = interval
+        self.handler = handler
+        self.states = {}
+        self.errors = {}
+        self.polls = 0
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def __repr__(self):
+        return 'HealthMonitor(%d instances)' % len(self.states)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_load_balancer_names(self):
+        """Return the names of the load balancers to poll."""
+        if self.load_balancer_names is not None:
+            return list(self.load_balancer_names)
+        return [lb.name for lb in self.connection.get_all_load_balancers()]
+
+    def get_state(self, load_balancer_name, instance_id):
+        """Return the last known state of an instance, or None."""
+        state = self.states.get((load_balancer_name, instance_id))
+        if state is None:
+            return None
+        return state.state
+
+    def _describe_all(self, names):
+        results = {}
+        pending = Queue.Queue()
+        for name in names:
+            pending.put(name)
+
+        def work():
+            while True:
+                name = pending.get()
+                if name is _END_SENTINEL:
+                    return
+                try:
+                    result = self.connection.describe_instance_health(name)
+                except Exception, e:
+                    log.error('Unable to describe the health of %s: %s',
+                              name, e)
+                    result = e
+                self._lock.acquire()
+                try:
+                    results[name] = result
+                finally:
+                    self._lock.release()
+
+        threads = []
+        for _ in xrange(min(self.num_threads, len(names))):
+            pending.put(_END_SENTINEL)
+            thread = threading.Thread(target=work)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        return results
+
+    def _diff(self, name, instance_states, now):
+        events = []
+        seen = set()
+        for state in instance_states:
+            key = (name, state.instance_id)
+            seen.add(key)
+            previous = self.states.get(key)
+            self.states[key] = state
+            if previous is None or previous.state != state.state:
+                old_state = None
+                if previous is not None:
+                    old_state = previous.state
+                events.append(HealthEvent(name, state.instance_id,
+                                          old_state, state.state,
+                                          state.reason_code,
+                                          state.description, now))
+        for key in [key for key in self.states
+                    if key[0] == name and key not in seen]:
+            previous = self.states.pop(key)
+            events.append(HealthEvent(name, key[1], previous.state, None,
+                                      timestamp=now))
+        return events
+
+    def poll(self):
+        """
+        Describe the health of every load balancer once.
+
+        :rtype: list
+        :return: The :class:`HealthEvent` of the changes since the
+            previous poll, sorted by load balancer and instance.
+        """
+        names = self.get_load_balancer_names()
+        results = self._describe_all(names)
+        now = time.time()
+        events = []
+        for name in sorted(results):
+            result = results[name]
+            if isinstance(result, Exception):
+                self.errors[name] = result
+                continue
+            self.errors.pop(name, None)
+            events.extend(self._diff(name, result, now))
+        if self.load_balancer_names is None:
+            gone = set(key[0] for key in self.states) - set(names)
+            for name in sorted(gone):
+                events.extend(self._diff(name, [], now))
+                self.errors.pop(name, None)
+        self.polls += 1
+        events.sort(key=lambda event: (event.load_balancer_name,
+                                       event.instance_id))
+        return events
+
+    def start(self):
+        """Start polling in a background thread and return."""
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._poll_loop)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def close(self):
+        """Stop the background thread after its current poll."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _poll_loop(self):
+        while not self._stopping.is_set():
+            started = time.time()
+            try:
+                events = self.poll()
+            except Exception:
+                log.exception('Error polling the load balancers')
+                events = []
+            for event in events:
+                if self.handler is None:
+                    continue
+                try:
+                    self.handler(event)
+                except Exception:
+                    log.exception('Error handling %r', event)
+            self._stopping.wait(max(0, started + self.interval -
+                                    time.time()))
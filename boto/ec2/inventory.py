@@ -0,0 +1,484 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+"""
+A local, indexed copy of the instances, volumes, security groups and
+tags of an EC2 region.
+"""
+import cPickle
+import os
+import threading
+import time
+
+from boto.connection import AWSAuthConnection
+
+
+SNAPSHOT_VERSION = 1
+"""The version of the format written by :meth:`Inventory.save`"""
+
+
+def _describe_instances(connection, filters):
+    instances = []
+    for reservation in connection.get_all_instances(filters=filters):
+        instances.extend(reservation.instances)
+    return instances
+
+
+def _describe_volumes(connection, filters):
+    return connection.get_all_volumes(filters=filters)
+
+
+def _describe_security_groups(connection, filters):
+    return connection.get_all_security_groups(filters=filters)
+
+
+class _Collection(object):
+
+    def __init__(self, name, describe, id_filter, fields,
+                 transitional=None):
+        self.name = name
+        self.describe = describe
+        self.id_filter = id_filter
+        self.fields = fields
+        self.transitional = transitional
+
+
+COLLECTIONS = {
+    'instances': _Collection(
+        'instances', _describe_instances, 'instance-id',
+        {'zone': 'placement', 'state': 'state', 'vpc_id': 'vpc_id'},
+        {'instance-state-name': ['pending', 'stopping', 'shutting-down']}),
+    'volumes': _Collection(
+        'volumes', _describe_volumes, 'volume-id',
+        {'zone': 'zone', 'state': 'status'},
+        {'status': ['creating', 'deleting']}),
+    'security_groups': _Collection(
+        'security_groups', _describe_security_groups, 'group-id',
+        {'vpc_id': 'vpc_id'}),
+}
+"""The collections held by an inventory, and how they are described"""
+
+
+def _object_tags(obj):
+    tags = getattr(obj, 'tags', None)
+    if tags is None:
+        return None
+    if isinstance(tags, dict):
+        return dict(tags)
+    # Volumes collect their tagSet as a list of Tag objects.
+    return dict((tag.name, tag.value) for tag in tags)
+
+
+class _SnapshotPickler(object):
+    """
+    Replaces the connections referenced by the objects of a snapshot
+    with a placeholder, and the placeholder with the connection of the
+    inventory when the snapshot is read.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def persistent_id(self, obj):
+        if isinstance(obj, AWSAuthConnection):
+            return 'connection'
+        return None
+
+    def persistent_load(self, pid):
+        if pid == 'connection':
+            return self.connection
+        raise cPickle.UnpicklingError('Unknown reference %r' % pid)
+
+    def dump(self, data, fp):
+        pickler = cPickle.Pickler(fp, 2)
+        pickler.persistent_id = self.persistent_id
+        pickler.dump(data)
+
+    def load(self, fp):
+        unpickler = cPickle.Unpickler(fp)
+        unpickler.persistent_load = self.persistent_load
+        return unpickler.load()
+
+
+class Inventory(object):
+    """
+    Holds the instances, volumes, security groups and tags of the
+    region of an :class:`boto.ec2.connection.EC2Connection`, indexed
+    by id, tag, availability zone, state and VPC.
+
+    :meth:`load` describes every collection once.  Afterwards
+    :meth:`refresh` updates only the objects matching a list of ids or
+    a filter, and :meth:`refresh_transitional` only the objects that
+    are changing state, so the inventory can be kept current with a
+    fraction of the requests and parsing of full describes.  The
+    inventory can be saved to disk with :meth:`save` and read back
+    with :meth:`open`.
+
+    :ivar loaded: The time each collection was last fully described,
+        keyed by collection name.
+    """
+
+    def __init__(self, connection):
+        """
+        :type connection: :class:`boto.ec2.connection.EC2Connection`
+        :param connection: The connection used to describe the
+            objects, and attached to the objects read from a snapshot.
+        """
+        self.connection = connection
+        self.loaded = {}
+        self._objects = dict((name, {}) for name in COLLECTIONS)
+        self._tags = {}
+        self._indexes = dict((name, {}) for name in COLLECTIONS)
+        self._keys = {}
+        self._lock = threading.RLock()
+
+    def __repr__(self):
+        return 'Inventory(%s)' % ', '.join(
+            '%d %s' % (len(self._objects[name]), name)
+            for name in sorted(COLLECTIONS))
+
+    def __len__(self):
+        return sum(len(objects) for objects in self._objects.values())
+
+    def __contains__(self, resource_id):
+        return self.get(resource_id) is not None
+
+    def age(self, collection):
+        """
+        Return the number of seconds since ``collection`` was last
+        fully described, or None if it never was.
+        """
+        if collection not in self.loaded:
+            return None
+        return time.time() - self.loaded[collection]
+
+    def _index_keys(self, collection, obj):
+        keys = []
+        for field, attr in COLLECTIONS[collection].fields.iteritems():
+            value = getattr(obj, attr, None)
+            if value:
+                keys.append((field, value))
+        for name, value in self._tags.get(obj.id, {}).iteritems():
+            keys.append(('tag-key', name))
+            keys.append(('tag', (name, value)))
+        return keys
+
+    def _unindex(self, collection, resource_id):
+        index = self._indexes[collection]
+        for key in self._keys.pop(resource_id, ()):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(resource_id)
+                if not ids:
+                    del index[key]
+
+    def _index(self, collection, obj):
+        self._unindex(collection, obj.id)
+        keys = self._index_keys(collection, obj)
+        index = self._indexes[collection]
+        for key in keys:
+            index.setdefault(key, set()).add(obj.id)
+        self._keys[obj.id] = keys
+
+    def _put(self, collection, obj):
+        tags = _object_tags(obj)
+        if tags is not None:
+            self._tags[obj.id] = tags
+        self._objects[collection][obj.id] = obj
+        self._index(collection, obj)
+
+    def _remove(self, collection, resource_id):
+        self._unindex(collection, resource_id)
+        self._objects[collection].pop(resource_id, None)
+
+    def _reindex(self, resource_id):
+        for collection, objects in self._objects.iteritems():
+            obj = objects.get(resource_id)
+            if obj is not None:
+                self._index(collection, obj)
+
+    def _set_tags(self, tags, resource_ids=None):
+        by_resource = {}
+        for tag in tags:
+            by_resource.setdefault(tag.res_id, {})[tag.name] = tag.value
+        if resource_ids is None:
+            resource_ids = set(self._tags) | set(by_resource)
+        for resource_id in resource_ids:
+            resource_tags = by_resource.get(resource_id)
+            if resource_tags:
+                self._tags[resource_id] = resource_tags
+            else:
+                self._tags.pop(resource_id, None)
+            self._reindex(resource_id)
+
+    def load(self, collections=None):
+        """
+        Fully describe the collections, replacing what the inventory
+        holds.
+
+        :type collections: list
+        :param collections: The names of the collections to load, any
+            of 'instances', 'volumes', 'security_groups' and 'tags'.
+            Defaults to all of them.
+        """
+        if collections is None:
+            collections = sorted(COLLECTIONS) + ['tags']
+        for name in collections:
+            if name == 'tags':
+                tags = self.connection.get_all_tags()
+                self._lock.acquire()
+                try:
+                    self._set_tags(tags)
+                finally:
+                    self._lock.release()
+            else:
+                objects = COLLECTIONS[name].describe(self.connection, None)
+                self._lock.acquire()
+                try:
+                    for resource_id in self._objects[name].keys():
+                        self._remove(name, resource_id)
+                    for obj in objects:
+                        self._put(name, obj)
+                finally:
+                    self._lock.release()
+            self.loaded[name] = time.time()
+
+    def refresh(self, collection, ids=None, filters=None):
+        """
+        Describe the objects of a collection matching ``ids`` or
+        ``filters`` and update them in the inventory.  Objects listed
+        in ``ids`` that are no longer described are removed.
+
+        :type collection: str
+        :param collection: 'instances', 'volumes', 'security_groups'
+            or 'tags'.  The tags are refreshed by resource id.
+
+        :type ids: list
+        :param ids: The ids of the objects to refresh.
+
+        :type filters: dict
+        :param filters: EC2 filters selecting the objects to refresh.
+
+        :rtype: int
+        :return: The number of objects described.
+        """
+        filters = dict(filters or {})
+        if collection == 'tags':
+            if ids:
+                filters['resource-id'] = list(ids)
+            tags = self.connection.get_all_tags(filters=filters or None)
+            self._lock.acquire()
+            try:
+                self._set_tags(tags, ids or set(t.res_id for t in tags))
+            finally:
+                self._lock.release()
+            return len(tags)
+        spec = COLLECTIONS[collection]
+        if ids:
+            filters[spec.id_filter] = list(ids)
+        objects = spec.describe(self.connection, filters or None)
+        self._lock.acquire()
+        try:
+            for obj in objects:
+                self._put(collection, obj)
+            if ids:
+                found = set(obj.id for obj in objects)
+                for resource_id in ids:
+                    if resource_id not in found:
+                        self._remove(collection, resource_id)
+        finally:
+            self._lock.release()
+        return len(objects)
+
+    def refresh_transitional(self):
+        """
+        Refresh the instances and volumes that the inventory holds in
+        a transitional state, such as 'pending' or 'creating', with
+        one request per collection.
+
+        :rtype: int
+        :return: The number of objects described.
+        """
+        count = 0
+        for name in sorted(COLLECTIONS):
+            spec = COLLECTIONS[name]
+            if spec.transitional is None:
+                continue
+            ((field, states),) = spec.transitional.items()
+            attr = COLLECTIONS[name].fields['state']
+            self._lock.acquire()
+            try:
+                ids = [obj.id for obj in self._objects[name].values()
+                       if getattr(obj, attr, None) in states]
+            finally:
+                self._lock.release()
+            if ids:
+                count += self.refresh(name, ids=ids)
+        return count
+
+    def get(self, resource_id):
+        """Return the object with the given id, or None."""
+        for objects in self._objects.values():
+            obj = objects.get(resource_id)
+            if obj is not None:
+                return obj
+        return None
+
+    def get_tags(self, resource_id):
+        """Return a dict of the tags of a resource."""
+        return dict(self._tags.get(resource_id, {}))
+
+    def find(self, collection, tags=None, zone=None, state=None,
+             vpc_id=None):
+        """
+        Return the objects of a collection matching every criterion
+        given, from the indexes.
+
+        :type collection: str
+        :param collection: 'instances', 'volumes' or 'security_groups'.
+
+        :type tags: dict
+        :param tags: The tags the objects must have.  A value of None
+            matches any value of the tag.
+
+        :type zone: str
+        :param zone: The availability zone of the objects.
+
+        :type state: str
+        :param state: The state of the instances, or the status of the
+            volumes.
+
+        :type vpc_id: str
+        :param vpc_id: The VPC of the objects.
+
+        :rtype: list
+        """
+        keys = []
+        for name, value in (tags or {}).iteritems():
+            if value is None:
+                keys.append(('tag-key', name))
+            else:
+                keys.append(('tag', (name, value)))
+        for field, value in (('zone', zone), ('state', state),
+                             ('vpc_id', vpc_id)):
+            if value is not None:
+                keys.append((field, value))
+        self._lock.acquire()
+        try:
+            objects = self._objects[collection]
+            if not keys:
+                return objects.values()
+            index = self._indexes[collection]
+            matches = None
+            for key in keys:
+                ids = index.get(key, set())
+                if matches is None:
+                    matches = set(ids)
+                else:
+                    matches &= ids
+                if not matches:
+                    return []
+            return [objects[resource_id] for resource_id in matches]
+        finally:
+            self._lock.release()
+
+    def save(self, path):
+        """
+        Write the inventory to ``path``.  The file is replaced
+        atomically, so concurrent readers see either snapshot.
+        """
+        self._lock.acquire()
+        try:
+            data = {'version': SNAPSHOT_VERSION,
+                    'objects': self._objects,
+                    'tags': self._tags,
+                    'loaded': self.loaded}
+            tmp_path = '%s.%d.tmp' % (path, os.getpid())
+            fp = open(tmp_path, 'wb')
+            try:
+                _SnapshotPickler(self.connection).dump(data, fp)
+            finally:
+                fp.close()
+        finally:
+            self._lock.release()
+        os.rename(tmp_path, path)
+
+    @classmethod
+    def open(cls, connection, path):
+        """
+        Read an inventory saved with :meth:`save`.  The objects of the
+        inventory are attached to ``connection``.
+
+        :rtype: :class:`Inventory`
+        """
+        fp = open(path, 'rb')
+        try:
+            data = _SnapshotPickler(connection).load(fp)
+        finally:
+            fp.close()
+        if data.get('version') != SNAPSHOT_VERSION:
+            raise ValueError('Unsupported inventory snapshot version: %r' %
+                             data.get('version'))
+        inventory = cls(connection)
+        inventory._tags = data['tags']
+        inventory.loaded = data['loaded']
+        for name, objects in data['objects'].iteritems():
+            for obj in objects.itervalues():
+                inventory._objects[name][obj.id] = obj
+                inventory._index(name, obj)
+        return inventory
+
+
+def load_inventory(connection, path=None, max_age=None, collections=None):
+    """
+    Return the inventory of the region of ``connection``.
+
+    If ``path`` names a snapshot whose collections were all loaded
+    less than ``max_age`` seconds ago, it is used as is.  Otherwise
+    the missing or stale collections are described and, if ``path``
+    is given, the snapshot is written.
+
+    :type collections: list
+    :param collections: The names of the collections needed, any of
+        'instances', 'volumes', 'security_groups' and 'tags'.  Defaults
+        to all of them.  Other collections of a snapshot are kept
+        but not described.
+
+    :rtype: :class:`Inventory`
+    """
+    if collections is None:
+        collections = sorted(COLLECTIONS) + ['tags']
+    inventory = None
+    if path is not None and os.path.exists(path):
+        inventory = Inventory.open(connection, path)
+        stale = []
+        for name in collections:
+            age = inventory.age(name)
+            if age is None or (max_age is not None and age >= max_age):
+                stale.append(name)
+        if not stale:
+            return inventory
+        collections = stale
+    if inventory is None:
+        inventory = Inventory(connection)
+    inventory.load(collections)
+    if path is not None:
+        inventory.save(path)
+    return inventory
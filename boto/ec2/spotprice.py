@@ -0,0 +1,364 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+"""
+Stream the spot price history into compact time series and summarize
+them over time buckets.
+"""
+import bisect
+import calendar
+import cPickle
+import datetime
+import os
+import time
+from array import array
+
+from boto.utils import parse_ts
+
+
+CACHE_VERSION = 1
+"""The version of the format written by :meth:`SpotPriceAggregator.save`"""
+
+
+def to_epoch(value):
+    """
+    Return the number of seconds since the epoch of a datetime, an
+    ISO8601 string or a number of seconds.
+    """
+    if isinstance(value, basestring):
+        value = parse_ts(value)
+    if isinstance(value, datetime.datetime):
+        return (calendar.timegm(value.utctimetuple()) +
+                value.microsecond / 1e6)
+    return float(value)
+
+
+def _format_ts(epoch):
+    return time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(epoch))
+
+
+class BucketStats(object):
+    """
+    The prices in effect during a time bucket.
+
+    The price of a series changes at each point of the history and
+    holds until the next one, so the mean and percentiles are weighted
+    by the time each price was in effect.
+
+    :ivar start: The start of the bucket, a UTC datetime.
+    :ivar end: The end of the bucket, a UTC datetime.
+    :ivar minimum: The lowest price in effect.
+    :ivar maximum: The highest price in effect.
+    :ivar mean: The time-weighted mean price.
+    :ivar percentiles: A dict of the time-weighted percentiles, keyed
+        by percentile, e.g. ``{50: 0.031, 90: 0.045}``.
+    :ivar changes: The number of price changes within the bucket.
+    """
+
+    def __init__(self, start, end, minimum, maximum, mean, percentiles,
+                 changes):
+        self.start = start
+        self.end = end
+        self.minimum = minimum
+        self.maximum = maximum
+        self.mean = mean
+        self.percentiles = percentiles
+        self.changes = changes
+
+    def __repr__(self):
+        return 'BucketStats(%s, min=%s, max=%s, mean=%.4f)' % (
+            self.start, self.minimum, self.maximum, self.mean)
+
+
+class PriceSeries(object):
+    """
+    The price history of an instance type in an availability zone for
+    a product, stored as two arrays of doubles sorted by time.
+    """
+
+    def __init__(self, instance_type, availability_zone,
+                 product_description):
+        self.instance_type = instance_type
+        self.availability_zone = availability_zone
+        self.product_description = product_description
+        self.timestamps = array('d')
+        self.prices = array('d')
+
+    def __repr__(self):
+        return 'PriceSeries(%s, %s, %s, %d points)' % (
+            self.instance_type, self.availability_zone,
+            self.product_description, len(self))
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def key(self):
+        return (self.instance_type, self.availability_zone,
+                self.product_description)
+
+    def add(self, timestamp, price):
+        """
+        Add a price change at ``timestamp`` seconds since the epoch.
+
+        :rtype: bool
+        :return: False if the series already had a price at that time.
+        """
+        timestamps = self.timestamps
+        if not timestamps or timestamp > timestamps[-1]:
+            timestamps.append(timestamp)
+            self.prices.append(price)
+            return True
+        i = bisect.bisect_left(timestamps, timestamp)
+        if timestamps[i] == timestamp:
+            self.prices[i] = price
+            return False
+        timestamps.insert(i, timestamp)
+        self.prices.insert(i, price)
+        return True
+
+    def price_at(self, when):
+        """Return the price in effect at ``when``, or None."""
+        i = bisect.bisect_right(self.timestamps, to_epoch(when)) - 1
+        if i < 0:
+            return None
+        return self.prices[i]
+
+    def _segments(self, start, end):
+        timestamps = self.timestamps
+        i = bisect.bisect_right(timestamps, start) - 1
+        if i < 0:
+            i = 0
+        segments = []
+        n = len(timestamps)
+        while i < n and timestamps[i] < end:
+            seg_start = max(start, timestamps[i])
+            seg_end = end
+            if i + 1 < n:
+                seg_end = min(end, timestamps[i + 1])
+            if seg_end > seg_start:
+                segments.append((self.prices[i], seg_end - seg_start))
+            i += 1
+        return segments
+
+    def stats(self, start, end, percentiles=(50, 90, 99)):
+        """
+        Return the :class:`BucketStats` of the prices in effect from
+        ``start`` to ``end``, or None if no price was known then.
+        """
+        start = to_epoch(start)
+        end = to_epoch(end)
+        segments = self._segments(start, end)
+        if not segments:
+            return None
+        total = sum(duration for _, duration in segments)
+        mean = sum(price * duration for price, duration in segments) / total
+        segments.sort()
+        values = {}
+        for percentile in percentiles:
+            threshold = total * percentile / 100.0
+            elapsed = 0
+            for price, duration in segments:
+                elapsed += duration
+                if elapsed >= threshold:
+                    break
+            values[percentile] = price
+        lo = bisect.bisect_left(self.timestamps, start)
+        hi = bisect.bisect_left(self.timestamps, end)
+        return BucketStats(datetime.datetime.utcfromtimestamp(start),
+                           datetime.datetime.utcfromtimestamp(end),
+                           segments[0][0], segments[-1][0], mean, values,
+                           hi - lo)
+
+    def buckets(self, start, end, size, percentiles=(50, 90, 99)):
+        """
+        Return the :class:`BucketStats` of consecutive buckets of
+        ``size`` seconds from ``start`` to ``end``.  Buckets with no
+        known price are None.
+        """
+        start = to_epoch(start)
+        end = to_epoch(end)
+        buckets = []
+        while start < end:
+            bucket_end = min(end, start + size)
+            buckets.append(self.stats(start, bucket_end, percentiles))
+            start = bucket_end
+        return buckets
+
+
+class SpotPriceAggregator(object):
+    """
+    Downloads the spot price history page by page and adds each page
+    to per (instance type, availability zone, product) series, so the
+    full history is never held as SpotPriceHistory objects.
+
+    The time window downloaded for each combination of filters is
+    remembered and, when a ``cache_path`` is given, saved with the
+    series.  Later updates only download the parts of the requested
+    window that were not downloaded before, typically the new tail.
+
+    :ivar requests: The number of DescribeSpotPriceHistory requests made.
+    :ivar windows: The ``(start, end)`` epoch times downloaded, keyed
+        by ``(instance_type, product_description, availability_zone)``
+        filters.
+    """
+
+    def __init__(self, connection, cache_path=None, page_size=1000):
+        """
+        :type connection: :class:`boto.ec2.connection.EC2Connection`
+        :param connection: The connection used to read the history.
+
+        :type cache_path: str
+        :param cache_path: A file holding the series and windows
+            downloaded by previous runs, rewritten after each update.
+
+        :type page_size: int
+        :param page_size: The number of price changes per request.
+        """
+        self.connection = connection
+        self.cache_path = cache_path
+        self.page_size = page_size
+        self.requests = 0
+        self.series = {}
+        self.windows = {}
+        if cache_path is not None and os.path.exists(cache_path):
+            self.load(cache_path)
+
+    def __repr__(self):
+        return 'SpotPriceAggregator(%d series)' % len(self.series)
+
+    def _add(self, history):
+        key = (history.instance_type, history.availability_zone,
+               history.product_description)
+        series = self.series.get(key)
+        if series is None:
+            series = PriceSeries(*key)
+            self.series[key] = series
+        return series.add(to_epoch(history.timestamp), history.price)
+
+    def _fetch(self, start, end, instance_type, product_description,
+               availability_zone):
+        added = 0
+        next_token = None
+        while True:
+            page = self.connection.get_spot_price_history(
+                start_time=_format_ts(start), end_time=_format_ts(end),
+                instance_type=instance_type,
+                product_description=product_description,
+                availability_zone=availability_zone,
+                max_results=self.page_size, next_token=next_token)
+            self.requests += 1
+            for history in page:
+                if self._add(history):
+                    added += 1
+            next_token = getattr(page, 'next_token', None)
+            if not next_token or not len(page):
+                return added
+
+    def update(self, start_time, end_time=None, instance_type=None,
+               product_description=None, availability_zone=None):
+        """
+        Download the price changes from ``start_time`` to ``end_time``
+        (by default now) that are not already known.
+
+        :type start_time: datetime or str
+        :param start_time: The start of the window, a UTC datetime or
+            an ISO8601 string.
+
+        :rtype: int
+        :return: The number of price changes added.
+        """
+        start = to_epoch(start_time)
+        if end_time is None:
+            end = time.time()
+        else:
+            end = to_epoch(end_time)
+        filters = (instance_type, product_description, availability_zone)
+        window = self.windows.get(filters)
+        if window is None:
+            ranges = [(start, end)]
+            window = (start, end)
+        else:
+            # The window must stay contiguous, so a range that does not
+            # overlap it is extended to its edge, fetching the gap too.
+            ranges = []
+            if start < window[0]:
+                ranges.append((start, window[0]))
+            if end > window[1]:
+                ranges.append((window[1], end))
+            window = (min(start, window[0]), max(end, window[1]))
+        added = 0
+        for range_start, range_end in ranges:
+            added += self._fetch(range_start, range_end, *filters)
+        self.windows[filters] = window
+        if self.cache_path is not None and ranges:
+            self.save(self.cache_path)
+        return added
+
+    def get_series(self, instance_type, availability_zone,
+                   product_description):
+        """Return a :class:`PriceSeries`, or None."""
+        return self.series.get((instance_type, availability_zone,
+                                product_description))
+
+    def find(self, instance_type=None, availability_zone=None,
+             product_description=None):
+        """Return the series matching every criterion given."""
+        matches = []
+        for key, series in sorted(self.series.iteritems()):
+            for criterion, value in zip((instance_type, availability_zone,
+                                         product_description), key):
+                if criterion is not None and criterion != value:
+                    break
+            else:
+                matches.append(series)
+        return matches
+
+    def save(self, path):
+        """Write the series and windows to ``path``, atomically."""
+        data = {'version': CACHE_VERSION,
+                'windows': self.windows,
+                'series': [(series.key, series.timestamps, series.prices)
+                           for series in self.series.itervalues()]}
+        tmp_path = '%s.%d.tmp' % (path, os.getpid())
+        fp = open(tmp_path, 'wb')
+        try:
+            cPickle.dump(data, fp, 2)
+        finally:
+            fp.close()
+        os.rename(tmp_path, path)
+
+    def load(self, path):
+        """Read the series and windows saved by :meth:`save`."""
+        fp = open(path, 'rb')
+        try:
+            data = cPickle.load(fp)
+        finally:
+            fp.close()
+        if data.get('version') != CACHE_VERSION:
+            raise ValueError('Unsupported spot price cache version: %r' %
+                             data.get('version'))
+        self.windows = data['windows']
+        self.series = {}
+        for key, timestamps, prices in data['series']:
+            series = PriceSeries(*key)
+            series.timestamps = timestamps
+            series.prices = prices
+            self.series[key] = series
@@ -0,0 +1,298 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+"""
+Bring the tags of many EC2 resources or Auto Scaling groups to a
+desired state with few requests.
+"""
+import logging
+import threading
+import Queue
+
+from boto.ec2.autoscale.tag import Tag as AutoScaleTag
+from boto.ec2.tag import Tag, TagSet
+
+
+MAX_TAG_RESOURCES = 200
+"""The maximum number of resources sent in one CreateTags request"""
+
+MAX_AUTOSCALE_TAGS = 50
+"""The maximum number of tags sent in one Auto Scaling request"""
+
+_END_SENTINEL = object()
+log = logging.getLogger('boto.ec2.tagging')
+
+
+class TagResult(object):
+    """
+    The outcome of a bulk tagging operation.
+
+    :ivar requests: The number of requests made.
+    :ivar created: The number of tags created or updated.
+    :ivar deleted: The number of tags deleted.
+    :ivar errors: A list of ``(resource_ids, exception)`` for the
+        requests that failed.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.created = 0
+        self.deleted = 0
+        self.errors = []
+
+    def __repr__(self):
+        return 'TagResult(%d requests, %d created, %d deleted, %d errors)' % (
+            self.requests, self.created, self.deleted, len(self.errors))
+
+
+class _Call(object):
+
+    def __init__(self, func, args, resource_ids, created=0, deleted=0,
+                 on_success=None):
+        self.func = func
+        self.args = args
+        self.resource_ids = resource_ids
+        self.created = created
+        self.deleted = deleted
+        self.on_success = on_success
+
+
+def _run_calls(calls, num_threads):
+    result = TagResult()
+    lock = threading.Lock()
+    pending = Queue.Queue()
+    for call in calls:
+        pending.put(call)
+
+    def work():
+        while True:
+            call = pending.get()
+            if call is _END_SENTINEL:
+                return
+            try:
+                call.func(*call.args)
+            except Exception, e:
+                log.error('Unable to tag %s: %s',
+                          ', '.join(call.resource_ids), e)
+                error = (call.resource_ids, e)
+            else:
+                error = None
+            lock.acquire()
+            try:
+                result.requests += 1
+                if error is None:
+                    result.created += call.created
+                    result.deleted += call.deleted
+                    if call.on_success is not None:
+                        try:
+                            call.on_success()
+                        except Exception:
+                            log.exception('Unable to update the tags of %s',
+                                          ', '.join(call.resource_ids))
+                else:
+                    result.errors.append(error)
+            finally:
+                lock.release()
+
+    threads = []
+    for _ in xrange(min(num_threads, len(calls))):
+        pending.put(_END_SENTINEL)
+        thread = threading.Thread(target=work)
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return result
+
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in xrange(0, len(items), size)]
+
+
+def tags_to_dict(tags):
+    """
+    Return the tags of a resource as a ``{name: value}`` dict.  Most
+    resources hold a :class:`boto.ec2.tag.TagSet`, but volumes hold a
+    list of :class:`boto.ec2.tag.Tag` objects.
+    """
+    if tags is None:
+        return {}
+    if isinstance(tags, dict):
+        return dict(tags)
+    return dict((tag.name, tag.value) for tag in tags)
+
+
+def _set_tags(obj, tags):
+    if obj.tags is None:
+        obj.tags = TagSet()
+    if isinstance(obj.tags, dict):
+        obj.tags.update(tags)
+        return
+    by_name = dict((tag.name, tag) for tag in obj.tags)
+    for name, value in sorted(tags.iteritems()):
+        if name in by_name:
+            by_name[name].value = value
+        else:
+            obj.tags.append(Tag(obj.connection, obj.id, name=name,
+                                value=value))
+
+
+def _remove_tags(obj, names):
+    if obj.tags is None:
+        return
+    if isinstance(obj.tags, dict):
+        for name in names:
+            obj.tags.pop(name, None)
+    else:
+        obj.tags[:] = [tag for tag in obj.tags if tag.name not in names]
+
+
+def diff_tags(current, desired, replace=False):
+    """
+    Return the tags of ``desired`` that are missing from, or differ
+    in, ``current``, and if ``replace`` is True the sorted names of
+    the tags of ``current`` missing from ``desired``.
+
+    :rtype: tuple
+    :return: ``(tags_to_create, names_to_delete)``
+    """
+    create = dict((name, value) for name, value in desired.iteritems()
+                  if name not in current or current[name] != value)
+    delete = []
+    if replace:
+        delete = sorted(name for name in current if name not in desired)
+    return create, delete
+
+
+def tag_resources(connection, desired, current=None, replace=False,
+                  num_threads=4):
+    """
+    Set the tags of many EC2 resources, see
+    :meth:`boto.ec2.connection.EC2Connection.apply_tags`.
+    """
+    current = current or {}
+    objects = {}
+    creates = {}
+    deletes = {}
+    for resource, tags in desired.iteritems():
+        if isinstance(resource, basestring):
+            resource_id = resource
+            known = current.get(resource_id)
+        else:
+            resource_id = resource.id
+            objects.setdefault(resource_id, []).append(resource)
+            known = current.get(resource_id)
+            if known is None:
+                known = tags_to_dict(resource.tags)
+        create, delete = diff_tags(known or {}, tags, replace)
+        if create:
+            key = tuple(sorted(create.iteritems()))
+            creates.setdefault(key, []).append(resource_id)
+        if delete:
+            deletes.setdefault(tuple(delete), []).append(resource_id)
+
+    def created(resource_ids, tags):
+        def update():
+            for resource_id in resource_ids:
+                for obj in objects.get(resource_id, ()):
+                    _set_tags(obj, tags)
+        return update
+
+    def deleted(resource_ids, names):
+        def update():
+            for resource_id in resource_ids:
+                for obj in objects.get(resource_id, ()):
+                    _remove_tags(obj, names)
+        return update
+
+    calls = []
+    for key, resource_ids in sorted(creates.iteritems()):
+        tags = dict(key)
+        for chunk in _chunks(sorted(set(resource_ids)), MAX_TAG_RESOURCES):
+            calls.append(_Call(connection.create_tags, (chunk, tags), chunk,
+                               created=len(chunk) * len(tags),
+                               on_success=created(chunk, tags)))
+    for names, resource_ids in sorted(deletes.iteritems()):
+        for chunk in _chunks(sorted(set(resource_ids)), MAX_TAG_RESOURCES):
+            calls.append(_Call(connection.delete_tags, (chunk, list(names)),
+                               chunk, deleted=len(chunk) * len(names),
+                               on_success=deleted(chunk, names)))
+    return _run_calls(calls, num_threads)
+
+
+def _autoscale_value(value, propagate_at_launch):
+    if isinstance(value, tuple):
+        return value
+    return (value, propagate_at_launch)
+
+
+def tag_groups(connection, desired, replace=False, propagate_at_launch=False,
+               num_threads=4):
+    """
+    Set the tags of many Auto Scaling groups, see
+    :meth:`boto.ec2.autoscale.AutoScaleConnection.apply_tags`.
+    """
+    creates = []
+    deletes = []
+    groups = {}
+    for group, tags in desired.iteritems():
+        if isinstance(group, basestring):
+            name = group
+            known = {}
+        else:
+            name = group.name
+            groups[name] = group
+            known = dict((tag.key, (tag.value, tag.propagate_at_launch))
+                         for tag in group.tags or [])
+        tags = dict((key, _autoscale_value(value, propagate_at_launch))
+                    for key, value in tags.iteritems())
+        create, delete = diff_tags(known, tags, replace)
+        for key, (value, propagate) in sorted(create.iteritems()):
+            creates.append(AutoScaleTag(connection, key, value, propagate,
+                                        name))
+        for key in delete:
+            deletes.append(AutoScaleTag(connection, key, known[key][0],
+                                        known[key][1], name))
+
+    def updated(tags, delete):
+        def update():
+            for tag in tags:
+                group = groups.get(tag.resource_id)
+                if group is None:
+                    continue
+                kept = [t for t in group.tags or [] if t.key != tag.key]
+                if not delete:
+                    kept.append(tag)
+                group.tags = kept
+        return update
+
+    calls = []
+    for chunk in _chunks(creates, MAX_AUTOSCALE_TAGS):
+        names = sorted(set(tag.resource_id for tag in chunk))
+        calls.append(_Call(connection.create_or_update_tags, (chunk,), names,
+                           created=len(chunk),
+                           on_success=updated(chunk, False)))
+    for chunk in _chunks(deletes, MAX_AUTOSCALE_TAGS):
+        names = sorted(set(tag.resource_id for tag in chunk))
+        calls.append(_Call(connection.delete_tags, (chunk,), names,
+                           deleted=len(chunk),
+                           on_success=updated(chunk, True)))
+    return _run_calls(calls, num_threads)
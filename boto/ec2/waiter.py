@@ -0,0 +1,68 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+"""
+Register the EC2 instances, volumes, snapshots and images with the
+:class:`boto.waiter.Waiter`, described with filtered requests.
+"""
+from boto.ec2.image import Image
+from boto.ec2.instance import Instance
+from boto.ec2.snapshot import Snapshot
+from boto.ec2.volume import Volume
+from boto.waiter import ResourceType, Waiter, wait_for
+from boto.waiter import register_resource_type, get_resource_type
+
+
+MAX_FILTER_VALUES = 200
+"""The maximum number of values sent in a single Describe filter"""
+
+
+def _describe_instances(connection, ids):
+    found = {}
+    for reservation in connection.get_all_instances(
+            filters={'instance-id': ids}):
+        for instance in reservation.instances:
+            found[instance.id] = instance
+    return found
+
+
+def _describe_volumes(connection, ids):
+    volumes = connection.get_all_volumes(filters={'volume-id': ids})
+    return dict((volume.id, volume) for volume in volumes)
+
+
+def _describe_snapshots(connection, ids):
+    snapshots = connection.get_all_snapshots(filters={'snapshot-id': ids})
+    return dict((snapshot.id, snapshot) for snapshot in snapshots)
+
+
+def _describe_images(connection, ids):
+    images = connection.get_all_images(filters={'image-id': ids})
+    return dict((image.id, image) for image in images)
+
+
+register_resource_type(Instance, 'state', _describe_instances,
+                       batch_size=MAX_FILTER_VALUES)
+register_resource_type(Volume, 'status', _describe_volumes,
+                       batch_size=MAX_FILTER_VALUES)
+register_resource_type(Snapshot, 'status', _describe_snapshots,
+                       batch_size=MAX_FILTER_VALUES)
+register_resource_type(Image, 'state', _describe_images,
+                       batch_size=MAX_FILTER_VALUES)
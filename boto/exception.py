@@ -231,6 +231,35 @@ class SQSDecodeError(BotoClientError):
     def __str__(self):
         return 'SQSDecodeError: %s' % self.reason
 
+class WaiterError(BotoClientError):
+    """
+    Error when resources did not reach the states they were waited for.
+    """
+    def __init__(self, reason, pending, failed):
+        BotoClientError.__init__(self, reason, pending, failed)
+        self.pending = pending
+        self.failed = failed
+
+    def __repr__(self):
+        return 'WaiterError: %s' % self.reason
+
+    def __str__(self):
+        return 'WaiterError: %s' % self.reason
+
+class RegionTimeoutError(BotoClientError):
+    """
+    Error when a call made in a region did not complete in time.
+    """
+    def __init__(self, reason, region):
+        BotoClientError.__init__(self, reason, region)
+        self.region = region
+
+    def __repr__(self):
+        return 'RegionTimeoutError: %s' % self.reason
+
+    def __str__(self):
+        return 'RegionTimeoutError: %s' % self.reason
+
 class StorageResponseError(BotoServerError):
     """
     Error in response from a storage service.
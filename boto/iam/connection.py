@@ -1315,3 +1315,24 @@ class IAMConnection(AWSQueryConnection):
         return self.get_response('UpdateAssumeRolePolicy',
                                  {'RoleName': role_name,
                                   'PolicyDocument': policy_document})
+
+    def get_graph(self, state_path=None, max_age=None, **kwargs):
+        """
+        Return a :class:`boto.iam.graph.IAMGraph` of the users, groups,
+        policies and access keys of the account, synced with
+        :meth:`boto.iam.graph.IAMGraph.sync`.
+
+        :type state_path: str
+        :param state_path: A file in which the graph is kept between
+            runs, so that only the changed principals are loaded.
+
+        :type max_age: int
+        :param max_age: Also reload the principals loaded at least
+            ``max_age`` seconds ago.
+
+        :rtype: :class:`boto.iam.graph.IAMGraph`
+        """
+        from boto.iam.graph import IAMGraph
+        graph = IAMGraph(self, state_path, **kwargs)
+        graph.sync(max_age)
+        return graph
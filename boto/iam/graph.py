@@ -0,0 +1,448 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+"""
+Load the users, groups, policies and access keys of an account into
+an in-memory graph with concurrent, paced requests.
+"""
+import logging
+import os
+import threading
+import time
+import urllib
+import Queue
+
+from boto.compat import json
+from boto.utils import TokenBucket
+
+
+STATE_VERSION = 1
+"""The version of the state written by :meth:`IAMGraph.save`"""
+
+_END_SENTINEL = object()
+log = logging.getLogger('boto.iam.graph')
+
+
+def get_result(response):
+    """
+    Return the ``<Action>Result`` element of a response returned by
+    :meth:`boto.iam.connection.IAMConnection.get_response`.
+    """
+    for key, value in response.iteritems():
+        if key.endswith('_response'):
+            for result_key, result in value.iteritems():
+                if result_key.endswith('_result'):
+                    return result
+    return {}
+
+
+def iter_items(method, list_key, page_size=None, *args, **kwargs):
+    """
+    Call a paged method of :class:`boto.iam.connection.IAMConnection`
+    with ``marker`` until the response is no longer truncated and
+    yield the items of its ``list_key`` list.
+    """
+    marker = None
+    while True:
+        result = get_result(method(marker=marker, max_items=page_size,
+                                   *args, **kwargs))
+        for item in result.get(list_key) or []:
+            yield item
+        marker = result.get('marker')
+        if result.get('is_truncated') != 'true' or not marker:
+            return
+
+
+def decode_policy(document):
+    """
+    Return the policy document of a response, URL-decoded and parsed,
+    or the decoded text if it is not valid JSON.
+    """
+    text = urllib.unquote(document)
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+class UserNode(object):
+    """
+    A user, with the names of its groups, its inline policies and its
+    access keys.
+
+    :ivar policies: The policy documents of the user, keyed by policy
+        name; the documents are None unless they are loaded.
+    :ivar groups: The names of the groups of the user.
+    :ivar access_keys: A list of dicts with the ``access_key_id``,
+        ``status`` and ``create_date`` of each access key.
+    :ivar loaded_at: The time the node was loaded, in seconds since
+        the epoch.
+    """
+
+    def __init__(self, name, user_id=None, arn=None, path=None,
+                 create_date=None, policies=None, groups=None,
+                 access_keys=None, loaded_at=None):
+        self.name = name
+        self.user_id = user_id
+        self.arn = arn
+        self.path = path
+        self.create_date = create_date
+        self.policies = policies or {}
+        self.groups = groups or []
+        self.access_keys = access_keys or []
+        self.loaded_at = loaded_at
+
+    def __repr__(self):
+        return 'UserNode(%s)' % self.name
+
+
+class GroupNode(object):
+    """
+    A group and its inline policies.  Its members are found with
+    :meth:`IAMGraph.get_members`.
+    """
+
+    def __init__(self, name, group_id=None, arn=None, path=None,
+                 create_date=None, policies=None, loaded_at=None):
+        self.name = name
+        self.group_id = group_id
+        self.arn = arn
+        self.path = path
+        self.create_date = create_date
+        self.policies = policies or {}
+        self.loaded_at = loaded_at
+
+    def __repr__(self):
+        return 'GroupNode(%s)' % self.name
+
+
+class IAMGraph(object):
+    """
+    The users, groups, policies and access keys of an account.
+
+    :meth:`sync` lists the users and groups, with automatic paging,
+    and loads the details of each principal that is new, was deleted
+    and created again, failed to load or, with ``max_age``, was loaded
+    too long ago.  The details of a principal take several list
+    requests (policies, groups, access keys, and one GetUserPolicy or
+    GetGroupPolicy per policy document), so principals are loaded
+    concurrently by a pool of threads and every request first takes a
+    token from a bucket refilled at ``rate`` requests per second.
+
+    With a ``state_path``, the graph is saved after each sync and
+    loaded again when the graph is created, so the next run only loads
+    the principals that changed.  IAM has no modification time for
+    principals, so changes it cannot see in the listing, such as an
+    edited policy, are picked up with ``max_age`` or :meth:`refresh`.
+
+    :ivar users: The :class:`UserNode` objects, keyed by name.
+    :ivar groups: The :class:`GroupNode` objects, keyed by name.
+    :ivar errors: The exception of each principal that failed to
+        load, keyed by ``('user', name)`` or ``('group', name)``.
+    :ivar requests: The number of requests made.
+    """
+
+    def __init__(self, connection, state_path=None, num_threads=8, rate=10,
+                 page_size=None, policy_documents=True):
+        """
+        :type connection: :class:`boto.iam.connection.IAMConnection`
+        :param connection: The connection used to load the graph.
+
+        :type state_path: str
+        :param state_path: A file holding the graph of a previous run,
+            rewritten after each sync.
+
+        :type num_threads: int
+        :param num_threads: The number of principals loaded at once.
+
+        :type rate: float
+        :param rate: The maximum number of requests per second, or
+            None for no limit.
+
+        :type page_size: int
+        :param page_size: The MaxItems of each list request.
+
+        :type policy_documents: bool
+        :param policy_documents: Whether to load the policy documents
+            or only the policy names.
+        """
+        self.connection = connection
+        self.state_path = state_path
+        self.num_threads = num_threads
+        self.page_size = page_size
+        self.policy_documents = policy_documents
+        self.users = {}
+        self.groups = {}
+        self.errors = {}
+        self.requests = 0
+        self._bucket = TokenBucket(rate)
+        self._lock = threading.Lock()
+        if state_path is not None and os.path.exists(state_path):
+            self.load(state_path)
+
+    def __repr__(self):
+        return 'IAMGraph(%d users, %d groups)' % (len(self.users),
+                                                  len(self.groups))
+
+    def _call(self, method, *args, **kwargs):
+        self._bucket.acquire()
+        self._lock.acquire()
+        try:
+            self.requests += 1
+        finally:
+            self._lock.release()
+        return method(*args, **kwargs)
+
+    def _items(self, method, list_key, *args):
+        def paced(*args, **kwargs):
+            return self._call(method, *args, **kwargs)
+        return list(iter_items(paced, list_key, self.page_size, *args))
+
+    def _policies(self, list_method, get_method, name):
+        policies = {}
+        for policy_name in self._items(list_method, 'policy_names', name):
+            document = None
+            if self.policy_documents:
+                result = get_result(self._call(get_method, name,
+                                               policy_name))
+                document = decode_policy(result['policy_document'])
+            policies[policy_name] = document
+        return policies
+
+    def _load_user(self, summary):
+        name = summary['user_name']
+        conn = self.connection
+        groups = self._items(conn.get_groups_for_user, 'groups', name)
+        keys = self._items(conn.get_all_access_keys, 'access_key_metadata',
+                           name)
+        return UserNode(
+            name, summary.get('user_id'), summary.get('arn'),
+            summary.get('path'), summary.get('create_date'),
+            self._policies(conn.get_all_user_policies,
+                           conn.get_user_policy, name),
+            sorted(group['group_name'] for group in groups),
+            [{'access_key_id': key.get('access_key_id'),
+              'status': key.get('status'),
+              'create_date': key.get('create_date')} for key in keys],
+            time.time())
+
+    def _load_group(self, summary):
+        name = summary['group_name']
+        conn = self.connection
+        return GroupNode(
+            name, summary.get('group_id'), summary.get('arn'),
+            summary.get('path'), summary.get('create_date'),
+            self._policies(conn.get_all_group_policies,
+                           conn.get_group_policy, name),
+            time.time())
+
+    def _load_all(self, users, groups):
+        tasks = [('user', summary) for summary in users]
+        tasks.extend(('group', summary) for summary in groups)
+        pending = Queue.Queue()
+        for task in tasks:
+            pending.put(task)
+
+        def work():
+            while True:
+                task = pending.get()
+                if task is _END_SENTINEL:
+                    return
+                kind, summary = task
+                name = summary['%s_name' % kind]
+                try:
+                    if kind == 'user':
+                        node = self._load_user(summary)
+                    else:
+                        node = self._load_group(summary)
+                except Exception, e:
+                    log.error('Unable to load %s %s: %s', kind, name, e)
+                    node = e
+                self._lock.acquire()
+                try:
+                    if isinstance(node, Exception):
+                        self.errors[(kind, name)] = node
+                    else:
+                        self.errors.pop((kind, name), None)
+                        if kind == 'user':
+                            self.users[name] = node
+                        else:
+                            self.groups[name] = node
+                finally:
+                    self._lock.release()
+
+        threads = []
+        for _ in xrange(min(self.num_threads, len(tasks))):
+            pending.put(_END_SENTINEL)
+            thread = threading.Thread(target=work)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        return [(kind, summary['%s_name' % kind]) for kind, summary in tasks]
+
+    def _is_stale(self, kind, node, summary, id_key, max_age, now):
+        if node is None or (kind, node.name) in self.errors:
+            return True
+        if getattr(node, id_key) != summary.get(id_key):
+            return True
+        return max_age is not None and now - node.loaded_at >= max_age
+
+    def sync(self, max_age=None):
+        """
+        List the users and groups, forget the deleted ones and load
+        the details of the principals that changed.
+
+        :type max_age: int|float
+        :param max_age: Also reload the principals loaded at least
+            ``max_age`` seconds ago; 0 reloads everything.
+
+        :rtype: list
+        :return: The ``(kind, name)`` of the principals loaded, kind
+            being ``'user'`` or ``'group'``.
+        """
+        conn = self.connection
+        users = self._items(conn.get_all_users, 'users')
+        groups = self._items(conn.get_all_groups, 'groups')
+        now = time.time()
+        for kind, nodes, summaries in (('user', self.users, users),
+                                       ('group', self.groups, groups)):
+            names = set(summary['%s_name' % kind] for summary in summaries)
+            for name in nodes.keys():
+                if name not in names:
+                    del nodes[name]
+            for key in self.errors.keys():
+                if key[0] == kind and key[1] not in names:
+                    del self.errors[key]
+        stale_users = [summary for summary in users
+                       if self._is_stale('user',
+                                         self.users.get(summary['user_name']),
+                                         summary, 'user_id', max_age, now)]
+        stale_groups = [summary for summary in groups
+                        if self._is_stale('group',
+                                          self.groups.get(
+                                              summary['group_name']),
+                                          summary, 'group_id', max_age, now)]
+        loaded = self._load_all(stale_users, stale_groups)
+        self._save()
+        return loaded
+
+    def refresh(self, user_names=(), group_names=()):
+        """
+        Load the details of the given principals again, for instance
+        when a change is known from another source.  Principals that
+        no longer exist are removed.
+        """
+        conn = self.connection
+        users = []
+        groups = []
+        for name in user_names:
+            try:
+                result = get_result(self._call(conn.get_user, name))
+            except conn.ResponseError, e:
+                if e.status != 404:
+                    raise
+                self.users.pop(name, None)
+                self.errors.pop(('user', name), None)
+            else:
+                users.append(result['user'])
+        for name in group_names:
+            try:
+                result = get_result(self._call(conn.get_group, name,
+                                               max_items=1))
+            except conn.ResponseError, e:
+                if e.status != 404:
+                    raise
+                self.groups.pop(name, None)
+                self.errors.pop(('group', name), None)
+            else:
+                groups.append(result['group'])
+        loaded = self._load_all(users, groups)
+        self._save()
+        return loaded
+
+    def get_members(self, group_name):
+        """Return the sorted names of the users of a group."""
+        return sorted(user.name for user in self.users.itervalues()
+                      if group_name in user.groups)
+
+    def get_effective_policies(self, user_name):
+        """
+        Return the inline policies that apply to a user, as a list of
+        ``(principal, policy_name, document)``, principal being
+        ``'user:<name>'`` or ``'group:<name>'``.
+        """
+        user = self.users[user_name]
+        policies = [('user:%s' % user.name, name, document)
+                    for name, document in sorted(user.policies.items())]
+        for group_name in user.groups:
+            group = self.groups.get(group_name)
+            if group is None:
+                continue
+            policies.extend(('group:%s' % group.name, name, document)
+                            for name, document in
+                            sorted(group.policies.items()))
+        return policies
+
+    def find_access_key(self, access_key_id):
+        """Return the :class:`UserNode` owning an access key, or None."""
+        for user in self.users.itervalues():
+            for key in user.access_keys:
+                if key['access_key_id'] == access_key_id:
+                    return user
+        return None
+
+    def _save(self):
+        if self.state_path is not None:
+            self.save(self.state_path)
+
+    def save(self, path):
+        """Write the graph to ``path``, atomically."""
+        data = {'version': STATE_VERSION,
+                'users': [vars(user) for user in self.users.itervalues()],
+                'groups': [vars(group)
+                           for group in self.groups.itervalues()]}
+        tmp_path = '%s.%d.tmp' % (path, os.getpid())
+        fp = open(tmp_path, 'w')
+        try:
+            json.dump(data, fp)
+        finally:
+            fp.close()
+        os.rename(tmp_path, path)
+
+    def load(self, path):
+        """Read a graph saved by :meth:`save`."""
+        fp = open(path)
+        try:
+            data = json.load(fp)
+        finally:
+            fp.close()
+        if data.get('version') != STATE_VERSION:
+            raise ValueError('Unsupported IAM graph state version: %r' %
+                             data.get('version'))
+        self.users = {}
+        for attrs in data['users']:
+            user = UserNode(**dict((str(k), v) for k, v in attrs.items()))
+            self.users[user.name] = user
+        self.groups = {}
+        for attrs in data['groups']:
+            group = GroupNode(**dict((str(k), v) for k, v in attrs.items()))
+            self.groups[group.name] = group
@@ -0,0 +1,234 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+"""
+Run the same call in every region of a service, concurrently.
+"""
+import inspect
+import logging
+import threading
+import time
+import Queue
+
+from boto.exception import RegionTimeoutError
+
+
+log = logging.getLogger('boto.multiregion')
+
+
+class RegionResults(object):
+    """
+    Iterates over the ``(region_name, result)`` pairs of a call made
+    in several regions, in the order the regions complete.
+
+    Regions whose call raised an exception or did not complete within
+    the timeout are not returned by the iteration; their exception,
+    or a :class:`boto.exception.RegionTimeoutError`, is stored in
+    ``errors`` instead.
+
+    :ivar errors: A dict of the exceptions of the regions that failed,
+        keyed by region name.
+    """
+
+    def __init__(self, executor, region_names, func, args, kwargs, timeout):
+        self.errors = {}
+        self._pending = set(region_names)
+        self._results = Queue.Queue()
+        self._deadline = None
+        if timeout is not None:
+            self._deadline = time.time() + timeout
+        for name in region_names:
+            thread = threading.Thread(target=self._call,
+                                      args=(executor, name, func, args,
+                                            kwargs))
+            thread.daemon = True
+            thread.start()
+
+    def __repr__(self):
+        return 'RegionResults(%d pending, %d errors)' % (
+            len(self._pending), len(self.errors))
+
+    def _call(self, executor, name, func, args, kwargs):
+        try:
+            connection = executor.get_connection(name)
+            result = func(connection, *args, **kwargs)
+        except Exception, e:
+            log.exception('Error calling %r in %s', func, name)
+            self._results.put((name, None, e))
+        else:
+            self._results.put((name, result, None))
+
+    @property
+    def pending(self):
+        """The names of the regions that have not completed."""
+        return sorted(self._pending)
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        while self._pending:
+            timeout = None
+            if self._deadline is not None:
+                timeout = max(0, self._deadline - time.time())
+            try:
+                name, result, error = self._results.get(timeout=timeout)
+            except Queue.Empty:
+                for name in self._pending:
+                    self.errors[name] = RegionTimeoutError(
+                        'No response from %s' % name, name)
+                self._pending.clear()
+                break
+            self._pending.discard(name)
+            if error is None:
+                return name, result
+            self.errors[name] = error
+        raise StopIteration
+
+    def results(self):
+        """
+        Wait for every region and return a dict of their results,
+        keyed by region name.
+        """
+        return dict(self)
+
+
+class RegionExecutor(object):
+    """
+    Runs calls in every region of a service concurrently.
+
+    The regions of the service and the connections to them are
+    created the first time they are needed and reused by later calls,
+    so repeated sweeps do not pay for the region lookup (which is a
+    request for EC2) or for new connections.  Connections are shared
+    by the threads of concurrent calls, as connections are thread
+    safe.
+
+    For example, to list the instances of every EC2 region::
+
+        import boto.ec2
+        from boto.multiregion import RegionExecutor
+
+        executor = RegionExecutor(boto.ec2, timeout=30)
+        for region_name, reservations in executor.call('get_all_instances'):
+            print region_name, len(reservations)
+    """
+
+    def __init__(self, service, region_names=None, timeout=None,
+                 **kw_params):
+        """
+        :type service: module or callable
+        :param service: A service module such as ``boto.ec2`` or
+            ``boto.rds``, or a function returning a list of
+            :class:`boto.regioninfo.RegionInfo`, like their
+            ``regions`` functions.
+
+        :type region_names: list
+        :param region_names: The names of the regions to call.
+            Defaults to every region of the service.
+
+        :type timeout: int|float
+        :param timeout: The default number of seconds a region has to
+            complete a call.
+
+        The other keyword arguments are passed to the ``connect``
+        method of the regions, e.g. credentials.
+        """
+        self.regions_func = getattr(service, 'regions', service)
+        self.region_names = region_names
+        self.timeout = timeout
+        self.kw_params = kw_params
+        self._regions = None
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'RegionExecutor(%s)' % ', '.join(self.get_region_names())
+
+    def _load_regions(self):
+        spec = inspect.getargspec(self.regions_func)
+        if spec.keywords:
+            regions = self.regions_func(**self.kw_params)
+        else:
+            regions = self.regions_func()
+        if self.region_names is not None:
+            regions = [r for r in regions if r.name in self.region_names]
+        return dict((region.name, region) for region in regions)
+
+    def get_regions(self):
+        """
+        Return a dict of the :class:`boto.regioninfo.RegionInfo` of
+        the regions called, keyed by name.
+        """
+        self._lock.acquire()
+        try:
+            if self._regions is None:
+                self._regions = self._load_regions()
+            return self._regions
+        finally:
+            self._lock.release()
+
+    def get_region_names(self):
+        """Return the sorted names of the regions called."""
+        return sorted(self.get_regions())
+
+    def get_connection(self, region_name):
+        """Return the connection to a region, creating it if needed."""
+        region = self.get_regions()[region_name]
+        self._lock.acquire()
+        try:
+            connection = self._connections.get(region_name)
+        finally:
+            self._lock.release()
+        if connection is not None:
+            return connection
+        # Connect without holding the lock, so that the regions connect
+        # concurrently; if two threads race, the first connection stored
+        # is kept.
+        connection = region.connect(**self.kw_params)
+        self._lock.acquire()
+        try:
+            return self._connections.setdefault(region_name, connection)
+        finally:
+            self._lock.release()
+
+    def map(self, func, *args, **kwargs):
+        """
+        Call ``func(connection, *args, **kwargs)`` with the connection
+        of every region, concurrently.
+
+        A ``timeout`` keyword argument overrides the timeout of the
+        executor for this call.
+
+        :rtype: :class:`RegionResults`
+        :return: An iterator over ``(region_name, result)`` pairs.
+        """
+        timeout = kwargs.pop('timeout', self.timeout)
+        return RegionResults(self, self.get_region_names(), func, args,
+                             kwargs, timeout)
+
+    def call(self, method_name, *args, **kwargs):
+        """
+        Call the method ``method_name`` of the connection of every
+        region, concurrently, see :meth:`map`.
+        """
+        def call_method(connection, *args, **kwargs):
+            return getattr(connection, method_name)(*args, **kwargs)
+        return self.map(call_method, *args, **kwargs)
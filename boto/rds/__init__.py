@@ -1184,3 +1184,18 @@ class RDSConnection(AWSQueryConnection):
         if marker:
             params['Marker'] = marker
         return self.get_list('DescribeEvents', params, [('Event', Event)])
+
+    def harvester(self, state_path=None, **kwargs):
+        """
+        Create a :class:`boto.rds.harvest.Harvester` that pages events
+        and snapshots of many sources concurrently and only returns
+        the ones not returned by previous sweeps.
+
+        :type state_path: str
+        :param state_path: A file where the high-water marks are kept
+            between runs.
+
+        :rtype: :class:`boto.rds.harvest.Harvester`
+        """
+        from boto.rds.harvest import Harvester
+        return Harvester(self, state_path, **kwargs)
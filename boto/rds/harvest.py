@@ -0,0 +1,335 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+"""
+Page through RDS events, DB instances and DB snapshots concurrently
+and keep high-water marks so that repeated sweeps only return what is
+new.
+"""
+import logging
+import os
+import threading
+import Queue
+
+from boto.compat import json
+from boto.utils import Future, ISO8601_MS, parse_ts
+
+
+STATE_VERSION = 1
+"""The version of the state written by :meth:`Harvester.save`"""
+
+_END_SENTINEL = object()
+log = logging.getLogger('boto.rds.harvest')
+
+
+def iter_pages(method, page_size=100, prefetch=True, **kwargs):
+    """
+    Call a paged ``get_all_*`` method of
+    :class:`boto.rds.RDSConnection` with ``max_records`` and
+    ``marker`` until the last page and yield each record.
+
+    With ``prefetch``, the next page is requested in a background
+    thread while the records of the current one are consumed.
+    """
+    def fetch(marker, future):
+        try:
+            future.set_result(method(max_records=page_size, marker=marker,
+                                     **kwargs))
+        except Exception, e:
+            future.set_exception(e)
+
+    def request(marker):
+        future = Future()
+        if prefetch:
+            thread = threading.Thread(target=fetch, args=(marker, future))
+            thread.daemon = True
+            thread.start()
+        else:
+            fetch(marker, future)
+        return future
+
+    future = request(None)
+    while future is not None:
+        page = future.result()
+        marker = getattr(page, 'marker', None)
+        future = None
+        if marker and len(page):
+            future = request(marker)
+        for record in page:
+            yield record
+
+
+def _run_all(func, items, num_threads):
+    results = {}
+    errors = {}
+    lock = threading.Lock()
+    pending = Queue.Queue()
+    for item in items:
+        pending.put(item)
+
+    def work():
+        while True:
+            item = pending.get()
+            if item is _END_SENTINEL:
+                return
+            try:
+                result = func(item)
+            except Exception, e:
+                log.error('Unable to harvest %s: %s', item, e)
+                target, result = errors, e
+            else:
+                target = results
+            lock.acquire()
+            try:
+                target[item] = result
+            finally:
+                lock.release()
+
+    threads = []
+    for _ in xrange(min(num_threads, len(items))):
+        pending.put(_END_SENTINEL)
+        thread = threading.Thread(target=work)
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def _event_key(event):
+    return '%s|%s|%s' % (event.source_type, event.source_identifier,
+                         event.message)
+
+
+class Harvester(object):
+    """
+    Harvests the events and DB snapshots of many sources with a
+    bounded pool of threads, each source paged with ``max_records``
+    and ``marker`` and the next page prefetched.
+
+    For the events of each source the Date of the newest event seen
+    is kept as a high-water mark, and the next sweep only asks for
+    events from that date on; the events at exactly that date that
+    were already returned are skipped.  For the snapshots of each DB
+    instance the identifiers already returned are kept, as
+    DescribeDBSnapshots cannot filter by time.
+
+    The marks are saved to ``state_path``, when given, after each
+    harvest.
+
+    :ivar errors: The exception of the last harvest of each source
+        that failed, keyed by ``(kind, identifier)``.
+    """
+
+    def __init__(self, connection, state_path=None, num_threads=8,
+                 page_size=100, prefetch=True):
+        """
+        :type connection: :class:`boto.rds.RDSConnection`
+        :param connection: The connection used to harvest.
+
+        :type state_path: str
+        :param state_path: A file holding the high-water marks of
+            previous sweeps, rewritten after each harvest.
+
+        :type num_threads: int
+        :param num_threads: The maximum number of sources harvested
+            at once.
+
+        :type page_size: int
+        :param page_size: The MaxRecords of each request, at most 100.
+
+        :type prefetch: bool
+        :param prefetch: Whether the next page of a source is requested
+            while the current one is processed.
+        """
+        self.connection = connection
+        self.state_path = state_path
+        self.num_threads = num_threads
+        self.page_size = page_size
+        self.prefetch = prefetch
+        self.errors = {}
+        self.events = {}
+        self.snapshots = {}
+        self._lock = threading.Lock()
+        if state_path is not None and os.path.exists(state_path):
+            self.load(state_path)
+
+    def __repr__(self):
+        return 'Harvester(%d event sources, %d instances)' % (
+            len(self.events), len(self.snapshots))
+
+    def _pages(self, method, **kwargs):
+        return iter_pages(method, self.page_size, self.prefetch, **kwargs)
+
+    def _record_errors(self, kind, identifiers, errors):
+        self._lock.acquire()
+        try:
+            for identifier in identifiers:
+                self.errors.pop((kind, identifier), None)
+            for identifier, error in errors.iteritems():
+                self.errors[(kind, identifier)] = error
+        finally:
+            self._lock.release()
+
+    def harvest_events(self, source_identifiers=None,
+                       source_type='db-instance', start_time=None):
+        """
+        Return the events not returned by previous harvests.
+
+        :type source_identifiers: list
+        :param source_identifiers: The sources whose events are
+            harvested concurrently.  If not given, the events of all
+            sources are harvested with a single stream.
+
+        :type source_type: str
+        :param source_type: The type of the sources, e.g.
+            ``db-instance`` or ``db-snapshot``.
+
+        :type start_time: datetime
+        :param start_time: The oldest events wanted, for the sources
+            without a high-water mark yet.
+
+        :rtype: list
+        :return: The new :class:`boto.rds.event.Event` objects, oldest
+            first.
+        """
+        if source_identifiers is None:
+            identifiers = [None]
+        else:
+            identifiers = list(source_identifiers)
+
+        def harvest(identifier):
+            mark_key = '%s|%s' % (source_type, identifier or '')
+            mark = self.events.get(mark_key)
+            since = start_time
+            if mark is not None:
+                since = parse_ts(mark['date'])
+            kwargs = {'start_time': since}
+            if identifier is not None:
+                kwargs['source_identifier'] = identifier
+                kwargs['source_type'] = source_type
+            new = []
+            for event in self._pages(self.connection.get_all_events,
+                                     **kwargs):
+                if mark is not None:
+                    date = parse_ts(event.date)
+                    if date < since:
+                        continue
+                    if date == since and _event_key(event) in mark['seen']:
+                        continue
+                new.append(event)
+            return mark_key, mark, new
+
+        results, errors = _run_all(harvest, identifiers, self.num_threads)
+        self._record_errors('events', identifiers, errors)
+        events = []
+        for mark_key, mark, new in results.itervalues():
+            if new:
+                newest = max(parse_ts(event.date) for event in new)
+                seen = [_event_key(event) for event in new
+                        if parse_ts(event.date) == newest]
+                if mark is not None and parse_ts(mark['date']) == newest:
+                    seen.extend(mark['seen'])
+                self.events[mark_key] = {
+                    'date': newest.strftime(ISO8601_MS),
+                    'seen': sorted(set(seen))}
+            events.extend(new)
+        events.sort(key=lambda event: parse_ts(event.date))
+        self._save()
+        return events
+
+    def harvest_dbinstances(self):
+        """
+        Return every :class:`boto.rds.dbinstance.DBInstance`, paged
+        with prefetch.
+        """
+        return list(self._pages(self.connection.get_all_dbinstances))
+
+    def harvest_dbsnapshots(self, instance_ids=None):
+        """
+        Return the snapshots not returned by previous harvests.
+
+        :type instance_ids: list
+        :param instance_ids: The DB instances whose snapshots are
+            harvested concurrently.  If not given, the snapshots of
+            all the DB instances are harvested.
+
+        :rtype: list
+        :return: The new :class:`boto.rds.dbsnapshot.DBSnapshot`
+            objects.  Snapshots are only returned once available.
+        """
+        if instance_ids is None:
+            instance_ids = [instance.id
+                            for instance in self.harvest_dbinstances()]
+        instance_ids = list(instance_ids)
+
+        def harvest(instance_id):
+            return list(self._pages(self.connection.get_all_dbsnapshots,
+                                    instance_id=instance_id))
+
+        results, errors = _run_all(harvest, instance_ids, self.num_threads)
+        self._record_errors('snapshots', instance_ids, errors)
+        snapshots = []
+        for instance_id in instance_ids:
+            if instance_id not in results:
+                continue
+            seen = set(self.snapshots.get(instance_id, ()))
+            available = set()
+            for snapshot in results[instance_id]:
+                if snapshot.status != 'available':
+                    continue
+                available.add(snapshot.id)
+                if snapshot.id not in seen:
+                    snapshots.append(snapshot)
+            # Forget the deleted snapshots so the marks stay bounded.
+            self.snapshots[instance_id] = sorted(available)
+        self._save()
+        return snapshots
+
+    def _save(self):
+        if self.state_path is not None:
+            self.save(self.state_path)
+
+    def save(self, path):
+        """Write the high-water marks to ``path``, atomically."""
+        data = {'version': STATE_VERSION,
+                'events': self.events,
+                'snapshots': self.snapshots}
+        tmp_path = '%s.%d.tmp' % (path, os.getpid())
+        fp = open(tmp_path, 'w')
+        try:
+            json.dump(data, fp)
+        finally:
+            fp.close()
+        os.rename(tmp_path, path)
+
+    def load(self, path):
+        """Read the high-water marks saved by :meth:`save`."""
+        fp = open(path)
+        try:
+            data = json.load(fp)
+        finally:
+            fp.close()
+        if data.get('version') != STATE_VERSION:
+            raise ValueError('Unsupported RDS harvest state version: %r' %
+                             data.get('version'))
+        self.events = data['events']
+        self.snapshots = data['snapshots']
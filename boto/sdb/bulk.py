@@ -0,0 +1,399 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+"""
+Streaming bulk import and export of SimpleDB domains.
+
+Items are exchanged as ``(item_name, attributes)`` pairs, where
+``attributes`` maps each attribute name to a list of values.  Two file
+formats are supported: the XML format of :meth:`Domain.to_xml
+<boto.sdb.domain.Domain.to_xml>` and JSON lines, one
+``{"name": ..., "attributes": {...}}`` object per line.
+"""
+import logging
+import threading
+import time
+import Queue
+import xml.sax
+from xml.sax.handler import ContentHandler
+from xml.sax.saxutils import quoteattr
+
+from boto.compat import json
+from boto.exception import SDBResponseError
+
+
+MAX_BATCH_SIZE = 25
+"""The maximum number of items in a BatchPutAttributes request"""
+
+XML_FORMAT_VERSION = '2'
+"""
+The version written in the Domain element of XML dumps.  Dumps without
+a version were written with padding around the values, which is
+stripped when they are read.
+"""
+
+_END_SENTINEL = object()
+log = logging.getLogger('boto.sdb.bulk')
+
+
+def _values(value):
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def _utf8(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8', 'replace')
+    if not isinstance(value, str):
+        value = str(value)
+    return unicode(value, errors='replace').encode('utf-8', 'replace')
+
+
+class _ItemParser(ContentHandler):
+
+    def __init__(self):
+        ContentHandler.__init__(self)
+        self.items = []
+        self.strip = True
+        self.item_name = None
+        self.attrs = None
+        self.attribute = None
+        self.value = None
+
+    def startElement(self, name, attrs):
+        if name == 'Domain':
+            self.strip = attrs.get('version') is None
+        elif name == 'Item':
+            self.item_name = attrs['id']
+            self.attrs = {}
+        elif name == 'attribute':
+            self.attribute = attrs['id'].strip()
+        elif name == 'value':
+            self.value = []
+
+    def characters(self, ch):
+        if self.value is not None:
+            self.value.append(ch)
+
+    def endElement(self, name):
+        if name == 'value':
+            value = u''.join(self.value)
+            self.value = None
+            if self.strip:
+                value = value.strip()
+                if not value:
+                    return
+            self.attrs.setdefault(self.attribute, []).append(value)
+        elif name == 'Item':
+            self.items.append((self.item_name, self.attrs))
+            self.item_name = None
+            self.attrs = None
+
+
+def read_xml(fp, chunk_size=64 * 1024):
+    """
+    Yield the ``(item_name, attributes)`` of an XML dump, parsing it
+    incrementally so that only a chunk of the file is held in memory.
+    """
+    handler = _ItemParser()
+    parser = xml.sax.make_parser()
+    parser.setContentHandler(handler)
+    while True:
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            break
+        parser.feed(chunk)
+        for item in handler.items:
+            yield item
+        handler.items = []
+    parser.close()
+    for item in handler.items:
+        yield item
+
+
+def write_xml(items, fp, domain_name):
+    """
+    Write ``(item_name, attributes)`` pairs to ``fp`` in the XML dump
+    format, returning the number of items written.
+    """
+    n = 0
+    fp.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    fp.write('<Domain id=%s version="%s">\n' % (
+        quoteattr(_utf8(domain_name)), XML_FORMAT_VERSION))
+    for item_name, attrs in items:
+        fp.write('\t<Item id=%s>\n' % quoteattr(_utf8(item_name)))
+        for name, value in attrs.items():
+            fp.write('\t\t<attribute id=%s>\n' % quoteattr(_utf8(name)))
+            for v in _values(value):
+                v = _utf8(v).replace(']]>', ']]]]><![CDATA[>')
+                fp.write('\t\t\t<value><![CDATA[%s]]></value>\n' % v)
+            fp.write('\t\t</attribute>\n')
+        fp.write('\t</Item>\n')
+        n += 1
+    fp.write('</Domain>\n')
+    return n
+
+
+def read_jsonl(fp):
+    """
+    Yield the ``(item_name, attributes)`` of a JSON lines file.
+    """
+    for line in fp:
+        line = line.strip()
+        if line:
+            d = json.loads(line)
+            yield d['name'], d['attributes']
+
+
+def write_jsonl(items, fp):
+    """
+    Write ``(item_name, attributes)`` pairs to ``fp`` as JSON lines,
+    returning the number of items written.
+    """
+    n = 0
+    for item_name, attrs in items:
+        d = {'name': item_name,
+             'attributes': dict((k, _values(v)) for k, v in attrs.items())}
+        fp.write(json.dumps(d))
+        fp.write('\n')
+        n += 1
+    return n
+
+
+READERS = {'xml': read_xml, 'jsonl': read_jsonl}
+
+
+class BulkLoader(object):
+    """
+    Writes items to a domain with a fixed pool of threads, each
+    sending ``BatchPutAttributes`` requests of up to 25 items.
+
+    A request that fails with a server error or a connection error is
+    retried up to ``max_retries`` times.  BatchPutAttributes succeeds or
+    fails as a whole, so when SimpleDB rejects a batch because of the
+    items it contains, the batch is split in halves and each half is
+    written again, until the items at fault are isolated.  Only those
+    items are reported in ``errors``.
+
+    :ivar loaded: The number of items written.
+    :ivar failed: The number of items that could not be written.
+    :ivar errors: A list of ``(item_name, exception)`` for the items
+        that could not be written.
+    """
+
+    def __init__(self, domain, num_workers=4, batch_size=MAX_BATCH_SIZE,
+                 max_retries=3, replace=True, progress=None):
+        """
+        :type domain: :class:`boto.sdb.domain.Domain`
+        :param domain: The domain written to.
+
+        :type num_workers: int
+        :param num_workers: The number of concurrent requests.
+
+        :type batch_size: int
+        :param batch_size: The number of items in each request.
+
+        :type max_retries: int
+        :param max_retries: The number of times a request failing with
+            a server or connection error is retried.
+
+        :type replace: bool
+        :param replace: Whether the values replace the existing ones.
+
+        :type progress: callable
+        :param progress: Called with the number of items loaded and the
+            number of items failed so far, after each request.
+        """
+        self.domain = domain
+        self.num_workers = num_workers
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.max_retries = max_retries
+        self.replace = replace
+        self.progress = progress
+        self.loaded = 0
+        self.failed = 0
+        self.errors = []
+        self._batch = {}
+        self._batches = Queue.Queue(num_workers * 2)
+        self._lock = threading.Lock()
+        self._workers = []
+        for _ in xrange(num_workers):
+            thread = threading.Thread(target=self._work_loop)
+            thread.daemon = True
+            thread.start()
+            self._workers.append(thread)
+
+    def __repr__(self):
+        return 'BulkLoader(%s, %d loaded, %d failed)' % (
+            self.domain.name, self.loaded, self.failed)
+
+    def put(self, item_name, attrs):
+        """Queue an item to be written."""
+        if item_name in self._batch:
+            # An item name can only appear once in a batch.
+            self._flush_batch()
+        self._batch[item_name] = attrs
+        if len(self._batch) >= self.batch_size:
+            self._flush_batch()
+
+    def load(self, items):
+        """
+        Queue every ``(item_name, attributes)`` of an iterable, e.g.
+        :func:`read_xml`, and return the number of items queued.
+        """
+        n = 0
+        for item_name, attrs in items:
+            self.put(item_name, attrs)
+            n += 1
+        return n
+
+    def close(self):
+        """Write the remaining items and stop the workers."""
+        self._flush_batch()
+        for _ in self._workers:
+            self._batches.put(_END_SENTINEL)
+        for thread in self._workers:
+            thread.join()
+        self._workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _flush_batch(self):
+        if self._batch:
+            self._batches.put(self._batch)
+            self._batch = {}
+
+    def _work_loop(self):
+        while True:
+            batch = self._batches.get()
+            if batch is _END_SENTINEL:
+                return
+            self._put_batch(batch)
+
+    def _is_retryable(self, e):
+        if isinstance(e, SDBResponseError):
+            return e.status >= 500 or e.error_code == 'ServiceUnavailable'
+        return True
+
+    def _put_batch(self, batch):
+        attempt = 0
+        while True:
+            try:
+                self.domain.batch_put_attributes(batch, replace=self.replace)
+            except Exception, e:
+                if self._is_retryable(e) and attempt < self.max_retries:
+                    attempt += 1
+                    log.warning('Retrying a batch of %d items: %s',
+                                len(batch), e)
+                    time.sleep(min(0.1 * 2 ** attempt, 5))
+                    continue
+                if len(batch) > 1 and not self._is_retryable(e):
+                    names = batch.keys()
+                    half = len(names) / 2
+                    self._put_batch(dict((n, batch[n]) for n in names[:half]))
+                    self._put_batch(dict((n, batch[n]) for n in names[half:]))
+                    return
+                log.error('Unable to write %d items: %s', len(batch), e)
+                self._done(0, [(name, e) for name in batch])
+            else:
+                self._done(len(batch), [])
+            return
+
+    def _done(self, loaded, errors):
+        self._lock.acquire()
+        try:
+            self.loaded += loaded
+            self.failed += len(errors)
+            self.errors.extend(errors)
+            if self.progress is not None:
+                try:
+                    self.progress(self.loaded, self.failed)
+                except Exception:
+                    # A dead worker would leave put() and close()
+                    # blocked on the full batch queue.
+                    log.exception('Error in the progress callback')
+        finally:
+            self._lock.release()
+
+
+def load_domain(domain, fp, format='xml', **kwargs):
+    """
+    Load the items of a file into a domain with a :class:`BulkLoader`,
+    which is returned once every item was written.  The keyword
+    arguments are passed to the loader.
+    """
+    if format not in READERS:
+        raise ValueError('Unknown format: %s' % format)
+    loader = BulkLoader(domain, **kwargs)
+    try:
+        loader.load(READERS[format](fp))
+    finally:
+        loader.close()
+    return loader
+
+
+def export_domain(domain, fp, format='xml', query=None, num_threads=1,
+                  progress=None, progress_interval=1000):
+    """
+    Write the items of a domain to a file, as they are read, and
+    return the number of items written.
+
+    :type query: str
+    :param query: The select expression of the items to export.
+        Defaults to every item of the domain.
+
+    :type num_threads: int
+    :param num_threads: With more than one thread the domain is read
+        with :meth:`Domain.parallel_select
+        <boto.sdb.domain.Domain.parallel_select>`.
+
+    :type progress: callable
+    :param progress: Called with the number of items written so far,
+        every ``progress_interval`` items and at the end.
+    """
+    if query is None:
+        query = 'select * from `%s`' % domain.name
+    if num_threads > 1:
+        rs = domain.parallel_select(query, num_threads=num_threads)
+    else:
+        rs = domain.select(query)
+
+    def items():
+        n = 0
+        for item in rs:
+            yield item.name, item
+            n += 1
+            if progress is not None and not n % progress_interval:
+                progress(n)
+
+    if format == 'xml':
+        n = write_xml(items(), fp, domain.name)
+    elif format == 'jsonl':
+        n = write_jsonl(items(), fp)
+    else:
+        raise ValueError('Unknown format: %s' % format)
+    if progress is not None:
+        progress(n)
+    return n
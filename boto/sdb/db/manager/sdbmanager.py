@@ -21,12 +21,14 @@
 # IN THE SOFTWARE.
 import boto
 import re
+import urllib
 from boto.utils import find_class
 import uuid
 from boto.sdb.db.key import Key
 from boto.sdb.db.model import Model
 from boto.sdb.db.blob import Blob
 from boto.sdb.db.property import ListProperty, MapProperty
+from boto.sdb.db.session import get_session, MAX_BATCH_SIZE
 from datetime import datetime, date, time
 from boto.exception import SDBPersistenceError, S3ResponseError
 
@@ -37,6 +39,36 @@ class TimeDecodeError(Exception):
     pass
 
 
+class CodecPlan(object):
+    """
+    The encoders and decoders of the properties of a Model class,
+    resolved once by :meth:`SDBConverter.get_plan` so that converting
+    an object does not dispatch on the type of each value.
+    """
+
+    def __init__(self, converter, cls):
+        self.converter = converter
+        self.cls = cls
+        self.properties = cls.properties(hidden=False)
+        self.encoders = []
+        self.decoders = []
+        for prop in self.properties:
+            self.encoders.append((prop, converter.compile_encoder(prop)))
+            self.decoders.append((prop.name, converter.compile_decoder(prop),
+                                  prop.make_value_from_datastore))
+
+    def decode(self, attrs):
+        """
+        Return a dict of the property values decoded from the
+        attributes of an item.
+        """
+        values = {}
+        for name, decode, make_value in self.decoders:
+            if name in attrs:
+                values[name] = make_value(decode(attrs[name]))
+        return values
+
+
 class SDBConverter(object):
     """
     Responsible for converting base Python types to format compatible
@@ -67,6 +99,123 @@ class SDBConverter(object):
                          str: (self.encode_string, self.decode_string),
                       }
 
+    def get_plan(self, cls):
+        """
+        Return the :class:`CodecPlan` of a Model class, compiling it
+        the first time.  The plan is kept on the class until a property
+        is added to it.
+        """
+        plan = cls.__dict__.get('_codec_plan')
+        if plan is None or plan.converter is not self:
+            plan = CodecPlan(self, cls)
+            type.__setattr__(cls, '_codec_plan', plan)
+        return plan
+
+    def _get_encoder(self, item_type):
+        try:
+            if Model in item_type.mro():
+                item_type = Model
+        except:
+            pass
+        if item_type in self.type_map:
+            return self.type_map[item_type][0]
+        return None
+
+    def _get_element_decoder(self, item_type):
+        if Model in item_type.mro():
+            return lambda value: item_type(id=value)
+        if item_type in self.type_map:
+            return self.type_map[item_type][1]
+        return None
+
+    def compile_encoder(self, prop):
+        """
+        Return a function encoding a value of ``prop``, equivalent to
+        :meth:`encode_prop`.
+        """
+        if isinstance(prop, (ListProperty, MapProperty)):
+            encode = self._get_encoder(prop.item_type)
+
+            def encode_map(value):
+                if value == None:
+                    return None
+                if not isinstance(value, dict):
+                    raise ValueError('Expected a dict value, got %s' % type(value))
+                new_value = []
+                for key in value:
+                    encoded_value = value[key]
+                    if encode is not None:
+                        encoded_value = encode(encoded_value)
+                    if encoded_value != None:
+                        new_value.append('%s:%s' % (urllib.quote(key), encoded_value))
+                return new_value
+
+            if isinstance(prop, MapProperty):
+                return encode_map
+
+            def encode_list(value):
+                if value in (None, []):
+                    return []
+                if not isinstance(value, list):
+                    if encode is not None:
+                        return encode(value)
+                    return value
+                values = {}
+                for k, v in enumerate(value):
+                    values["%03d" % k] = v
+                return encode_map(values)
+            return encode_list
+        encode = self._get_encoder(prop.data_type)
+        if encode is None:
+            return lambda value: value
+        return encode
+
+    def compile_decoder(self, prop):
+        """
+        Return a function decoding a value of ``prop``, equivalent to
+        :meth:`decode_prop`.
+        """
+        if isinstance(prop, (ListProperty, MapProperty)):
+            decode = self._get_element_decoder(prop.item_type)
+
+            def decode_element(value):
+                key = value
+                if ":" in value:
+                    key, value = value.split(':', 1)
+                    key = urllib.unquote(key)
+                if decode is not None:
+                    value = decode(value)
+                return key, value
+
+            if isinstance(prop, MapProperty):
+                def decode_map(value):
+                    if not isinstance(value, list):
+                        value = [value]
+                    ret_value = {}
+                    for val in value:
+                        k, v = decode_element(val)
+                        ret_value[k] = v
+                    return ret_value
+                return decode_map
+
+            def decode_list(value):
+                if not isinstance(value, list):
+                    value = [value]
+                dec_val = {}
+                for val in value:
+                    if val != None:
+                        k, v = decode_element(val)
+                        try:
+                            k = int(k)
+                        except:
+                            k = v
+                        dec_val[k] = v
+                return dec_val.values()
+            return decode_list
+        if prop.data_type in self.type_map:
+            return self.type_map[prop.data_type][1]
+        return lambda value: value
+
     def encode(self, item_type, value):
         try:
             if Model in item_type.mro():
@@ -445,11 +594,29 @@ class SDBManager(object):
         if not self._domain:
             self._domain = self._sdb.create_domain(self.db_name)
 
-    def _object_lister(self, cls, query_lister):
+    def _object_lister(self, cls, query_lister, page_size=100):
+        session = get_session()
+        if session is None or not session.prefetch_references:
+            for item in query_lister:
+                obj = self.get_object(cls, item.name, item)
+                if obj:
+                    yield obj
+            return
+        # Load the objects referenced by a page of results at once
+        # rather than one by one as they are touched.
+        page = []
         for item in query_lister:
             obj = self.get_object(cls, item.name, item)
             if obj:
-                yield obj
+                page.append(obj)
+            if len(page) >= page_size:
+                session.prefetch(page)
+                for obj in page:
+                    yield obj
+                page = []
+        session.prefetch(page)
+        for obj in page:
+            yield obj
 
     def encode_value(self, prop, value):
         if value == None:
@@ -476,21 +643,52 @@ class SDBManager(object):
             self.bucket = s3.create_bucket(bucket_name)
         return self.bucket
 
+    def _load_attributes(self, obj, a):
+        if '__type__' in a:
+            plan = self.converter.get_plan(obj.__class__)
+            for name, value in plan.decode(a).iteritems():
+                try:
+                    setattr(obj, name, value)
+                except Exception, e:
+                    boto.log.exception(e)
+        obj._loaded = True
+
     def load_object(self, obj):
         if not obj._loaded:
+            session = get_session()
+            if session is not None:
+                known = session.lookup(self, obj.id)
+                if known is not None and known is not obj and known._loaded:
+                    for prop in obj.properties(hidden=False):
+                        setattr(obj, prop.slot_name,
+                                getattr(known, prop.slot_name))
+                    obj._loaded = True
+                    return
+                session.loads += 1
             a = self.domain.get_attributes(obj.id, consistent_read=self.consistent)
-            if '__type__' in a:
-                for prop in obj.properties(hidden=False):
-                    if prop.name in a:
-                        value = self.decode_value(prop, a[prop.name])
-                        value = prop.make_value_from_datastore(value)
-                        try:
-                            setattr(obj, prop.name, value)
-                        except Exception, e:
-                            boto.log.exception(e)
-            obj._loaded = True
+            self._load_attributes(obj, a)
+            if session is not None:
+                session.register(self, obj)
 
     def get_object(self, cls, id, a=None):
+        session = get_session()
+        if session is not None:
+            known = session.lookup(self, id)
+            if known is not None:
+                if known._loaded:
+                    return known
+                # An unloaded reference; fill it in rather than
+                # creating a second instance.
+                if not a:
+                    session.loads += 1
+                    a = self.domain.get_attributes(
+                        id, consistent_read=self.consistent)
+                if '__type__' not in a:
+                    return None
+                self._load_attributes(known, a)
+                return known
+            if not a:
+                session.loads += 1
         obj = None
         if not a:
             a = self.domain.get_attributes(id, consistent_read=self.consistent)
@@ -498,14 +696,11 @@ class SDBManager(object):
             if not cls or a['__type__'] != cls.__name__:
                 cls = find_class(a['__module__'], a['__type__'])
             if cls:
-                params = {}
-                for prop in cls.properties(hidden=False):
-                    if prop.name in a:
-                        value = self.decode_value(prop, a[prop.name])
-                        value = prop.make_value_from_datastore(value)
-                        params[prop.name] = value
+                params = self.converter.get_plan(cls).decode(a)
                 obj = cls(id, **params)
                 obj._loaded = True
+                if session is not None:
+                    obj = session.register(self, obj)
             else:
                 s = '(%s) class %s.%s not found' % (id, a['__module__'], a['__type__'])
                 boto.log.info('sdbmanager: %s' % s)
@@ -514,6 +709,24 @@ class SDBManager(object):
     def get_object_from_id(self, id):
         return self.get_object(None, id)
 
+    def get_objects(self, cls, ids):
+        """
+        Load the objects with these ids, at most 20, in a single
+        select request.  Ids that are not found are skipped.
+        """
+        session = get_session()
+        if session is not None:
+            session.loads += 1
+        names = ', '.join("'%s'" % id.replace("'", "''") for id in ids)
+        query = "select * from `%s` where itemName() in (%s)" % (
+            self.domain.name, names)
+        objs = []
+        for item in self.domain.select(query, consistent_read=self.consistent):
+            obj = self.get_object(cls, item.name, item)
+            if obj:
+                objs.append(obj)
+        return objs
+
     def query(self, query):
         query_str = "select * from `%s` %s" % (self.domain.name, self._build_filter_part(query.model_class, query.filters, query.sort_by, query.select))
         if query.limit:
@@ -652,15 +865,53 @@ class SDBManager(object):
     def save_object(self, obj, expected_value=None):
         if not obj.id:
             obj.id = str(uuid.uuid4())
+        session = get_session()
+        if session is not None and not expected_value:
+            session.add(obj)
+            return obj
+        attrs, del_attrs = self._get_attributes_to_save(obj)
+        # Convert the Expected value to SDB format
+        if expected_value:
+            prop = obj.find_property(expected_value[0])
+            v = expected_value[1]
+            if v is not None and not isinstance(v, bool):
+                v = self.encode_value(prop, v)
+            expected_value[1] = v
+        self.domain.put_attributes(obj.id, attrs, replace=True, expected_value=expected_value)
+        if len(del_attrs) > 0:
+            self.domain.delete_attributes(obj.id, del_attrs)
+        if session is not None:
+            session.register(self, obj)
+        return obj
 
+    def save_objects(self, objs):
+        """
+        Save objects with BatchPutAttributes requests of 25 items.
+        """
+        for i in range(0, len(objs), MAX_BATCH_SIZE):
+            items = {}
+            deletes = []
+            for obj in objs[i:i + MAX_BATCH_SIZE]:
+                if not obj.id:
+                    obj.id = str(uuid.uuid4())
+                attrs, del_attrs = self._get_attributes_to_save(obj)
+                items[obj.id] = attrs
+                if del_attrs:
+                    deletes.append((obj.id, del_attrs))
+            self.domain.batch_put_attributes(items, replace=True)
+            for id, del_attrs in deletes:
+                self.domain.delete_attributes(id, del_attrs)
+        return objs
+
+    def _get_attributes_to_save(self, obj):
         attrs = {'__type__': obj.__class__.__name__,
                  '__module__': obj.__class__.__module__,
                  '__lineage__': obj.get_lineage()}
         del_attrs = []
-        for property in obj.properties(hidden=False):
+        for property, encode in self.converter.get_plan(obj.__class__).encoders:
             value = property.get_value_for_datastore(obj)
             if value is not None:
-                value = self.encode_value(property, value)
+                value = encode(value)
             if value == []:
                 value = None
             if value == None:
@@ -675,19 +926,12 @@ class SDBManager(object):
                         raise SDBPersistenceError("Error: %s must be unique!" % property.name)
                 except(StopIteration):
                     pass
-        # Convert the Expected value to SDB format
-        if expected_value:
-            prop = obj.find_property(expected_value[0])
-            v = expected_value[1]
-            if v is not None and not isinstance(v, bool):
-                v = self.encode_value(prop, v)
-            expected_value[1] = v
-        self.domain.put_attributes(obj.id, attrs, replace=True, expected_value=expected_value)
-        if len(del_attrs) > 0:
-            self.domain.delete_attributes(obj.id, del_attrs)
-        return obj
+        return attrs, del_attrs
 
     def delete_object(self, obj):
+        session = get_session()
+        if session is not None:
+            session.discard(obj)
         self.domain.delete_attributes(obj.id)
 
     def set_property(self, prop, obj, name, value):
@@ -32,6 +32,8 @@ class ModelMeta(type):
         super(ModelMeta, cls).__init__(name, bases, dict)
         # Make sure this is a subclass of Model - mainly copied from django ModelBase (thanks!)
         cls.__sub_classes__ = []
+        cls._visible_properties = None
+        cls._codec_plan = None
         try:
             if filter(lambda b: issubclass(b, Model), bases):
                 for base in bases:
@@ -48,10 +50,32 @@ class ModelMeta(type):
                     if not prop.__class__.__name__.startswith('_'):
                         prop_names.append(prop.name)
                 setattr(cls, '_prop_names', prop_names)
+                # Compile the encoders and decoders of the properties
+                # now rather than on the first object loaded, for the
+                # managers whose converter uses plans.
+                converter = getattr(cls._manager, 'converter', None)
+                get_plan = getattr(converter, 'get_plan', None)
+                if get_plan is not None:
+                    get_plan(cls)
         except NameError:
             # 'Model' isn't defined yet, meaning we're looking at our own
             # Model class, defined below.
             pass
+
+    def __setattr__(cls, name, value):
+        super(ModelMeta, cls).__setattr__(name, value)
+        if isinstance(value, Property):
+            cls._reset_properties()
+
+    def _reset_properties(cls):
+        """
+        Drop the cached properties and codec plan of this class and its
+        subclasses, after a property was added to it.
+        """
+        type.__setattr__(cls, '_visible_properties', None)
+        type.__setattr__(cls, '_codec_plan', None)
+        for sc in cls.__dict__.get('__sub_classes__', []):
+            sc._reset_properties()
         
 class Model(object):
     __metaclass__ = ModelMeta
@@ -105,6 +129,18 @@ class Model(object):
             
     @classmethod
     def properties(cls, hidden=True):
+        if hidden:
+            return cls._find_properties(hidden)
+        # The visible properties are looked up for every object loaded
+        # or saved, so they are cached until a property is added.
+        props = cls.__dict__.get('_visible_properties')
+        if props is None:
+            props = cls._find_properties(hidden)
+            type.__setattr__(cls, '_visible_properties', props)
+        return list(props)
+
+    @classmethod
+    def _find_properties(cls, hidden):
         properties = []
         while cls:
             for key in cls.__dict__.keys():
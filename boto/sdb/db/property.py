@@ -23,6 +23,7 @@ import datetime
 from key import Key
 from boto.utils import Password
 from boto.sdb.db.query import Query
+from boto.sdb.db.session import get_session
 import re
 import boto
 import boto.s3.key
@@ -494,7 +495,11 @@ class ReferenceProperty(Property):
             # the object now that is the attribute has actually been accessed.  This lazy
             # instantiation saves unnecessary roundtrips to SimpleDB
             if isinstance(value, str) or isinstance(value, unicode):
-                value = self.reference_class(value)
+                session = get_session()
+                if session is not None:
+                    value = session.get_reference(self.reference_class, value)
+                else:
+                    value = self.reference_class(value)
                 setattr(obj, self.name, value)
             return value
 
@@ -0,0 +1,201 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+"""
+An identity map and unit of work for :mod:`boto.sdb.db` models.
+
+Within a session, every object loaded from SimpleDB is kept by id, so
+that loading it again, or following a reference to it, returns the
+same instance without a request.  When a query is iterated, the
+objects referenced by a page of results are fetched together with
+``select ... where itemName() in (...)`` requests, and objects saved
+with :meth:`Model.put <boto.sdb.db.model.Model.put>` are written in
+``BatchPutAttributes`` requests when the session is flushed::
+
+    with Session():
+        for order in Order.find(status='open'):
+            print order.customer.name
+            order.status = 'shipped'
+            order.put()
+"""
+import threading
+
+
+MAX_IN_VALUES = 20
+"""The number of item names looked up in one select request"""
+
+MAX_BATCH_SIZE = 25
+"""The maximum number of items in a BatchPutAttributes request"""
+
+_local = threading.local()
+
+
+def get_session():
+    """
+    Return the innermost session active in this thread, or None.
+    """
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        return stack[-1]
+    return None
+
+
+class Session(object):
+    """
+    Caches the objects loaded in this thread and defers their writes.
+
+    A session becomes active when it is entered with ``with`` and is
+    flushed when the block exits without an exception.  Objects saved
+    with an expected value are written immediately, since conditional
+    puts cannot be batched.
+
+    :ivar loads: The number of GetAttributes or Select requests made to
+        load objects while the session was active.
+    :ivar hits: The number of objects found in the identity map.
+    """
+
+    def __init__(self, prefetch_references=True):
+        """
+        :type prefetch_references: bool
+        :param prefetch_references: Whether iterating a query fetches
+            the objects referenced by each page of results.
+        """
+        self.prefetch_references = prefetch_references
+        self.loads = 0
+        self.hits = 0
+        self._objects = {}
+        self._dirty = []
+
+    def __repr__(self):
+        return 'Session(%d objects, %d dirty)' % (len(self._objects),
+                                                  len(self._dirty))
+
+    def __enter__(self):
+        if getattr(_local, 'stack', None) is None:
+            _local.stack = []
+        _local.stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            _local.stack.remove(self)
+
+    def _key(self, manager, id):
+        return (manager.domain.name, id)
+
+    def lookup(self, manager, id):
+        """
+        Return the object with this id in the domain of ``manager``,
+        or None if it is not in the identity map.
+        """
+        obj = self._objects.get(self._key(manager, id))
+        if obj is not None:
+            self.hits += 1
+        return obj
+
+    def register(self, manager, obj):
+        """
+        Add an object to the identity map and return the instance
+        kept for its id, which is ``obj`` unless one was already there.
+        """
+        return self._objects.setdefault(self._key(manager, obj.id), obj)
+
+    def get_reference(self, cls, id):
+        """
+        Return the instance for a referenced id, creating an unloaded
+        one, which loads itself when its properties are read, if the
+        id is not in the identity map yet.
+        """
+        manager = cls._manager
+        obj = self.lookup(manager, id)
+        if obj is None:
+            obj = self.register(manager, cls(id))
+        return obj
+
+    def add(self, obj):
+        """Schedule an object to be written at the next flush."""
+        if obj not in self._dirty:
+            self._dirty.append(obj)
+        self.register(obj._manager, obj)
+
+    def discard(self, obj):
+        """Forget an object, e.g. because it was deleted."""
+        if obj in self._dirty:
+            self._dirty.remove(obj)
+        self._objects.pop(self._key(obj._manager, obj.id), None)
+
+    def clear(self):
+        """Empty the identity map, dropping any unflushed write."""
+        self._objects = {}
+        self._dirty = []
+
+    def flush(self):
+        """
+        Write the objects saved since the last flush, grouped by
+        domain in BatchPutAttributes requests.
+        """
+        by_manager = {}
+        managers = []
+        for obj in self._dirty:
+            manager = obj._manager
+            if manager not in by_manager:
+                by_manager[manager] = []
+                managers.append(manager)
+            by_manager[manager].append(obj)
+        self._dirty = []
+        for manager in managers:
+            manager.save_objects(by_manager[manager])
+
+    def _unloaded_references(self, objs):
+        from boto.sdb.db.property import ReferenceProperty
+        pending = {}
+        for obj in objs:
+            for prop in obj.properties(hidden=False):
+                if not isinstance(prop, ReferenceProperty):
+                    continue
+                value = getattr(obj, prop.slot_name, None)
+                if isinstance(value, basestring) and value:
+                    id = value
+                elif (value is not None and getattr(value, 'id', None) and
+                      not value._loaded):
+                    id = value.id
+                else:
+                    continue
+                cls = prop.reference_class
+                known = self._objects.get(self._key(cls._manager, id))
+                if known is not None and known._loaded:
+                    continue
+                ids = pending.setdefault(cls._manager, (cls, []))[1]
+                if id not in ids:
+                    ids.append(id)
+        return pending
+
+    def prefetch(self, objs):
+        """
+        Load the objects referenced by ``objs`` that are not loaded
+        yet, with one select request per 20 ids and domain.
+        """
+        pending = self._unloaded_references(objs)
+        for manager, (cls, ids) in pending.items():
+            for i in range(0, len(ids), MAX_IN_VALUES):
+                manager.get_objects(cls, ids[i:i + MAX_IN_VALUES])
@@ -22,7 +22,11 @@
 """
 Represents an SDB Domain
 """
-from boto.sdb.queryresultset import SelectResultSet
+import boto
+from boto.sdb.queryresultset import SelectResultSet, ParallelSelectResultSet
+from boto.sdb.queryresultset import item_name_shards, default_boundaries
+from boto.sdb.queryresultset import split_query
+from boto.sdb.bulk import load_domain, export_domain
 
 class Domain:
 
@@ -206,6 +210,69 @@ class Domain:
         return SelectResultSet(self, query, max_items=max_items, next_token=next_token,
                                consistent_read=consistent_read)
 
+    def parallel_select(self, query='', shards=None, boundaries=None,
+                        num_threads=8, consistent_read=False, ordered=False,
+                        key=None, max_items=None):
+        """
+        Returns the items matching a select expression, running the
+        query as several shards concurrently.
+
+        :type query: string
+        :param query: The SimpleDB query to be performed.
+
+        :type shards: list
+        :param shards: The predicates restricting each shard, e.g.
+            ``["category = 'a'", "category = 'b'"]``.  Together they
+            must cover every item.  Defaults to item name ranges.
+
+        :type boundaries: list
+        :param boundaries: The sorted item names splitting the item
+            name ranges, when ``shards`` is not given.  Defaults to
+            ranges spread over the letters and digits.
+
+        :type num_threads: int
+        :param num_threads: The number of shards run concurrently.
+
+        :type ordered: bool
+        :param ordered: Yield the items of each shard in turn, in the
+            order of the shards, rather than as they arrive.
+
+        :type key: callable
+        :param key: Merge the results of the shards, each sorted by
+            this function of an item, into a single sorted stream.
+
+        :rtype: iter
+        :return: An iterator over the items of every shard.  If the
+            where clause of ``query`` cannot be found reliably, the
+            query is not sharded and a plain :meth:`select` is used
+            instead; its results are then sorted in memory by ``key``,
+            if given, while ``ordered`` is ignored.
+        """
+        try:
+            split_query(query)
+        except ValueError, e:
+            boto.log.warning('Not sharding the query: %s' % e)
+            if key is not None:
+                items = sorted(self.select(query,
+                                           consistent_read=consistent_read),
+                               key=key)
+                if max_items:
+                    items = items[:max_items]
+                return iter(items)
+            if ordered:
+                boto.log.warning('Ignoring ordered for an unsharded query')
+            return self.select(query, max_items=max_items,
+                               consistent_read=consistent_read)
+        if shards is None:
+            if boundaries is None:
+                boundaries = default_boundaries(num_threads)
+            shards = item_name_shards(boundaries)
+        return ParallelSelectResultSet(self, query, shards,
+                                       num_threads=num_threads,
+                                       consistent_read=consistent_read,
+                                       ordered=ordered, key=key,
+                                       max_items=max_items)
+
     def get_item(self, item_name, consistent_read=False):
         """
         Retrieves an item from the domain, along with all of its attributes.
@@ -240,37 +307,61 @@ class Domain:
         if not f:
             from tempfile import TemporaryFile
             f = TemporaryFile()
-        print >> f, '<?xml version="1.0" encoding="UTF-8"?>'
-        print >> f, '<Domain id="%s">' % self.name
-        for item in self:
-            print >> f, '\t<Item id="%s">' % item.name
-            for k in item:
-                print >> f, '\t\t<attribute id="%s">' % k
-                values = item[k]
-                if not isinstance(values, list):
-                    values = [values]
-                for value in values:
-                    print >> f, '\t\t\t<value><![CDATA[',
-                    if isinstance(value, unicode):
-                        value = value.encode('utf-8', 'replace')
-                    else:
-                        value = unicode(value, errors='replace').encode('utf-8', 'replace')
-                    f.write(value)
-                    print >> f, ']]></value>'
-                print >> f, '\t\t</attribute>'
-            print >> f, '\t</Item>'
-        print >> f, '</Domain>'
+        export_domain(self, f, format='xml')
         f.flush()
         f.seek(0)
         return f
 
-
     def from_xml(self, doc):
-        """Load this domain based on an XML document"""
-        import xml.sax
-        handler = DomainDumpParser(self)
-        xml.sax.parse(doc, handler)
-        return handler
+        """
+        Load this domain based on an XML document, with a
+        :class:`boto.sdb.bulk.BulkLoader`.
+
+        :param doc: The file name or file object of the document.
+
+        :rtype: :class:`boto.sdb.bulk.BulkLoader`
+        :return: The loader, once every item has been written.
+        """
+        return self.load(doc, format='xml')
+
+    def load(self, fp, format='xml', **kwargs):
+        """
+        Write the items of an XML or JSON lines dump to this domain,
+        using a pool of threads sending BatchPutAttributes requests.
+        The keyword arguments are passed to
+        :class:`boto.sdb.bulk.BulkLoader`, e.g. ``progress``.
+
+        :param fp: The file name or file object of the dump.
+
+        :type format: str
+        :param format: ``xml`` or ``jsonl``.
+
+        :rtype: :class:`boto.sdb.bulk.BulkLoader`
+        :return: The loader, whose ``errors`` lists the items that
+            could not be written.
+        """
+        if isinstance(fp, basestring):
+            fp = open(fp, 'rb')
+            try:
+                return load_domain(self, fp, format, **kwargs)
+            finally:
+                fp.close()
+        return load_domain(self, fp, format, **kwargs)
+
+    def export(self, fp, format='xml', query=None, num_threads=1,
+               progress=None):
+        """
+        Write the items of this domain to a file as they are read.
+        See :func:`boto.sdb.bulk.export_domain`.
+
+        :type format: str
+        :param format: ``xml`` or ``jsonl``.
+
+        :rtype: int
+        :return: The number of items written.
+        """
+        return export_domain(self, fp, format=format, query=query,
+                             num_threads=num_threads, progress=progress)
 
     def delete(self):
         """
@@ -310,68 +401,3 @@ class DomainMetaData:
             self.timestamp = value
         else:
             setattr(self, name, value)
-
-import sys
-from xml.sax.handler import ContentHandler
-class DomainDumpParser(ContentHandler):
-    """
-    SAX parser for a domain that has been dumped
-    """
-
-    def __init__(self, domain):
-        self.uploader = UploaderThread(domain)
-        self.item_id = None
-        self.attrs = {}
-        self.attribute = None
-        self.value = ""
-        self.domain = domain
-
-    def startElement(self, name, attrs):
-        if name == "Item":
-            self.item_id = attrs['id']
-            self.attrs = {}
-        elif name == "attribute":
-            self.attribute = attrs['id']
-        elif name == "value":
-            self.value = ""
-
-    def characters(self, ch):
-        self.value += ch
-
-    def endElement(self, name):
-        if name == "value":
-            if self.value and self.attribute:
-                value = self.value.strip()
-                attr_name = self.attribute.strip()
-                if attr_name in self.attrs:
-                    self.attrs[attr_name].append(value)
-                else:
-                    self.attrs[attr_name] = [value]
-        elif name == "Item":
-            self.uploader.items[self.item_id] = self.attrs
-            # Every 20 items we spawn off the uploader
-            if len(self.uploader.items) >= 20:
-                self.uploader.start()
-                self.uploader = UploaderThread(self.domain)
-        elif name == "Domain":
-            # If we're done, spawn off our last Uploader Thread
-            self.uploader.start()
-
-from threading import Thread
-class UploaderThread(Thread):
-    """Uploader Thread"""
-
-    def __init__(self, domain):
-        self.db = domain
-        self.items = {}
-        Thread.__init__(self)
-
-    def run(self):
-        try:
-            self.db.batch_put_attributes(self.items)
-        except:
-            print "Exception using batch put, trying regular put instead"
-            for item_name in self.items:
-                self.db.put_attributes(item_name, self.items[item_name])
-        print ".",
-        sys.stdout.flush()
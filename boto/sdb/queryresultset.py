@@ -18,6 +18,12 @@
 # WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 # IN THE SOFTWARE.
+import heapq
+import re
+import string
+import threading
+import Queue
+
 
 def query_lister(domain, query='', max_items=None, attr_names=None):
     more_results = True
@@ -90,3 +96,260 @@ class SelectResultSet(object):
 
     def next(self):
         return self.__iter__().next()
+
+
+_WHERE_RE = re.compile(r'\bwhere\b', re.IGNORECASE)
+_TAIL_RE = re.compile(r'\b(order\s+by|limit)\b', re.IGNORECASE)
+_QUOTES = '\'"`'
+_END_SENTINEL = object()
+
+ITEM_NAME_CHARS = string.digits + string.ascii_uppercase + string.ascii_lowercase
+
+
+def _mask_literals(query):
+    """
+    Return ``query`` with the quoted values and backquoted names
+    blanked out, so that keywords are only found outside of them.
+    Raises ValueError if a quote is not closed.
+    """
+    masked = []
+    quote = None
+    i = 0
+    while i < len(query):
+        char = query[i]
+        if quote is None:
+            if char in _QUOTES:
+                quote = char
+            masked.append(char)
+        elif char == quote:
+            if query[i + 1:i + 2] == quote:
+                # A doubled quote is an escaped quote.
+                masked.append('  ')
+                i += 1
+            else:
+                quote = None
+                masked.append(char)
+        else:
+            masked.append(' ')
+        i += 1
+    if quote is not None:
+        raise ValueError('Unterminated %s in query: %s' % (quote, query))
+    return ''.join(masked)
+
+
+def split_query(query):
+    """
+    Split a select expression into its select clause, its where
+    condition (None without a where clause) and its order by and limit
+    clauses.  Raises ValueError if the query cannot be split reliably.
+    """
+    masked = _mask_literals(query)
+    wheres = list(_WHERE_RE.finditer(masked))
+    tail_match = _TAIL_RE.search(masked)
+    end = len(query)
+    if tail_match:
+        end = tail_match.start()
+    if len(wheres) > 1 or (wheres and wheres[0].start() > end):
+        raise ValueError('Unable to find the where clause of: %s' % query)
+    tail = query[end:].strip()
+    if wheres:
+        where = wheres[0]
+        return (query[:where.start()].strip(),
+                query[where.end():end].strip(), tail)
+    return query[:end].strip(), None, tail
+
+
+def shard_query(query, predicate):
+    """
+    Return ``query`` restricted to the items matching ``predicate``,
+    e.g. ``itemName() >= 'm'``.  The predicate is combined with the
+    existing where clause, before any order by or limit clause.
+    Raises ValueError if the query cannot be split reliably.
+    """
+    if not predicate:
+        return query
+    select, condition, tail = split_query(query)
+    if condition:
+        query = '%s where (%s) and %s' % (select, condition, predicate)
+    else:
+        query = '%s where %s' % (select, predicate)
+    if tail:
+        query = '%s %s' % (query, tail)
+    return query
+
+
+def item_name_shards(boundaries):
+    """
+    Return the predicates splitting the item names into the ranges
+    delimited by the sorted list ``boundaries``.  The first and last
+    ranges are open ended, so the shards cover every item.
+    """
+    shards = []
+    lower = None
+    for upper in list(boundaries) + [None]:
+        parts = []
+        if lower is not None:
+            parts.append("itemName() >= '%s'" % lower.replace("'", "''"))
+        if upper is not None:
+            parts.append("itemName() < '%s'" % upper.replace("'", "''"))
+        shards.append(' and '.join(parts))
+        lower = upper
+    return shards
+
+
+def default_boundaries(num_shards, chars=ITEM_NAME_CHARS):
+    """
+    Return ``num_shards - 1`` boundaries spread evenly over ``chars``,
+    which suits item names starting with letters or digits.
+    """
+    step = float(len(chars)) / num_shards
+    return [chars[int(round(i * step))] for i in range(1, num_shards)]
+
+
+class ParallelSelectResultSet(object):
+    """
+    Runs a select expression as several shards, each restricted by a
+    predicate, and follows the NextToken of every shard concurrently.
+
+    The shards share the connection of the domain, whose connection
+    pool gives each thread its own HTTP connection.  By default items
+    are yielded as soon as any shard returns them.  With ``ordered``
+    the shards are yielded one after another, in the order of the
+    predicates, which for item name ranges of a query ordered by
+    ``itemName()`` gives the global order.  With ``key`` the results of
+    each shard, which must already be sorted by ``key``, are merged.
+
+    A limit clause in the query applies to each shard; use
+    ``max_items`` to limit the total number of items.
+    """
+
+    def __init__(self, domain, query, shards, num_threads=8,
+                 consistent_read=False, ordered=False, key=None,
+                 max_items=None, page_buffer=4):
+        if not shards:
+            raise ValueError('At least one shard is required')
+        self.domain = domain
+        self.query = query
+        self.shards = shards
+        self.num_threads = num_threads
+        self.consistent_read = consistent_read
+        self.ordered = ordered
+        self.key = key
+        self.max_items = max_items
+        self.page_buffer = page_buffer
+
+    def _put(self, queue, value, stopping):
+        while not stopping.is_set():
+            try:
+                queue.put(value, timeout=0.1)
+                return True
+            except Queue.Full:
+                pass
+        return False
+
+    def _run_shard(self, query, output, index, stopping):
+        next_token = None
+        try:
+            while not stopping.is_set():
+                rs = self.domain.connection.select(
+                    self.domain, query, next_token=next_token,
+                    consistent_read=self.consistent_read)
+                if not self._put(output, (index, list(rs), None), stopping):
+                    return
+                next_token = rs.next_token
+                if next_token is None:
+                    break
+        except Exception, e:
+            self._put(output, (index, None, e), stopping)
+            return
+        self._put(output, (index, _END_SENTINEL, None), stopping)
+
+    def _worker(self, shards, outputs, stopping):
+        while not stopping.is_set():
+            try:
+                index, query = shards.get_nowait()
+            except Queue.Empty:
+                return
+            self._run_shard(query, outputs[index], index, stopping)
+
+    def _pages(self, output):
+        while True:
+            index, page, error = output.get()
+            if error is not None:
+                raise error
+            yield index, page
+
+    def _shard_items(self, output):
+        for _, page in self._pages(output):
+            if page is _END_SENTINEL:
+                return
+            for item in page:
+                yield item
+
+    def _unordered(self, output):
+        remaining = len(self.shards)
+        for _, page in self._pages(output):
+            if page is _END_SENTINEL:
+                remaining -= 1
+                if not remaining:
+                    return
+                continue
+            for item in page:
+                yield item
+
+    def _merged(self, outputs):
+        heap = []
+        iterators = [self._shard_items(output) for output in outputs]
+        for index, it in enumerate(iterators):
+            for item in it:
+                heap.append((self.key(item), index, item))
+                break
+        heapq.heapify(heap)
+        while heap:
+            _, index, item = heap[0]
+            yield item
+            for next_item in iterators[index]:
+                heapq.heapreplace(heap, (self.key(next_item), index,
+                                         next_item))
+                break
+            else:
+                heapq.heappop(heap)
+
+    def __iter__(self):
+        stopping = threading.Event()
+        shards = Queue.Queue()
+        for index, predicate in enumerate(self.shards):
+            shards.put((index, shard_query(self.query, predicate)))
+        if self.key is not None:
+            # Every shard must make progress for the merge, so their
+            # buffers cannot be bounded.
+            outputs = [Queue.Queue() for _ in self.shards]
+            num_threads = len(self.shards)
+        elif self.ordered:
+            outputs = [Queue.Queue(self.page_buffer) for _ in self.shards]
+            num_threads = self.num_threads
+        else:
+            output = Queue.Queue(self.page_buffer * self.num_threads)
+            outputs = [output] * len(self.shards)
+            num_threads = self.num_threads
+        for _ in range(min(num_threads, len(self.shards))):
+            thread = threading.Thread(target=self._worker,
+                                      args=(shards, outputs, stopping))
+            thread.daemon = True
+            thread.start()
+        if self.key is not None:
+            items = self._merged(outputs)
+        elif self.ordered:
+            items = (item for output in outputs
+                     for item in self._shard_items(output))
+        else:
+            items = self._unordered(outputs[0])
+        num_results = 0
+        try:
+            for item in items:
+                if self.max_items and num_results >= self.max_items:
+                    break
+                yield item
+                num_results += 1
+        finally:
+            stopping.set()
@@ -0,0 +1,297 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+"""
+A bulk sender pacing its messages to the SES sending quota.
+"""
+import logging
+import random
+import threading
+import time
+import Queue
+
+from boto.ses import exceptions as ses_exceptions
+from boto.utils import Future, TokenBucket
+
+
+_END_SENTINEL = object()
+log = logging.getLogger('boto.ses.bulk')
+
+
+def _addresses(addresses):
+    if not addresses:
+        return []
+    if isinstance(addresses, basestring):
+        return [addresses]
+    return list(addresses)
+
+
+class _Message(object):
+
+    def __init__(self, action, kwargs, recipients):
+        self.action = action
+        self.kwargs = kwargs
+        self.recipients = recipients
+        self.future = Future()
+        self.attempts = 0
+        self.quota_time = None
+
+    @property
+    def cost(self):
+        # SES counts every recipient against the sending rate.
+        return max(1, len(self.recipients))
+
+
+class BulkSender(object):
+    """
+    Sends messages from a pool of threads, paced by a token bucket
+    refilled at the ``MaxSendRate`` returned by ``GetSendQuota``.
+
+    Each message takes one token per recipient.  The quota is read
+    again every ``quota_refresh_interval`` seconds, so raising the
+    quota speeds up a running send.  Messages beyond the remaining
+    ``Max24HourSend`` fail with ``SESDailyQuotaExceededError`` without
+    being sent.  Messages rejected because the sending rate was
+    exceeded are retried after a jittered backoff; any other error
+    fails the message, and its recipients are listed in ``failures``.
+
+    :ivar sent: The number of messages sent.
+    :ivar failed: The number of messages that could not be sent.
+    :ivar retried: The number of sends retried.
+    :ivar failures: A dict of the exception that prevented sending to
+        each recipient.
+    :ivar max_send_rate: The last MaxSendRate read.
+    :ivar remaining_24h: The number of recipients that may still be
+        sent to in the current 24 hour window.
+    """
+
+    def __init__(self, connection, num_workers=4, rate_fraction=1.0,
+                 quota_refresh_interval=60, max_retries=3, max_pending=1000):
+        """
+        :type connection: :class:`boto.ses.connection.SESConnection`
+        :param connection: The connection used by every thread.
+
+        :type num_workers: int
+        :param num_workers: The number of concurrent requests.
+
+        :type rate_fraction: float
+        :param rate_fraction: The fraction of MaxSendRate to use.
+
+        :type quota_refresh_interval: int
+        :param quota_refresh_interval: The number of seconds between
+            two GetSendQuota requests.
+
+        :type max_retries: int
+        :param max_retries: The number of times a throttled message is
+            retried.
+
+        :type max_pending: int
+        :param max_pending: The number of messages waiting for a thread
+            before further sends block.
+        """
+        self.connection = connection
+        self.num_workers = num_workers
+        self.rate_fraction = rate_fraction
+        self.quota_refresh_interval = quota_refresh_interval
+        self.max_retries = max_retries
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.failures = {}
+        self.max_send_rate = None
+        self.remaining_24h = None
+        self._bucket = TokenBucket(None)
+        self._quota_time = None
+        self._pending = Queue.Queue(max_pending)
+        self._lock = threading.Lock()
+        self._closed = False
+        self.refresh_quota()
+        self._threads = []
+        for _ in xrange(num_workers):
+            thread = threading.Thread(target=self._send_loop)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def __repr__(self):
+        return 'BulkSender(%s/s, %d sent, %d failed)' % (
+            self.max_send_rate, self.sent, self.failed)
+
+    def refresh_quota(self):
+        """
+        Read the sending quota and update the pace of the sender.
+        """
+        response = self.connection.get_send_quota()
+        quota = response['GetSendQuotaResponse']['GetSendQuotaResult']
+        max_send_rate = float(quota['MaxSendRate'])
+        remaining = (float(quota['Max24HourSend']) -
+                     float(quota['SentLast24Hours']))
+        rate = max_send_rate * self.rate_fraction
+        self._lock.acquire()
+        try:
+            self.max_send_rate = max_send_rate
+            self.remaining_24h = max(0, int(remaining))
+            self._quota_time = time.time()
+            self._bucket.rate = rate
+            self._bucket.capacity = max(1, rate)
+        finally:
+            self._lock.release()
+
+    def _maybe_refresh_quota(self):
+        self._lock.acquire()
+        try:
+            due = (time.time() - self._quota_time >=
+                   self.quota_refresh_interval)
+            if due:
+                # Only one thread refreshes the quota.
+                self._quota_time = time.time()
+        finally:
+            self._lock.release()
+        if due:
+            try:
+                self.refresh_quota()
+            except Exception:
+                log.exception('Unable to refresh the sending quota')
+
+    def _queue(self, action, kwargs, recipients):
+        if self._closed:
+            raise ValueError('BulkSender is closed')
+        message = _Message(action, kwargs, recipients)
+        self._pending.put(message)
+        return message.future
+
+    def send_email(self, source, subject, body, to_addresses,
+                   cc_addresses=None, bcc_addresses=None, **kwargs):
+        """
+        Queue a message to be sent with
+        :meth:`boto.ses.connection.SESConnection.send_email`, which
+        takes the same arguments.
+
+        :rtype: :class:`boto.utils.Future`
+        :return: A future whose ``result()`` is the SendEmail response.
+        """
+        kwargs.update(source=source, subject=subject, body=body,
+                      to_addresses=to_addresses, cc_addresses=cc_addresses,
+                      bcc_addresses=bcc_addresses)
+        recipients = (_addresses(to_addresses) + _addresses(cc_addresses) +
+                      _addresses(bcc_addresses))
+        return self._queue('send_email', kwargs, recipients)
+
+    def send_raw_email(self, raw_message, source=None, destinations=None):
+        """
+        Queue a message to be sent with
+        :meth:`boto.ses.connection.SESConnection.send_raw_email`.
+
+        :rtype: :class:`boto.utils.Future`
+        :return: A future whose ``result()`` is the SendRawEmail
+            response.
+        """
+        kwargs = dict(raw_message=raw_message, source=source,
+                      destinations=destinations)
+        return self._queue('send_raw_email', kwargs,
+                           _addresses(destinations))
+
+    def close(self):
+        """Wait for the queued messages to be sent and stop."""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            self._pending.put(_END_SENTINEL)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _send_loop(self):
+        while True:
+            message = self._pending.get()
+            if message is _END_SENTINEL:
+                return
+            self._send(message)
+
+    def _reserve(self, message):
+        self._lock.acquire()
+        try:
+            if self.remaining_24h < message.cost:
+                return False
+            self.remaining_24h -= message.cost
+            message.quota_time = self._quota_time
+            return True
+        finally:
+            self._lock.release()
+
+    def _finish(self, message, error=None, reserved=True):
+        self._lock.acquire()
+        try:
+            if error is None:
+                self.sent += 1
+            else:
+                self.failed += 1
+                # The message was not sent, give its quota back unless
+                # the quota was read again since it was reserved.
+                if reserved and message.quota_time == self._quota_time:
+                    self.remaining_24h += message.cost
+                for recipient in message.recipients:
+                    self.failures[recipient] = error
+        finally:
+            self._lock.release()
+        if error is None:
+            return
+        message.future.set_exception(error)
+
+    def _send(self, message):
+        self._maybe_refresh_quota()
+        if not self._reserve(message):
+            self._finish(message, ses_exceptions.SESDailyQuotaExceededError(
+                400, 'Daily message quota exceeded.'), reserved=False)
+            return
+        while True:
+            self._bucket.acquire(message.cost)
+            try:
+                response = getattr(self.connection, message.action)(
+                    **message.kwargs)
+            except ses_exceptions.SESMaxSendingRateExceededError, e:
+                if message.attempts >= self.max_retries:
+                    self._finish(message, e)
+                    return
+                message.attempts += 1
+                self._lock.acquire()
+                try:
+                    self.retried += 1
+                finally:
+                    self._lock.release()
+                # Empty the bucket so the other threads slow down too.
+                self._bucket.consume(self._bucket.capacity)
+                time.sleep(random.uniform(0, 2 ** message.attempts))
+            except Exception, e:
+                log.error('Unable to send to %s: %s',
+                          ', '.join(message.recipients), e)
+                self._finish(message, e)
+                return
+            else:
+                self._finish(message)
+                message.future.set_result(response)
+                return
@@ -338,6 +338,18 @@ class SESConnection(AWSAuthConnection):
         """
         return self._make_request('GetSendQuota')
 
+    def bulk_sender(self, **kwargs):
+        """
+        Create a :class:`boto.ses.bulk.BulkSender` that sends messages
+        from a pool of threads sharing this connection, paced to the
+        sending quota of the account.  The keyword arguments are passed
+        to the sender.
+
+        :rtype: :class:`boto.ses.bulk.BulkSender`
+        """
+        from boto.ses.bulk import BulkSender
+        return BulkSender(self, **kwargs)
+
     def get_send_statistics(self):
         """Fetches the user's sending statistics. The result is a list of data
         points, representing the last two weeks of sending activity.
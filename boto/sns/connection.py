@@ -33,6 +33,7 @@ class SNSConnection(AWSQueryConnection):
     DefaultRegionName = 'us-east-1'
     DefaultRegionEndpoint = 'sns.us-east-1.amazonaws.com'
     APIVersion = '2010-03-31'
+    MaxGetPayload = 1024
 
     def __init__(self, aws_access_key_id=None, aws_secret_access_key=None,
                  is_secure=True, port=None, proxy=None, proxy_port=None,
@@ -235,13 +236,26 @@ class SNSConnection(AWSQueryConnection):
         :param subject: Optional parameter to be used as the "Subject"
                         line of the email notifications.
 
+        Messages and subjects longer than ``MaxGetPayload`` bytes
+        in total are sent in the body of a POST request rather than
+        in the query string.
         """
         params = {'ContentType': 'JSON',
                   'TopicArn': topic,
                   'Message': message}
         if subject:
             params['Subject'] = subject
-        response = self.make_request('Publish', params, '/', 'GET')
+        # The payload is sent UTF-8 encoded, so count bytes rather than
+        # the characters of unicode strings.
+        size = 0
+        for value in (message, subject or ''):
+            if isinstance(value, unicode):
+                value = value.encode('utf-8')
+            size += len(value)
+        verb = 'GET'
+        if size > self.MaxGetPayload:
+            verb = 'POST'
+        response = self.make_request('Publish', params, '/', verb)
         body = response.read()
         if response.status == 200:
             return json.loads(body)
@@ -250,6 +264,17 @@ class SNSConnection(AWSQueryConnection):
             boto.log.error('%s' % body)
             raise self.ResponseError(response.status, response.reason, body)
 
+    def publisher(self, **kwargs):
+        """
+        Create a :class:`boto.sns.publisher.Publisher` that publishes
+        messages from a pool of threads sharing this connection.  The
+        keyword arguments are passed to the publisher.
+
+        :rtype: :class:`boto.sns.publisher.Publisher`
+        """
+        from boto.sns.publisher import Publisher
+        return Publisher(self, **kwargs)
+
     def subscribe(self, topic, protocol, endpoint):
         """
         Subscribe to a Topic.
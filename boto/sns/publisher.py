@@ -0,0 +1,229 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+"""
+A concurrent publisher for SNS topics.
+"""
+import logging
+import random
+import threading
+import time
+import Queue
+
+from boto.compat import json
+from boto.exception import BotoServerError
+from boto.utils import Future
+
+
+RETRYABLE_ERRORS = ('Throttling', 'ThrottlingException', 'InternalError',
+                    'InternalFailure', 'ServiceUnavailable')
+"""The error codes of the publishes that are retried"""
+
+_END_SENTINEL = object()
+log = logging.getLogger('boto.sns.publisher')
+
+
+def get_error_code(error):
+    """
+    Return the error code of a ``BotoServerError`` raised by SNS,
+    whose body is JSON when the ContentType is JSON.
+    """
+    if error.error_code:
+        return error.error_code
+    try:
+        return json.loads(error.error_message)['Error']['Code']
+    except (TypeError, ValueError, KeyError):
+        return None
+
+
+class TopicStats(object):
+    """
+    The outcome of the publishes to a topic.
+
+    :ivar published: The number of messages published.
+    :ivar failed: The number of messages that could not be published.
+    :ivar retried: The number of publishes retried.
+    :ivar errors: The number of errors by error code, including the
+        errors of retried publishes.
+    """
+
+    def __init__(self):
+        self.published = 0
+        self.failed = 0
+        self.retried = 0
+        self.errors = {}
+
+    def __repr__(self):
+        return 'TopicStats(%d published, %d failed, %d retried)' % (
+            self.published, self.failed, self.retried)
+
+
+class _Entry(object):
+
+    def __init__(self, topic, message, subject):
+        self.topic = topic
+        self.message = message
+        self.subject = subject
+        self.future = Future()
+        self.attempts = 0
+
+
+class Publisher(object):
+    """
+    Publishes messages from a fixed number of threads, which keep up
+    to ``max_in_flight`` Publish requests in flight over the pooled
+    keep-alive connections of an
+    :class:`boto.sns.connection.SNSConnection`.
+
+    :meth:`publish` returns a :class:`boto.utils.Future` at once; its
+    result is the decoded Publish response.  Throttled publishes and
+    server errors are retried after an exponential backoff with full
+    jitter, in the publishing thread, so the caller is never blocked
+    unless ``max_pending`` messages are already waiting.
+
+    :ivar stats: A dict of :class:`TopicStats` by topic ARN.
+    """
+
+    def __init__(self, connection, max_in_flight=10, max_retries=5,
+                 backoff_base=0.05, backoff_max=20, max_pending=10000):
+        """
+        :type connection: :class:`boto.sns.connection.SNSConnection`
+        :param connection: The connection used by every thread.
+
+        :type max_in_flight: int
+        :param max_in_flight: The number of concurrent requests.
+
+        :type max_retries: int
+        :param max_retries: The number of times a throttled publish is
+            retried.
+
+        :type backoff_base: float
+        :param backoff_base: The mean delay, in seconds, before the
+            first retry; it doubles on each retry.
+
+        :type backoff_max: float
+        :param backoff_max: The maximum delay before a retry.
+
+        :type max_pending: int
+        :param max_pending: The number of messages waiting for a
+            thread before :meth:`publish` blocks.
+        """
+        self.connection = connection
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats = {}
+        self._pending = Queue.Queue(max_pending)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._threads = []
+        for _ in xrange(max_in_flight):
+            thread = threading.Thread(target=self._publish_loop)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def __repr__(self):
+        return 'Publisher(%s, %d in flight)' % (self.connection.host,
+                                               self.max_in_flight)
+
+    def publish(self, topic, message, subject=None):
+        """
+        Queue a message to be published to a topic.
+
+        :rtype: :class:`boto.utils.Future`
+        :return: A future whose ``result()`` is the Publish response.
+        """
+        if self._closed:
+            raise ValueError('Publisher is closed')
+        entry = _Entry(topic, message, subject)
+        self._pending.put(entry)
+        return entry.future
+
+    def close(self):
+        """Wait for the queued messages to be published and stop."""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            self._pending.put(_END_SENTINEL)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _get_stats(self, topic):
+        stats = self.stats.get(topic)
+        if stats is None:
+            stats = self.stats.setdefault(topic, TopicStats())
+        return stats
+
+    def _record(self, entry, error_code=None, outcome=None):
+        self._lock.acquire()
+        try:
+            stats = self._get_stats(entry.topic)
+            if error_code is not None:
+                stats.errors[error_code] = stats.errors.get(error_code, 0) + 1
+            if outcome is not None:
+                setattr(stats, outcome, getattr(stats, outcome) + 1)
+        finally:
+            self._lock.release()
+
+    def _backoff(self, attempt):
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        return random.uniform(0, delay)
+
+    def _publish_loop(self):
+        while True:
+            entry = self._pending.get()
+            if entry is _END_SENTINEL:
+                return
+            self._publish(entry)
+
+    def _publish(self, entry):
+        while True:
+            try:
+                response = self.connection.publish(entry.topic,
+                                                   entry.message,
+                                                   entry.subject)
+            except BotoServerError, e:
+                code = get_error_code(e)
+                retryable = code in RETRYABLE_ERRORS or e.status >= 500
+            except Exception, e:
+                code = e.__class__.__name__
+                retryable = True
+            else:
+                self._record(entry, outcome='published')
+                entry.future.set_result(response)
+                return
+            if not retryable or entry.attempts >= self.max_retries:
+                log.error('Unable to publish to %s: %s', entry.topic, e)
+                self._record(entry, code or 'Unknown', 'failed')
+                entry.future.set_exception(e)
+                return
+            self._record(entry, code or 'Unknown', 'retried')
+            time.sleep(self._backoff(entry.attempts))
+            entry.attempts += 1
@@ -0,0 +1,294 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+"""
+Compression and S3 offload of SQS message bodies.
+
+A :class:`MessageCodec` turns the body of a message into the string
+stored in SQS.  Bodies that shrink when compressed are compressed, with
+zlib by default or bz2 when it is asked for and available, and
+bodies still too large for SQS are stored in an S3 bucket, with only
+a pointer to the S3 object written to the queue.  Bodies that are
+neither compressed nor offloaded are base64 encoded exactly like
+:class:`boto.sqs.message.Message`, so a queue can be switched to a
+:class:`CodecMessage` while older messages are still in flight.
+
+To use a codec, set the message class of the queue::
+
+    codec = MessageCodec(s3_bucket=s3.get_bucket('my-payloads'))
+    queue.set_message_class(codec_message_class(codec))
+"""
+import base64
+import uuid
+import zlib
+
+from boto.exception import SQSDecodeError
+from boto.sqs.message import Message
+
+
+MAX_MESSAGE_SIZE = 64 * 1024
+"""The maximum size of a message body accepted by SQS"""
+
+HEADER = 'boto/1;'
+"""
+The prefix of the bodies written by a :class:`MessageCodec`.  It
+contains characters that never occur in base64, so it cannot be
+mistaken for a plain :class:`boto.sqs.message.Message`.
+"""
+
+
+class ZlibCompressor(object):
+    name = 'zlib'
+
+    def __init__(self, level=6):
+        self.level = level
+
+    def compress(self, data):
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data):
+        return zlib.decompress(data)
+
+
+class Bz2Compressor(object):
+    name = 'bz2'
+
+    def __init__(self, level=9):
+        self.level = level
+
+    def compress(self, data):
+        return bz2.compress(data, self.level)
+
+    def decompress(self, data):
+        return bz2.decompress(data)
+
+
+COMPRESSORS = {'zlib': ZlibCompressor}
+"""The compressors available, by name"""
+
+try:
+    import bz2
+    COMPRESSORS['bz2'] = Bz2Compressor
+except ImportError:
+    pass
+
+
+class MessageCodec(object):
+    """
+    Encodes and decodes message bodies, compressing them and offloading
+    the large ones to S3.
+    """
+
+    def __init__(self, compression='zlib', min_compress_size=256,
+                 s3_bucket=None, s3_prefix='sqs-payloads/',
+                 offload_threshold=MAX_MESSAGE_SIZE):
+        """
+        :type compression: str
+        :param compression: The name of the compressor in
+            :data:`COMPRESSORS` to use, ``'zlib'`` by default or
+            ``'bz2'`` when the bz2 module is available, or None to
+            disable compression.
+            Messages compressed with any available compressor are
+            decoded whatever this setting.
+
+        :type min_compress_size: int
+        :param min_compress_size: Bodies smaller than this number of
+            bytes are not compressed.
+
+        :type s3_bucket: :class:`boto.s3.bucket.Bucket`
+        :param s3_bucket: The bucket large bodies are offloaded to.
+            Without a bucket, bodies too large for SQS are sent as is
+            and rejected by SQS.
+
+        :type s3_prefix: str
+        :param s3_prefix: The prefix of the names of the S3 objects.
+
+        :type offload_threshold: int
+        :param offload_threshold: Encoded bodies larger than this
+            number of bytes are offloaded to S3.
+        """
+        self.compressor = None
+        if compression is not None:
+            if compression not in COMPRESSORS:
+                raise ValueError('Unknown compression: %s' % compression)
+            self.compressor = COMPRESSORS[compression]()
+        self.min_compress_size = min_compress_size
+        self.s3_bucket = s3_bucket
+        self.s3_prefix = s3_prefix
+        self.offload_threshold = offload_threshold
+
+    def _get_compressor(self, name):
+        if self.compressor is not None and self.compressor.name == name:
+            return self.compressor
+        if name not in COMPRESSORS:
+            raise SQSDecodeError('Unknown compression: %s' % name, None)
+        return COMPRESSORS[name]()
+
+    def _get_bucket(self, name):
+        if self.s3_bucket is None:
+            raise SQSDecodeError('No S3 bucket to read %s from' % name, None)
+        if self.s3_bucket.name == name:
+            return self.s3_bucket
+        return self.s3_bucket.connection.get_bucket(name, validate=False)
+
+    def encode(self, data, offload=True):
+        """
+        Return the string to store in SQS for ``data``.
+
+        :type offload: bool
+        :param offload: If False, large bodies are not offloaded to S3.
+        """
+        params = []
+        if (self.compressor is not None and
+                len(data) >= self.min_compress_size):
+            compressed = self.compressor.compress(data)
+            if len(compressed) < len(data):
+                params.append('z=%s' % self.compressor.name)
+                data = compressed
+        encoded = base64.b64encode(data)
+        if (offload and self.s3_bucket is not None and
+                len(encoded) + len(HEADER) > self.offload_threshold):
+            key_name = '%s%s' % (self.s3_prefix, uuid.uuid4())
+            key = self.s3_bucket.new_key(key_name)
+            key.set_contents_from_string(data)
+            params.append('s3=%s/%s' % (self.s3_bucket.name, key_name))
+            encoded = ''
+        if not params:
+            return encoded
+        return '%s%s;%s' % (HEADER, ';'.join(params), encoded)
+
+    def parse(self, body):
+        """
+        Split the string stored in SQS into a dict of the parameters
+        of the codec and the base64 encoded data that follows them.
+        """
+        if not body.startswith(HEADER):
+            return {}, body
+        params = {}
+        parts = body[len(HEADER):].split(';')
+        for part in parts[:-1]:
+            name, _, value = part.partition('=')
+            params[name] = value
+        return params, parts[-1]
+
+    def decode(self, body):
+        """
+        Return the data stored in SQS as ``body``, fetching it from S3
+        if it was offloaded.
+        """
+        params, encoded = self.parse(body)
+        try:
+            data = base64.b64decode(encoded)
+        except TypeError:
+            raise SQSDecodeError('Unable to decode message', None)
+        if 's3' in params:
+            bucket_name, _, key_name = params['s3'].partition('/')
+            key = self._get_bucket(bucket_name).new_key(key_name)
+            data = key.get_contents_as_string()
+        if 'z' in params:
+            data = self._get_compressor(params['z']).decompress(data)
+        return data
+
+    def get_payload_key(self, body):
+        """
+        Return the (bucket name, key name) of the S3 object holding
+        the data of ``body``, or None if it was not offloaded.
+        """
+        params, _ = self.parse(body)
+        if 's3' not in params:
+            return None
+        return tuple(params['s3'].split('/', 1))
+
+    def delete_payload(self, body):
+        """
+        Delete the S3 object holding the data of ``body``, if any.
+        """
+        payload_key = self.get_payload_key(body)
+        if payload_key is not None:
+            bucket_name, key_name = payload_key
+            self._get_bucket(bucket_name).delete_key(key_name)
+
+
+class CodecMessage(Message):
+    """
+    A message whose body is encoded with the :class:`MessageCodec` in
+    the ``codec`` class attribute.  Use :func:`codec_message_class` to
+    create a subclass with another codec.
+
+    Subclasses can override ``serialize`` and ``deserialize`` to store
+    something other than a string, e.g. JSON documents.
+
+    When the message is deleted from its queue, with :meth:`delete` or
+    :meth:`boto.sqs.queue.Queue.delete_message_batch`, the S3 object
+    holding its body is deleted too.
+    """
+
+    codec = MessageCodec()
+
+    def __init__(self, queue=None, body=''):
+        self._encoded_body = None
+        Message.__init__(self, queue, body)
+
+    def __len__(self):
+        # Do not upload the body to S3 just to measure it.
+        return len(self.codec.encode(self.serialize(self._body),
+                                     offload=False))
+
+    def serialize(self, value):
+        return value
+
+    def deserialize(self, value):
+        return value
+
+    def encode(self, value):
+        return self.codec.encode(self.serialize(value))
+
+    def decode(self, value):
+        # Keep the raw body; it may point to an S3 object that has to
+        # be deleted along with the message.
+        self._encoded_body = value
+        try:
+            return self.deserialize(self.codec.decode(value))
+        except SQSDecodeError:
+            raise SQSDecodeError('Unable to decode message', self)
+
+    def delete_payload(self):
+        """Delete the S3 object holding the body, if any."""
+        if self._encoded_body is not None:
+            self.codec.delete_payload(self._encoded_body)
+            self._encoded_body = None
+
+    def delete(self):
+        rs = Message.delete(self)
+        if rs:
+            self.delete_payload()
+        return rs
+
+
+def codec_message_class(codec, base=CodecMessage):
+    """
+    Return a subclass of ``base`` using ``codec``, suitable for
+    :meth:`boto.sqs.queue.Queue.set_message_class`.
+    """
+    class _CodecMessage(base):
+        pass
+    _CodecMessage.codec = codec
+    _CodecMessage.__name__ = base.__name__
+    return _CodecMessage
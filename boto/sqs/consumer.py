@@ -0,0 +1,338 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+"""
+A multi-threaded consumer for SQS queues.
+"""
+import logging
+import threading
+import time
+import Queue
+
+
+MAX_BATCH_SIZE = 10
+"""The maximum number of entries SQS accepts in one batch request"""
+
+_END_SENTINEL = object()
+log = logging.getLogger('boto.sqs.consumer')
+
+
+def batch_chunks(messages, size=MAX_BATCH_SIZE):
+    """
+    Split a list of messages into lists of at most ``size`` messages
+    whose ids are distinct, as required by the SQS batch requests.
+    """
+    chunks = []
+    for message in messages:
+        for chunk in chunks:
+            if len(chunk) < size and message.id not in chunk:
+                chunk[message.id] = message
+                break
+        else:
+            chunks.append({message.id: message})
+    return [chunk.values() for chunk in chunks]
+
+
+class Consumer(object):
+    """
+    Processes the messages of a queue with a pool of threads.
+
+    Several receiver threads long-poll the queue for up to 10 messages
+    at a time and put them in a bounded buffer, from which a pool of
+    worker threads take messages and pass them to ``handler``.  When
+    the handler returns, the message is queued for deletion; deletions
+    are sent with ``delete_message_batch``, 10 at a time or every
+    ``flush_interval`` seconds.  If the handler raises an exception
+    the error is logged and the message is left on the queue, to be
+    received again once its visibility timeout expires.
+
+    While a message is buffered or being handled, its visibility
+    timeout is extended with ``change_message_visibility_batch``
+    whenever less than half of it remains, so long-running handlers
+    do not cause the message to be delivered twice.
+
+    :ivar received: The number of messages received.
+    :ivar processed: The number of messages handled successfully.
+    :ivar failed: The number of messages whose handler raised.
+    :ivar deleted: The number of messages deleted from the queue.
+    :ivar extended: The number of visibility timeout extensions.
+    """
+
+    def __init__(self, queue, handler, num_receivers=2, num_workers=10,
+                 buffer_size=100, wait_time_seconds=20,
+                 visibility_timeout=None, heartbeat=True,
+                 flush_interval=1.0, attributes=None):
+        """
+        :type queue: :class:`boto.sqs.queue.Queue`
+        :param queue: The queue to consume.
+
+        :type handler: callable
+        :param handler: Called with each
+            :class:`boto.sqs.message.Message`, from a worker thread.
+
+        :type num_receivers: int
+        :param num_receivers: The number of threads receiving messages.
+
+        :type num_workers: int
+        :param num_workers: The number of threads calling ``handler``.
+
+        :type buffer_size: int
+        :param buffer_size: The maximum number of received messages
+            waiting for a worker.
+
+        :type wait_time_seconds: int
+        :param wait_time_seconds: The long polling time of each
+            ReceiveMessage request.
+
+        :type visibility_timeout: int
+        :param visibility_timeout: The visibility timeout of received
+            messages.  Defaults to the timeout of the queue.
+
+        :type heartbeat: bool
+        :param heartbeat: Whether to extend the visibility timeout of
+            messages that are still buffered or being handled.
+
+        :type flush_interval: float
+        :param flush_interval: The maximum number of seconds deletions
+            are held back to fill a batch.
+
+        :type attributes: str
+        :param attributes: The message attributes to receive, see
+            :meth:`boto.sqs.queue.Queue.get_messages`.
+        """
+        self.queue = queue
+        self.handler = handler
+        self.num_receivers = num_receivers
+        self.num_workers = num_workers
+        self.wait_time_seconds = wait_time_seconds
+        self.visibility_timeout = visibility_timeout
+        self.heartbeat = heartbeat
+        self.flush_interval = flush_interval
+        self.attributes = attributes
+        self.received = 0
+        self.processed = 0
+        self.failed = 0
+        self.deleted = 0
+        self.extended = 0
+        self._buffer = Queue.Queue(buffer_size)
+        self._acks = Queue.Queue()
+        self._held = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._stopped = threading.Event()
+        self._stop_lock = threading.Lock()
+        self._receivers = []
+        self._workers = []
+        self._batcher = None
+
+    def __repr__(self):
+        return 'Consumer(%s)' % self.queue.id
+
+    def _count(self, name, n=1):
+        self._lock.acquire()
+        try:
+            setattr(self, name, getattr(self, name) + n)
+        finally:
+            self._lock.release()
+
+    def _start_thread(self, target):
+        thread = threading.Thread(target=target)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def start(self):
+        """
+        Start the receiver, worker and batching threads and return.
+        """
+        if self.visibility_timeout is None:
+            self.visibility_timeout = self.queue.get_timeout()
+        self._stopping.clear()
+        self._stopped.clear()
+        self._batcher = self._start_thread(self._batch_loop)
+        for _ in xrange(self.num_workers):
+            self._workers.append(self._start_thread(self._work_loop))
+        for _ in xrange(self.num_receivers):
+            self._receivers.append(self._start_thread(self._receive_loop))
+
+    def stop(self):
+        """
+        Stop receiving messages, wait for the workers to handle the
+        messages already buffered and for the pending deletions to be
+        sent.  Receivers may take up to ``wait_time_seconds`` to
+        return from their current long poll.  Calling it again, from
+        any thread, waits for the first call to complete.
+        """
+        self._stop_lock.acquire()
+        try:
+            if self._batcher is None:
+                return
+            self._stopping.set()
+            for thread in self._receivers:
+                thread.join()
+            for _ in self._workers:
+                self._buffer.put(_END_SENTINEL)
+            for thread in self._workers:
+                thread.join()
+            self._acks.put(_END_SENTINEL)
+            self._batcher.join()
+            self._receivers = []
+            self._workers = []
+            self._batcher = None
+            self._stopped.set()
+        finally:
+            self._stop_lock.release()
+
+    def run(self):
+        """
+        Start the consumer and process messages until interrupted
+        with ``KeyboardInterrupt`` or until :meth:`stop` is called
+        from another thread.
+        """
+        self.start()
+        try:
+            while not self._stopping.is_set():
+                self._stopping.wait(1)
+        except KeyboardInterrupt:
+            self.stop()
+            return
+        # Let the thread that called stop() shut the threads down.
+        while not self._stopped.is_set():
+            self._stopped.wait(1)
+
+    def _hold(self, message):
+        self._lock.acquire()
+        try:
+            deadline = time.time() + self.visibility_timeout
+            self._held[message.receipt_handle] = [message, deadline]
+        finally:
+            self._lock.release()
+
+    def _release(self, message):
+        self._lock.acquire()
+        try:
+            self._held.pop(message.receipt_handle, None)
+        finally:
+            self._lock.release()
+
+    def _receive_loop(self):
+        while not self._stopping.is_set():
+            try:
+                messages = self.queue.get_messages(
+                    MAX_BATCH_SIZE, self.visibility_timeout,
+                    attributes=self.attributes,
+                    wait_time_seconds=self.wait_time_seconds)
+            except Exception:
+                log.exception('Error receiving messages from %s',
+                              self.queue.id)
+                self._stopping.wait(1)
+                continue
+            self._count('received', len(messages))
+            for message in messages:
+                self._hold(message)
+                self._buffer.put(message)
+
+    def _work_loop(self):
+        while True:
+            message = self._buffer.get()
+            if message is _END_SENTINEL:
+                return
+            try:
+                self.handler(message)
+            except Exception:
+                log.exception('Error handling message %s', message.id)
+                self._release(message)
+                self._count('failed')
+            else:
+                self._count('processed')
+                self._acks.put(message)
+
+    def _batch_loop(self):
+        pending = []
+        next_flush = time.time() + self.flush_interval
+        while True:
+            timeout = max(0, next_flush - time.time())
+            try:
+                message = self._acks.get(timeout=timeout)
+            except Queue.Empty:
+                message = None
+            if message is _END_SENTINEL:
+                self._delete(pending)
+                return
+            if message is not None:
+                pending.append(message)
+            if len(pending) >= MAX_BATCH_SIZE:
+                self._delete(pending)
+                pending = []
+            if time.time() >= next_flush:
+                self._delete(pending)
+                pending = []
+                self._extend_visibility()
+                next_flush = time.time() + self.flush_interval
+
+    def _delete(self, messages):
+        for chunk in batch_chunks(messages):
+            try:
+                rs = self.queue.delete_message_batch(chunk)
+            except Exception:
+                log.exception('Error deleting %d messages from %s',
+                              len(chunk), self.queue.id)
+                # Stop extending their visibility so that SQS delivers
+                # them again once it expires.
+                for message in chunk:
+                    self._release(message)
+                continue
+            for error in rs.errors:
+                log.error('Unable to delete message %s: %s',
+                          error.get('id'), error.get('error_message'))
+            self._count('deleted', len(rs.results))
+            for message in chunk:
+                self._release(message)
+
+    def _extend_visibility(self):
+        if not self.heartbeat:
+            return
+        now = time.time()
+        self._lock.acquire()
+        try:
+            due = [message for message, deadline in self._held.values()
+                   if deadline - now < self.visibility_timeout / 2.0]
+        finally:
+            self._lock.release()
+        for chunk in batch_chunks(due):
+            entries = [(message, self.visibility_timeout)
+                       for message in chunk]
+            try:
+                rs = self.queue.change_message_visibility_batch(entries)
+            except Exception:
+                log.exception('Error extending the visibility of %d '
+                              'messages from %s', len(chunk), self.queue.id)
+                continue
+            extended = set(result.get('id') for result in rs.results)
+            deadline = time.time() + self.visibility_timeout
+            self._lock.acquire()
+            try:
+                for message in chunk:
+                    held = self._held.get(message.receipt_handle)
+                    if held is not None and message.id in extended:
+                        held[1] = deadline
+            finally:
+                self._lock.release()
+            self._count('extended', len(extended))
@@ -0,0 +1,328 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+"""
+An asynchronous producer that batches the messages written to an SQS
+queue.
+"""
+import logging
+import threading
+import time
+import Queue
+
+from boto.exception import SQSError
+from boto.utils import Future
+
+
+MAX_BATCH_SIZE = 10
+"""The maximum number of messages in a SendMessageBatch request"""
+
+MAX_BATCH_BYTES = 64 * 1024
+"""The maximum total size of the bodies in a SendMessageBatch request"""
+
+_END_SENTINEL = object()
+log = logging.getLogger('boto.sqs.producer')
+
+
+class SendFuture(Future):
+    """
+    The pending outcome of a :meth:`Producer.write`.  Its ``result()``
+    is the message, with its ``id`` and ``md5`` set.
+    """
+
+    def __init__(self, message):
+        Future.__init__(self)
+        self.message = message
+
+
+class _Entry(object):
+
+    def __init__(self, message, body, delay_seconds):
+        self.future = SendFuture(message)
+        self.body = body
+        # The limit applies to the bytes sent, not to the characters.
+        if isinstance(body, unicode):
+            self.size = len(body.encode('utf-8'))
+        else:
+            self.size = len(body)
+        self.delay_seconds = delay_seconds
+        self.attempts = 0
+
+
+class Producer(object):
+    """
+    Writes messages to a queue in batches of up to 10 messages and
+    64 KB, from a background thread.
+
+    :meth:`write` returns immediately with a :class:`SendFuture`.  A
+    batch is sent as soon as it is full, or ``linger`` seconds after its
+    first message was written, and up to ``max_in_flight`` batches are
+    sent concurrently.  When SQS reports some entries of a batch as
+    failed, only those entries are written again, up to ``max_retries``
+    times with an exponential backoff; entries rejected because of a
+    sender fault are not retried.
+
+    :ivar sent: The number of messages sent.
+    :ivar failed: The number of messages that could not be sent.
+    :ivar batches: The number of SendMessageBatch requests made.
+    :ivar retried: The number of entries written again.
+    """
+
+    def __init__(self, queue, linger=0.05, max_in_flight=4, max_retries=3,
+                 delay_seconds=0, max_pending=1000):
+        """
+        :type queue: :class:`boto.sqs.queue.Queue`
+        :param queue: The queue written to.
+
+        :type linger: float
+        :param linger: The number of seconds a batch waits for more
+            messages before it is sent.
+
+        :type max_in_flight: int
+        :param max_in_flight: The maximum number of concurrent
+            SendMessageBatch requests.
+
+        :type max_retries: int
+        :param max_retries: The number of times a failed entry is
+            written again.
+
+        :type delay_seconds: int
+        :param delay_seconds: The default delay of the messages written.
+
+        :type max_pending: int
+        :param max_pending: The maximum number of messages waiting to
+            be batched; further calls to :meth:`write` block.
+        """
+        self.queue = queue
+        self.linger = linger
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.delay_seconds = delay_seconds
+        self.sent = 0
+        self.failed = 0
+        self.batches = 0
+        self.retried = 0
+        self._incoming = Queue.Queue(max_pending)
+        self._batches = Queue.Queue(max_in_flight)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._outstanding = 0
+        self._closed = False
+        self._batcher = self._start_thread(self._batch_loop)
+        self._senders = [self._start_thread(self._send_loop)
+                         for _ in xrange(max_in_flight)]
+
+    def __repr__(self):
+        return 'Producer(%s)' % self.queue.id
+
+    def _start_thread(self, target):
+        thread = threading.Thread(target=target)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def write(self, message, delay_seconds=None):
+        """
+        Queue a message to be written.
+
+        :type message: :class:`boto.sqs.message.Message`
+        :param message: The message to write.
+
+        :type delay_seconds: int
+        :param delay_seconds: The delay of the message, overriding the
+            default of the producer.
+
+        :rtype: :class:`SendFuture`
+        :return: A future whose ``result()`` is the message once it has
+            been sent.
+        """
+        if self._closed:
+            raise ValueError('Producer is closed')
+        if delay_seconds is None:
+            delay_seconds = self.delay_seconds
+        entry = _Entry(message, message.get_body_encoded(), delay_seconds)
+        self._lock.acquire()
+        try:
+            self._outstanding += 1
+        finally:
+            self._lock.release()
+        self._incoming.put(entry)
+        return entry.future
+
+    def flush(self, timeout=None):
+        """
+        Send the batch being filled and wait until every message
+        written so far has been sent or has failed.
+
+        :rtype: bool
+        :return: False if ``timeout`` expired first.
+        """
+        self._incoming.put(None)
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout
+        self._lock.acquire()
+        try:
+            while self._outstanding:
+                if deadline is None:
+                    self._idle.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+                    self._idle.wait(remaining)
+            return True
+        finally:
+            self._lock.release()
+
+    def close(self):
+        """Flush the pending messages and stop the threads."""
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._incoming.put(_END_SENTINEL)
+        self._batcher.join()
+        for thread in self._senders:
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _batch_loop(self):
+        batch = []
+        size = 0
+        deadline = None
+        while True:
+            timeout = None
+            if deadline is not None:
+                timeout = max(0, deadline - time.time())
+            try:
+                entry = self._incoming.get(timeout=timeout)
+            except Queue.Empty:
+                entry = None
+            if entry is _END_SENTINEL:
+                if batch:
+                    self._batches.put(batch)
+                for _ in self._senders:
+                    self._batches.put(_END_SENTINEL)
+                return
+            if entry is not None:
+                if batch and (len(batch) >= MAX_BATCH_SIZE or
+                              size + entry.size > MAX_BATCH_BYTES):
+                    self._batches.put(batch)
+                    batch = []
+                    size = 0
+                if not batch:
+                    deadline = time.time() + self.linger
+                batch.append(entry)
+                size += entry.size
+                if len(batch) < MAX_BATCH_SIZE and time.time() < deadline:
+                    continue
+            if batch:
+                self._batches.put(batch)
+            batch = []
+            size = 0
+            deadline = None
+
+    def _send_loop(self):
+        while True:
+            batch = self._batches.get()
+            if batch is _END_SENTINEL:
+                return
+            self._send(batch)
+
+    def _done(self, entry, error=None):
+        if error is None:
+            entry.future.set_result(entry.future.message)
+            counter = 'sent'
+        else:
+            entry.future.set_exception(error)
+            counter = 'failed'
+        self._lock.acquire()
+        try:
+            setattr(self, counter, getattr(self, counter) + 1)
+            self._outstanding -= 1
+            if not self._outstanding:
+                self._idle.notify_all()
+        finally:
+            self._lock.release()
+
+    def _send(self, batch):
+        attempt = 0
+        while True:
+            batch = self._send_batch(batch)
+            if not batch:
+                return
+            attempt += 1
+            time.sleep(min(0.1 * 2 ** attempt, 5))
+
+    def _send_batch(self, batch):
+        """
+        Write a batch and return the entries that should be retried.
+        """
+        for entry in batch:
+            entry.attempts += 1
+        messages = [(str(i), entry.body, entry.delay_seconds)
+                    for i, entry in enumerate(batch)]
+        self._lock.acquire()
+        try:
+            self.batches += 1
+        finally:
+            self._lock.release()
+        failures = []
+        try:
+            rs = self.queue.write_batch(messages)
+        except Exception, e:
+            log.exception('Error sending %d messages to %s',
+                          len(batch), self.queue.id)
+            failures = [(entry, e) for entry in batch]
+        else:
+            for result in rs.results:
+                entry = batch[int(result['id'])]
+                entry.future.message.id = result.get('message_id')
+                entry.future.message.md5 = result.get('message_md5')
+                self._done(entry)
+            for result in rs.errors:
+                entry = batch[int(result['id'])]
+                error = SQSError(400, result.get('error_code'))
+                error.error_code = result.get('error_code')
+                error.error_message = result.get('error_message')
+                if result.get('sender_fault') == 'true':
+                    self._done(entry, error)
+                else:
+                    error.status = 500
+                    failures.append((entry, error))
+        retries = []
+        for entry, error in failures:
+            if entry.attempts > self.max_retries:
+                self._done(entry, error)
+            else:
+                retries.append(entry)
+        if retries:
+            self._lock.acquire()
+            try:
+                self.retried += len(retries)
+            finally:
+                self._lock.release()
+        return retries
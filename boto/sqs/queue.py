@@ -232,6 +232,17 @@ class Queue:
         """
         return self.connection.send_message_batch(self, messages)
 
+    def producer(self, **kwargs):
+        """
+        Create a :class:`boto.sqs.producer.Producer` that writes
+        individual messages to this queue in batches, from background
+        threads.  The keyword arguments are passed to the producer.
+
+        :rtype: :class:`boto.sqs.producer.Producer`
+        """
+        from boto.sqs.producer import Producer
+        return Producer(self, **kwargs)
+
     def new_message(self, body=''):
         """
         Create new message of appropriate class.
@@ -299,7 +310,14 @@ class Queue:
         :type messages: List of :class:`boto.sqs.message.Message` objects.
         :param messages: A list of message objects.
         """
-        return self.connection.delete_message_batch(self, messages)
+        rs = self.connection.delete_message_batch(self, messages)
+        # Messages whose body lives elsewhere (see boto.sqs.codec)
+        # clean it up once they are deleted.
+        deleted = set(result.get('id') for result in rs.results)
+        for message in messages:
+            if message.id in deleted and hasattr(message, 'delete_payload'):
+                message.delete_payload()
+        return rs
 
     def change_message_visibility_batch(self, messages):
         """
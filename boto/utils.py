@@ -45,6 +45,7 @@ import urllib2
 import imp
 import subprocess
 import StringIO
+import threading
 import time
 import logging.handlers
 import boto
@@ -599,6 +600,17 @@ class LRUCache(dict):
             self._update_item(item)
             self._manage_size()
 
+    def __delitem__(self, key):
+        item = self._dict.pop(key)
+        if item.previous is not None:
+            item.previous.next = item.next
+        else:
+            self.head = item.next
+        if item.next is not None:
+            item.next.previous = item.previous
+        else:
+            self.tail = item.previous
+
     def __repr__(self):
         return repr(self._dict)
 
@@ -636,6 +648,149 @@ class LRUCache(dict):
         item.next = self.head
         self.head.previous = self.head = item
 
+class TokenBucket(object):
+    """
+    A thread-safe token bucket used to pace requests.
+
+    Tokens are added at ``rate`` tokens per second, up to ``capacity``.
+    :meth:`acquire` blocks until enough tokens are available and takes
+    them.  When the cost of a request is only known once it returns,
+    call ``acquire(0)`` before the request, which only waits for the
+    bucket to be out of debt, and :meth:`consume` with the actual cost
+    afterwards, which may take the bucket below zero.
+
+    A ``rate`` of None or 0 disables pacing.  ``rate`` may be changed
+    at any time, for instance when the provisioned limit changes.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        if capacity is None:
+            capacity = rate or 0
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._last = time.time()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'TokenBucket(rate=%s, capacity=%s)' % (self.rate,
+                                                      self.capacity)
+
+    @property
+    def tokens(self):
+        """The number of tokens currently available."""
+        self._lock.acquire()
+        try:
+            self._refill()
+            return self._tokens
+        finally:
+            self._lock.release()
+
+    def _refill(self):
+        now = time.time()
+        if self.rate:
+            self._tokens = min(self.capacity,
+                               self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, tokens=1, block=True):
+        """
+        Take ``tokens`` tokens from the bucket, waiting until they are
+        available.  Requests larger than the capacity of the bucket
+        only wait for a full bucket.
+
+        :type block: bool
+        :param block: If False, return False immediately instead of
+            waiting when not enough tokens are available.
+
+        :rtype: bool
+        :return: True once the tokens have been taken.
+        """
+        while True:
+            self._lock.acquire()
+            try:
+                if not self.rate:
+                    return True
+                self._refill()
+                needed = min(tokens, self.capacity)
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return True
+                if not block:
+                    return False
+                delay = (needed - self._tokens) / float(self.rate)
+            finally:
+                self._lock.release()
+            time.sleep(delay)
+
+    def consume(self, tokens):
+        """
+        Take ``tokens`` tokens from the bucket without waiting.  The
+        bucket may go into debt, which delays later calls to
+        :meth:`acquire`.
+        """
+        self._lock.acquire()
+        try:
+            self._refill()
+            self._tokens -= tokens
+        finally:
+            self._lock.release()
+
+
+class Future(object):
+    """
+    The outcome of an operation completed by another thread.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._result = None
+        self._error = None
+
+    def __repr__(self):
+        if not self.done():
+            state = 'pending'
+        elif self._error is not None:
+            state = 'failed'
+        else:
+            state = 'done'
+        return '%s(%s)' % (self.__class__.__name__, state)
+
+    def set_result(self, result):
+        self._result = result
+        self._event.set()
+
+    def set_exception(self, error):
+        self._error = error
+        self._event.set()
+
+    def done(self):
+        """Return True once the operation has completed or failed."""
+        return self._event.is_set()
+
+    def exception(self, timeout=None):
+        """
+        Wait for the operation and return the error it failed with,
+        or None if it succeeded.  Raises RuntimeError if ``timeout``
+        seconds pass first.
+        """
+        # Event.wait only returns the flag from Python 2.7 on.
+        self._event.wait(timeout)
+        if not self._event.is_set():
+            raise RuntimeError('Not done after %s seconds' % timeout)
+        return self._error
+
+    def result(self, timeout=None):
+        """
+        Wait for the operation and return its result, or raise the
+        error it failed with.
+        """
+        error = self.exception(timeout)
+        if error is not None:
+            raise error
+        return self._result
+
+
 class Password(object):
     """
     Password object that stores itself as hashed.
@@ -0,0 +1,274 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+"""
+Wait for many resources to reach a state with few Describe requests.
+
+The resource types of a service are registered with
+:func:`register_resource_type` by the module of the service, e.g.
+:mod:`boto.ec2.waiter` for instances, volumes, snapshots and images.
+"""
+import time
+
+from boto.exception import WaiterError
+
+
+DEFAULT_BATCH_SIZE = 100
+"""The default maximum number of resources described at once"""
+
+
+class ResourceType(object):
+    """
+    Describes how the resources of a class are polled.
+
+    :ivar state_attr: The attribute holding the state of a resource.
+    :ivar describe: A function called with a connection and a list of
+        ids, returning a dict of the fresh data of the resources found,
+        keyed by id.
+    :ivar id_attr: The attribute holding the id of a resource.
+    :ivar connection_attr: The attribute holding the connection of a
+        resource.  Resources are only described together if they share
+        their connection.
+    :ivar update: A function called with a resource and its fresh data.
+        Defaults to calling the ``_update`` method of the resource.
+    :ivar batch_size: The maximum number of ids described at once.
+    """
+
+    def __init__(self, state_attr, describe, id_attr='id',
+                 connection_attr='connection', update=None,
+                 batch_size=DEFAULT_BATCH_SIZE):
+        self.state_attr = state_attr
+        self.describe = describe
+        self.id_attr = id_attr
+        self.connection_attr = connection_attr
+        if update is None:
+            update = lambda resource, data: resource._update(data)
+        self.update = update
+        self.batch_size = batch_size
+
+
+_resource_types = {}
+
+
+def register_resource_type(cls, state_attr, describe, **kwargs):
+    """
+    Make the instances of ``cls`` usable with :class:`Waiter`.  The
+    keyword arguments are passed to :class:`ResourceType`.
+    """
+    _resource_types[cls] = ResourceType(state_attr, describe, **kwargs)
+
+
+def get_resource_type(resource):
+    """Return the :class:`ResourceType` of a resource."""
+    for cls in type(resource).__mro__:
+        if cls in _resource_types:
+            return _resource_types[cls]
+    raise ValueError('%r cannot be waited for' % resource)
+
+
+class _Wait(object):
+
+    def __init__(self, resource, resource_type, states, failure_states):
+        self.resource = resource
+        self.resource_type = resource_type
+        self.states = states
+        self.failure_states = failure_states
+
+    @property
+    def id(self):
+        return getattr(self.resource, self.resource_type.id_attr)
+
+    @property
+    def state(self):
+        return getattr(self.resource, self.resource_type.state_attr)
+
+
+class Waiter(object):
+    """
+    Polls many resources until each of them reaches one of its target
+    states.
+
+    Each poll issues a single Describe request for every type of
+    resource and connection (e.g. one filtered DescribeInstances call
+    for 200 instances) and applies the results to the resource objects
+    with their ``_update`` method, as their ``update`` method would.
+    The interval between polls starts at ``min_interval`` and grows
+    by ``backoff`` after each poll in which no resource changed state,
+    up to ``max_interval``; it drops back to ``min_interval`` as soon
+    as a state changes.
+
+    :ivar done: The resources that reached one of their target states.
+    :ivar failed: The resources that reached one of their failure
+        states.
+    :ivar requests: The number of Describe requests made.
+    """
+
+    def __init__(self, min_interval=1, max_interval=30, backoff=1.5):
+        """
+        :type min_interval: int|float
+        :param min_interval: The initial number of seconds between
+            polls.
+
+        :type max_interval: int|float
+        :param max_interval: The maximum number of seconds between
+            polls.
+
+        :type backoff: float
+        :param backoff: The factor applied to the interval after a
+            poll that saw no state change.
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self.done = []
+        self.failed = []
+        self.requests = 0
+        self._pending = []
+
+    def __repr__(self):
+        return 'Waiter(%d pending, %d done, %d failed)' % (
+            len(self._pending), len(self.done), len(self.failed))
+
+    @property
+    def pending(self):
+        """The resources that are still being waited for."""
+        return [wait.resource for wait in self._pending]
+
+    def add(self, resource, states, failure_states=None):
+        """
+        Wait for a resource.
+
+        :type resource: Any type registered with
+            :func:`register_resource_type`, e.g. the EC2 resources
+            registered by :mod:`boto.ec2.waiter`.
+        :param resource: The resource to wait for.
+
+        :type states: str or list
+        :param states: The state or states to wait for, e.g. 'running'.
+
+        :type failure_states: list
+        :param failure_states: States after which the resource will
+            never reach ``states``, e.g. ['terminated'].
+        """
+        if isinstance(states, basestring):
+            states = [states]
+        wait = _Wait(resource, get_resource_type(resource), set(states),
+                     set(failure_states or []))
+        self._pending.append(wait)
+
+    def add_all(self, resources, states, failure_states=None):
+        """Wait for each of ``resources``, see :meth:`add`."""
+        for resource in resources:
+            self.add(resource, states, failure_states)
+
+    def poll(self):
+        """
+        Describe every pending resource once.
+
+        :rtype: int
+        :return: The number of resources whose state changed.
+        """
+        groups = {}
+        for wait in self._pending:
+            resource_type = wait.resource_type
+            connection = getattr(wait.resource,
+                                 resource_type.connection_attr)
+            key = (id(resource_type), id(connection))
+            groups.setdefault(key, (resource_type, connection, []))
+            groups[key][2].append(wait)
+        changed = 0
+        for resource_type, connection, waits in groups.values():
+            ids = list(set(wait.id for wait in waits))
+            found = {}
+            for i in xrange(0, len(ids), resource_type.batch_size):
+                found.update(resource_type.describe(
+                    connection, ids[i:i + resource_type.batch_size]))
+                self.requests += 1
+            for wait in waits:
+                data = found.get(wait.id)
+                # Resources just created may not be described yet.
+                if data is None:
+                    continue
+                state = wait.state
+                resource_type.update(wait.resource, data)
+                if wait.state != state:
+                    changed += 1
+        pending = []
+        for wait in self._pending:
+            if wait.state in wait.states:
+                self.done.append(wait.resource)
+            elif wait.state in wait.failure_states:
+                self.failed.append(wait.resource)
+            else:
+                pending.append(wait)
+        self._pending = pending
+        return changed
+
+    def wait(self, timeout=None):
+        """
+        Poll until no resource is pending.
+
+        :type timeout: int|float
+        :param timeout: The maximum number of seconds to wait.
+
+        :raises: :class:`boto.exception.WaiterError` if a resource
+            reached a failure state or the timeout expired, listing
+            the failed and the pending resources.
+        """
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout
+        while True:
+            if self.poll():
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.max_interval,
+                                    self.interval * self.backoff)
+            if not self._pending:
+                break
+            delay = self.interval
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                delay = min(delay, remaining)
+            time.sleep(delay)
+        if self._pending or self.failed:
+            raise WaiterError(
+                '%d resources failed, %d still pending' % (
+                    len(self.failed), len(self._pending)),
+                self.pending, self.failed)
+
+
+def wait_for(resources, states, failure_states=None, timeout=None,
+             **kwargs):
+    """
+    Wait for each of ``resources`` to reach one of ``states``.  The
+    keyword arguments are passed to :class:`Waiter`.
+
+    :rtype: :class:`Waiter`
+    :return: The waiter, whose ``requests`` attribute counts the
+        Describe requests made.
+    """
+    waiter = Waiter(**kwargs)
+    waiter.add_all(resources, states, failure_states)
+    waiter.wait(timeout)
+    return waiter
@@ -22,6 +22,8 @@
 #
 from tests.unit import unittest
 
+from mock import Mock
+
 from boto.dynamodb.batch import Batch
 from boto.dynamodb.table import Table
 from boto.dynamodb.layer2 import Layer2
@@ -99,5 +101,76 @@ class TestBatchObjects(unittest.TestCase):
                              'ConsistentRead': False}})
 
 
+class TestTableBatchGenerator(unittest.TestCase):
+
+    def setUp(self):
+        self.layer2 = Layer2('access_key', 'secret_key')
+        self.table = Table(self.layer2, DESCRIBE_TABLE_1)
+        self.requested = []
+
+    def fake_batch_get_item(self, unprocessed=None):
+        unprocessed = list(unprocessed or [])
+
+        def batch_get_item(batch_list):
+            keys = [k['HashKeyElement']['S']
+                    for k in batch_list.to_dict()['testtable']['Keys']]
+            self.requested.append(keys)
+            res = {'Responses': {'testtable': {
+                'ConsumedCapacityUnits': 1.0,
+                'Items': [{'foo': k} for k in keys
+                          if k not in unprocessed]}}}
+            skipped = [k for k in keys if k in unprocessed]
+            if skipped:
+                for k in skipped:
+                    unprocessed.remove(k)
+                res['UnprocessedKeys'] = {'testtable': {
+                    'Keys': [{'HashKeyElement': k} for k in skipped]}}
+            return res
+        return batch_get_item
+
+    def test_keys_are_split_into_batches_of_100(self):
+        self.layer2.batch_get_item = self.fake_batch_get_item()
+        keys = ['k%d' % i for i in range(250)]
+        gen = self.table.batch_get_item(keys)
+        items = list(gen)
+        self.assertEqual([i['foo'] for i in items], keys)
+        self.assertEqual([len(r) for r in self.requested], [100, 100, 50])
+        self.assertEqual(gen.consumed_units, 3)
+
+    def test_unprocessed_keys_are_requeued(self):
+        self.layer2.batch_get_item = self.fake_batch_get_item(['k1', 'k3'])
+        self.layer2.get_table = Mock()
+        items = list(self.table.batch_get_item(['k1', 'k2', 'k3']))
+        self.assertEqual(sorted(i['foo'] for i in items),
+                         ['k1', 'k2', 'k3'])
+        self.assertEqual(self.requested, [['k1', 'k2', 'k3'], ['k1', 'k3']])
+        self.assertFalse(self.layer2.get_table.called)
+
+    def test_consistent_read_is_sent(self):
+        requests = []
+
+        def batch_get_item(batch_list):
+            requests.append(batch_list.to_dict())
+            return {'Responses': {}}
+        self.layer2.batch_get_item = batch_get_item
+        list(self.table.batch_get_item(['k1'], consistent_read=True))
+        self.assertTrue(requests[0]['testtable']['ConsistentRead'])
+
+    def test_concurrent_requests(self):
+        self.layer2.batch_get_item = self.fake_batch_get_item(['k7'])
+        keys = ['k%d' % i for i in range(1000)]
+        gen = self.table.batch_get_item(keys, max_concurrent_requests=4)
+        items = list(gen)
+        self.assertEqual(sorted(i['foo'] for i in items), sorted(keys))
+        self.assertEqual(len(self.requested), 11)
+        self.assertEqual(gen.consumed_units, 11)
+
+    def test_concurrent_requests_propagate_errors(self):
+        self.layer2.batch_get_item = Mock(side_effect=ValueError('boom'))
+        gen = self.table.batch_get_item(['k1', 'k2'],
+                                        max_concurrent_requests=2)
+        self.assertRaises(ValueError, list, gen)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import threading
+import time
+
+from tests.unit import unittest
+
+from mock import Mock, patch
+
+from boto.dynamodb.layer2 import Layer2
+from boto.dynamodb.table import Table
+from boto.dynamodb.exceptions import DynamoDBKeyNotFoundError
+
+
+DESCRIBE_TABLE = {
+    'Table': {
+        'CreationDateTime': 1349910554.478,
+        'ItemCount': 1,
+        'KeySchema': {'HashKeyElement': {'AttributeName': u'foo',
+                                         'AttributeType': u'S'}},
+        'ProvisionedThroughput': {'ReadCapacityUnits': 10,
+                                  'WriteCapacityUnits': 10},
+        'TableName': 'testtable',
+        'TableSizeBytes': 54,
+        'TableStatus': 'ACTIVE'}
+}
+
+
+class TestItemCache(unittest.TestCase):
+
+    def setUp(self):
+        self.layer2 = Layer2('access_key', 'secret_key')
+        self.layer2.layer1 = Mock()
+        self.layer2.layer1.get_item.side_effect = self.get_item
+        self.layer2.layer1.put_item.return_value = {}
+        self.table = Table(self.layer2, DESCRIBE_TABLE)
+        self.cache = self.table.enable_item_cache(max_items=2, ttl=60,
+                                                  negative_ttl=60)
+        self.items = {'a': {'foo': {'S': 'a'}, 'n': {'N': '1'}},
+                      'b': {'foo': {'S': 'b'}, 'n': {'N': '2'}},
+                      'c': {'foo': {'S': 'c'}, 'n': {'N': '3'}}}
+
+    def get_item(self, table_name, key, attributes_to_get=None,
+                 consistent_read=False):
+        hash_key = key['HashKeyElement']['S']
+        if hash_key not in self.items:
+            raise DynamoDBKeyNotFoundError('Key does not exist.')
+        return {'Item': dict(self.items[hash_key]),
+                'ConsumedCapacityUnits': 0.5}
+
+    def test_hit_after_miss(self):
+        item = self.table.get_item('a')
+        self.assertEqual(item['n'], 1)
+        self.assertEqual(item.consumed_units, 0.5)
+        item = self.table.get_item('a')
+        self.assertEqual(item['n'], 1)
+        self.assertEqual(item.consumed_units, 0)
+        self.assertEqual(self.layer2.layer1.get_item.call_count, 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_projections_are_cached_separately(self):
+        self.table.get_item('a')
+        self.table.get_item('a', attributes_to_get=['n'])
+        self.assertEqual(self.layer2.layer1.get_item.call_count, 2)
+
+    def test_consistent_read_bypasses_cache(self):
+        self.table.get_item('a')
+        self.table.get_item('a', consistent_read=True)
+        self.assertEqual(self.layer2.layer1.get_item.call_count, 2)
+
+    def test_put_invalidates(self):
+        item = self.table.get_item('a')
+        item['n'] = 5
+        self.items['a']['n'] = {'N': '5'}
+        item.put()
+        self.assertEqual(self.table.get_item('a')['n'], 5)
+        self.assertEqual(self.layer2.layer1.get_item.call_count, 2)
+        self.assertEqual(self.cache.invalidations, 1)
+
+    def test_negative_caching(self):
+        self.assertRaises(DynamoDBKeyNotFoundError, self.table.get_item, 'x')
+        self.assertRaises(DynamoDBKeyNotFoundError, self.table.get_item, 'x')
+        self.assertEqual(self.layer2.layer1.get_item.call_count, 1)
+        self.assertEqual(self.cache.negative_hits, 1)
+
+    def test_ttl_expiry(self):
+        self.table.get_item('a')
+        with patch('time.time', Mock(return_value=time.time() + 120)):
+            self.table.get_item('a')
+        self.assertEqual(self.layer2.layer1.get_item.call_count, 2)
+
+    def test_lru_eviction(self):
+        self.table.get_item('a')
+        self.table.get_item('b')
+        self.table.get_item('c')
+        self.assertEqual(len(self.cache), 2)
+        self.table.get_item('a')
+        self.assertEqual(self.layer2.layer1.get_item.call_count, 4)
+
+    def test_concurrent_misses_are_coalesced(self):
+        release = threading.Event()
+
+        def slow_get_item(*args, **kwargs):
+            release.wait()
+            return self.get_item(*args, **kwargs)
+        self.layer2.layer1.get_item.side_effect = slow_get_item
+        results = []
+
+        def read():
+            results.append(self.table.get_item('a')['n'])
+        threads = [threading.Thread(target=read) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        while self.cache.coalesced < 4:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [1] * 5)
+        self.assertEqual(self.layer2.layer1.get_item.call_count, 1)
+
+    def test_disable(self):
+        self.table.disable_item_cache()
+        self.assertIsNone(self.table.item_cache)
+        self.table.get_item('a')
+        self.table.get_item('a')
+        self.assertEqual(self.layer2.layer1.get_item.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+from tests.unit import unittest
+
+from mock import Mock, patch
+
+from boto.dynamodb.layer2 import Layer2
+from boto.dynamodb.table import Table
+
+
+DESCRIBE_TABLE = {
+    'Table': {
+        'CreationDateTime': 1349910554.478,
+        'ItemCount': 1,
+        'KeySchema': {'HashKeyElement': {'AttributeName': u'foo',
+                                         'AttributeType': u'S'}},
+        'ProvisionedThroughput': {'ReadCapacityUnits': 10,
+                                  'WriteCapacityUnits': 4},
+        'TableName': 'testtable',
+        'TableSizeBytes': 54,
+        'TableStatus': 'ACTIVE'}
+}
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestThroughputGovernor(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.patchers = [patch('time.time', self.clock.time),
+                         patch('time.sleep', self.clock.sleep)]
+        for patcher in self.patchers:
+            patcher.start()
+        self.layer2 = Layer2('access_key', 'secret_key')
+        self.layer2.layer1 = Mock()
+        self.table = Table(self.layer2, DESCRIBE_TABLE)
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test_rates_follow_provisioned_throughput(self):
+        governor = self.table.limit_throughput(read_fraction=0.5,
+                                               write_fraction=0.25)
+        self.assertEqual(governor.read_rate, 5)
+        self.assertEqual(governor.write_rate, 1)
+        self.table._dict['ProvisionedThroughput']['ReadCapacityUnits'] = 20
+        self.assertEqual(governor.read_rate, 10)
+        self.table._dict['ProvisionedThroughput']['ReadCapacityUnits'] = 10
+
+    def test_scan_is_paced_by_consumed_units(self):
+        self.table.limit_throughput(read_fraction=0.5)
+        pages = [{'Items': [{'foo': {'S': 'a'}}],
+                  'ConsumedCapacityUnits': 10,
+                  'LastEvaluatedKey': {'HashKeyElement': {'S': 'a'}}}
+                 for i in range(3)]
+        pages[-1].pop('LastEvaluatedKey')
+        self.layer2.layer1.scan.side_effect = pages
+        items = list(self.table.scan())
+        self.assertEqual(len(items), 3)
+        # 5 units/sec with a 5 unit burst: each 10 unit page has to be
+        # paid back before the next request is made.
+        self.assertAlmostEqual(sum(self.clock.sleeps), 3.0)
+        self.assertEqual(self.table.governor.consumed_read_units, 30)
+
+    def test_writes_are_paced(self):
+        self.table.limit_throughput(write_fraction=0.25)
+        self.layer2.layer1.put_item.return_value = {
+            'ConsumedCapacityUnits': 2}
+        for i in range(3):
+            self.table.new_item('k%d' % i).put()
+        self.assertAlmostEqual(sum(self.clock.sleeps), 3.0)
+        self.assertEqual(self.table.governor.consumed_write_units, 6)
+
+    def test_other_table_objects_are_not_paced(self):
+        self.table.limit_throughput(read_fraction=0.1)
+        other = Table(self.layer2, DESCRIBE_TABLE)
+        self.layer2.layer1.get_item.return_value = {
+            'Item': {'foo': {'S': 'a'}}, 'ConsumedCapacityUnits': 50}
+        for i in range(3):
+            other.get_item('a')
+        self.assertEqual(self.clock.sleeps, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+from binascii import crc32
+from StringIO import StringIO
+
+from tests.unit import unittest
+
+from boto.connection import HTTPResponse
+from boto.dynamodb.layer1 import Layer1
+
+
+class FakeSocket(object):
+
+    def __init__(self, data):
+        self._data = data
+
+    def makefile(self, *args, **kwargs):
+        return StringIO(self._data)
+
+
+def make_response(body, status=200, crc=None):
+    if crc is None:
+        crc = crc32(body) & 0xffffffff
+    raw = ('HTTP/1.1 %d OK\r\n'
+           'Content-Length: %d\r\n'
+           'x-amz-crc32: %s\r\n'
+           '\r\n%s' % (status, len(body), crc, body))
+    response = HTTPResponse(FakeSocket(raw))
+    response.begin()
+    return response
+
+
+class TestResponseChecksum(unittest.TestCase):
+
+    def setUp(self):
+        self.layer1 = Layer1('access_key', 'secret_key')
+
+    def test_read_crc32_streams_body_once(self):
+        body = '{"Items": [%s]}' % ','.join(['"x"'] * 100000)
+        response = make_response(body)
+        self.assertEqual(response.read_crc32(),
+                         (body, crc32(body) & 0xffffffff))
+        # The body is cached for the JSON decoding that follows.
+        self.assertEqual(response.read(), body)
+
+    def test_read_crc32_after_read(self):
+        response = make_response('{}')
+        self.assertEqual(response.read(), '{}')
+        self.assertEqual(response.read_crc32()[1], crc32('{}') & 0xffffffff)
+
+    def test_valid_checksum_is_not_retried(self):
+        response = make_response('{"Count": 1}')
+        self.assertIsNone(self.layer1._retry_handler(response, 0, 0))
+        self.assertEqual(response.read(), '{"Count": 1}')
+
+    def test_invalid_checksum_is_retried(self):
+        response = make_response('{"Count": 1}', crc=1234)
+        status = self.layer1._retry_handler(response, 0, 0)
+        self.assertIsNotNone(status)
+        self.assertEqual(status[1], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
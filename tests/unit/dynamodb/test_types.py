@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+from tests.unit import unittest
+
+from mock import Mock
+
+from boto.compat import json
+from boto.dynamodb.layer2 import Layer2, item_object_hook
+from boto.dynamodb.types import Dynamizer, Binary, dynamize_value
+
+
+class TestDynamizer(unittest.TestCase):
+
+    def setUp(self):
+        self.dynamizer = Dynamizer()
+
+    def test_encode_matches_dynamize_value(self):
+        values = [1, 1L, 1.5, True, False, 'foo', u'f\xf6\xf6',
+                  set([1, 2]), set([1.5]), set(['a', 'b']),
+                  frozenset([u'x']), set(), Binary('\x00\x01'),
+                  set([Binary('a'), Binary('b')])]
+        for value in values:
+            expected = dynamize_value(value)
+            actual = self.dynamizer.encode(value)
+            self.assertEqual(actual.keys(), expected.keys())
+            key = expected.keys()[0]
+            if isinstance(expected[key], list):
+                self.assertEqual(sorted(actual[key]), sorted(expected[key]))
+            else:
+                self.assertEqual(actual[key], expected[key])
+
+    def test_encode_subclass(self):
+        class MyStr(str):
+            pass
+        self.assertEqual(self.dynamizer.encode(MyStr('a')), {'S': 'a'})
+
+    def test_encode_mixed_set_fails(self):
+        self.assertRaises(TypeError, self.dynamizer.encode, set([1, 'a']))
+        self.assertRaises(TypeError, self.dynamizer.encode, set([None]))
+        self.assertRaises(TypeError, self.dynamizer.encode, None)
+
+    def test_decode_matches_object_hook(self):
+        body = json.dumps({'Item': {
+            'str': {'S': 'foo'}, 'int': {'N': '12'}, 'float': {'N': '1.5'},
+            'ss': {'SS': ['a', 'b']}, 'ns': {'NS': ['1', '2.5']},
+            'b': {'B': 'AAE='}, 'bs': {'BS': ['YQ==', 'Yg==']}}})
+        expected = json.loads(body, object_hook=item_object_hook)['Item']
+        actual = self.dynamizer.decode_item(json.loads(body)['Item'])
+        self.assertEqual(actual, expected)
+
+    def test_item_round_trip(self):
+        item = {'foo': 'bar', 'count': 3, 'tags': set(['a', 'b']),
+                'data': Binary('abc')}
+        encoded = json.loads(json.dumps(self.dynamizer.encode_item(item)))
+        self.assertEqual(self.dynamizer.decode_item(encoded), item)
+
+
+class TestLayer2Decoding(unittest.TestCase):
+
+    def setUp(self):
+        self.layer2 = Layer2('access_key', 'secret_key')
+        self.layer2.layer1 = Mock()
+
+    def test_batch_get_item_decodes_items_and_unprocessed_keys(self):
+        self.layer2.layer1.batch_get_item.return_value = {
+            'Responses': {'t': {'ConsumedCapacityUnits': 1,
+                                'Items': [{'foo': {'S': 'a'},
+                                           'n': {'N': '2'}}]}},
+            'UnprocessedKeys': {'t': {'Keys': [
+                {'HashKeyElement': {'S': 'b'},
+                 'RangeKeyElement': {'N': '3'}}]}}}
+        batch_list = self.layer2.new_batch_list()
+        response = self.layer2.batch_get_item(batch_list)
+        self.assertEqual(response['Responses']['t']['Items'],
+                         [{'foo': 'a', 'n': 2}])
+        self.assertEqual(response['UnprocessedKeys']['t']['Keys'],
+                         [{'HashKeyElement': 'b', 'RangeKeyElement': 3}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+from datetime import datetime, timedelta
+
+from tests.unit import unittest
+
+from boto.ec2.autoscale import AutoScaleConnection
+from boto.ec2.autoscale.activity import Activity
+from boto.ec2.autoscale.group import AutoScalingGroup
+from boto.ec2.autoscale.tailer import ActivityTailer
+from boto.resultset import ResultSet
+
+
+T0 = datetime(2012, 10, 1)
+
+
+def activity(group, n, status='Successful', progress='100'):
+    a = Activity()
+    a.activity_id = '%s-%d' % (group, n)
+    a.group_name = group
+    a.start_time = T0 + timedelta(minutes=n)
+    a.status_code = status
+    a.progress = progress
+    return a
+
+
+class FakeConnection(object):
+
+    def __init__(self, activities):
+        self.activities = activities
+        self.calls = []
+
+    def get_all_groups(self, next_token=None):
+        groups = ResultSet()
+        for name in sorted(self.activities):
+            group = AutoScalingGroup()
+            group.name = name
+            groups.append(group)
+        return groups
+
+    def get_all_activities(self, name, max_records=None, next_token=None):
+        self.calls.append((name, next_token))
+        newest_first = sorted(self.activities[name],
+                              key=lambda a: a.start_time, reverse=True)
+        offset = int(next_token or 0)
+        page = ResultSet()
+        page.extend(newest_first[offset:offset + max_records])
+        if offset + max_records < len(newest_first):
+            page.next_token = str(offset + max_records)
+        return page
+
+
+class TestActivityTailer(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = FakeConnection({
+            'web': [activity('web', n) for n in range(10)] +
+                   [activity('web', 10, 'InProgress', '50')],
+            'api': [activity('api', 0)]})
+        self.tailer = ActivityTailer(self.connection, page_size=3)
+
+    def ids(self, events):
+        return [(e.activity.activity_id, e.old_status_code,
+                 e.activity.status_code) for e in events]
+
+    def test_first_poll_reports_unfinished_activities(self):
+        events = self.tailer.poll()
+        self.assertEqual(self.ids(events),
+                         [('web-10', None, 'InProgress')])
+        self.assertTrue(events[0].is_new)
+        self.assertFalse(events[0].is_done)
+        self.assertEqual(self.connection.calls,
+                         [('api', None), ('web', None)])
+
+    def test_include_history(self):
+        tailer = ActivityTailer(self.connection, ['web'], page_size=3,
+                                include_history=True)
+        self.assertEqual([e.activity.activity_id for e in tailer.poll()],
+                         ['web-8', 'web-9', 'web-10'])
+
+    def test_only_new_and_changed_activities_are_reported(self):
+        self.tailer.poll()
+        self.assertEqual(self.tailer.poll(), [])
+        web = self.connection.activities['web']
+        web[-1] = activity('web', 10)
+        web.extend(activity('web', n, 'InProgress', '0')
+                   for n in range(11, 16))
+        del self.connection.calls[:]
+        events = self.tailer.poll()
+        self.assertEqual(self.ids(events),
+                         [('web-10', 'InProgress', 'Successful')] +
+                         [('web-%d' % n, None, 'InProgress')
+                          for n in range(11, 16)])
+        self.assertEqual(events[0].old_progress, '50')
+        self.assertTrue(events[0].is_done)
+        self.assertEqual(self.connection.calls,
+                         [('api', None), ('web', None), ('web', '3'),
+                          ('web', '6')])
+
+    def test_steady_state_is_one_request_per_group(self):
+        self.tailer.poll()
+        requests = self.tailer.requests
+        self.tailer.poll()
+        # One DescribeAutoScalingGroups and one page per group.
+        self.assertEqual(self.tailer.requests - requests, 3)
+
+    def test_failed_poll_keeps_changes(self):
+        self.tailer.poll()
+        web = self.connection.activities['web']
+        web.extend(activity('web', n) for n in range(11, 16))
+        get_all_activities = self.connection.get_all_activities
+
+        def failing(name, max_records=None, next_token=None):
+            if next_token:
+                raise Exception('Throttling')
+            return get_all_activities(name, max_records, next_token)
+
+        self.connection.get_all_activities = failing
+        self.assertEqual(self.tailer.poll(), [])
+        self.assertEqual(self.tailer.errors.keys(), ['web'])
+        self.connection.get_all_activities = get_all_activities
+        events = self.tailer.poll()
+        self.assertEqual(len(events), 5)
+        self.assertEqual(self.tailer.errors, {})
+
+    def test_follow(self):
+        events = list(self.tailer.follow(interval=0, timeout=0))
+        self.assertEqual(len(events), 1)
+
+    def test_factory(self):
+        connection = AutoScaleConnection('access', 'secret')
+        tailer = connection.activity_tailer(['web'], page_size=5)
+        self.assertTrue(isinstance(tailer, ActivityTailer))
+        self.assertEqual(tailer.group_names, ['web'])
+        self.assertEqual(tailer.page_size, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+from tests.unit import unittest
+
+from mock import patch
+
+from boto.ec2.cloudwatch import CloudWatchConnection
+from boto.ec2.cloudwatch.buffer import MetricBuffer
+
+
+class TestMetricBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = CloudWatchConnection(
+            aws_access_key_id='aws_access_key_id',
+            aws_secret_access_key='aws_secret_access_key')
+        self.requests = []
+        self.fail = False
+        patcher = patch.object(self.connection, 'get_status',
+                               side_effect=self._get_status)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get_status(self, action, params, verb='GET'):
+        if self.fail:
+            raise Exception('unavailable')
+        self.requests.append((action, params))
+        return True
+
+    def test_values_are_aggregated(self):
+        buf = self.connection.metric_buffer('App', autostart=False)
+        for value in (3, 1, 8):
+            buf.put('Latency', value, unit='Milliseconds',
+                    dimensions={'Host': 'web1'})
+        buf.put('Latency', 5, unit='Milliseconds',
+                dimensions={'Host': 'web2'})
+        self.assertEqual(len(buf), 2)
+        self.assertEqual(buf.flush(), 2)
+        self.assertEqual(len(buf), 0)
+        self.assertEqual(len(self.requests), 1)
+        action, params = self.requests[0]
+        self.assertEqual(action, 'PutMetricData')
+        self.assertEqual(params['Namespace'], 'App')
+        members = {}
+        for i in (1, 2):
+            prefix = 'MetricData.member.%d.' % i
+            host = params[prefix + 'Dimensions.member.1.Value']
+            members[host] = prefix
+            self.assertEqual(params[prefix + 'MetricName'], 'Latency')
+            self.assertEqual(params[prefix + 'Unit'], 'Milliseconds')
+            self.assertTrue(prefix + 'Timestamp' in params)
+            self.assertFalse(prefix + 'Value' in params)
+        prefix = members['web1']
+        self.assertEqual(params[prefix + 'StatisticValues.Sum'], 12)
+        self.assertEqual(params[prefix + 'StatisticValues.SampleCount'], 3)
+        self.assertEqual(params[prefix + 'StatisticValues.Minimum'], 1)
+        self.assertEqual(params[prefix + 'StatisticValues.Maximum'], 8)
+        self.assertEqual(buf.values, 4)
+        self.assertEqual(buf.published, 2)
+
+    def test_batches_of_twenty_per_namespace(self):
+        buf = MetricBuffer(self.connection, 'App', autostart=False)
+        for i in xrange(45):
+            buf.increment('Metric%d' % i)
+        buf.increment('Other', namespace='Other')
+        self.assertEqual(buf.flush(), 46)
+        self.assertEqual([len([k for k in params if k.endswith('MetricName')])
+                          for _, params in self.requests], [20, 20, 5, 1])
+        self.assertEqual(self.requests[-1][1]['Namespace'], 'Other')
+
+    def test_failed_batches_are_merged_back(self):
+        buf = MetricBuffer(self.connection, 'App', autostart=False)
+        buf.put('Latency', 10)
+        self.fail = True
+        self.assertEqual(buf.flush(), 0)
+        self.assertEqual(buf.errors, 1)
+        buf.put('Latency', 20)
+        self.fail = False
+        self.assertEqual(buf.flush(), 1)
+        params = self.requests[0][1]
+        self.assertEqual(params['MetricData.member.1.StatisticValues.Sum'],
+                         30)
+        self.assertEqual(
+            params['MetricData.member.1.StatisticValues.SampleCount'], 2)
+        self.assertEqual(params['MetricData.member.1.Unit'], 'None')
+
+    def test_buffer_is_bounded(self):
+        buf = MetricBuffer(self.connection, 'App', max_metrics=2,
+                           autostart=False)
+        for name in ('a', 'b', 'c'):
+            buf.put(name, 1)
+        buf.put('a', 1)
+        self.assertEqual(len(buf), 2)
+        self.assertEqual(buf.values, 3)
+
+    def test_close_flushes(self):
+        buf = MetricBuffer(self.connection, 'App', flush_interval=3600)
+        buf.put('Latency', 1)
+        buf.close()
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(buf._thread, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
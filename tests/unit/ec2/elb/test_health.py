@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import threading
+import time
+
+from tests.unit import unittest
+
+from boto.ec2.elb import ELBConnection
+from boto.ec2.elb.health import HealthMonitor
+from boto.ec2.elb.instancestate import InstanceState
+from boto.ec2.elb.loadbalancer import LoadBalancer
+
+
+def states(*pairs):
+    return [InstanceState(instance_id=instance_id, state=state,
+                          description='N/A')
+            for instance_id, state in pairs]
+
+
+class FakeConnection(object):
+
+    def __init__(self, health):
+        self.health = health
+        self.calls = []
+
+    def get_all_load_balancers(self):
+        lbs = []
+        for name in sorted(self.health):
+            lb = LoadBalancer()
+            lb.name = name
+            lbs.append(lb)
+        return lbs
+
+    def describe_instance_health(self, name):
+        self.calls.append(name)
+        result = self.health[name]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class TestHealthMonitor(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = FakeConnection({
+            'web': states(('i-1', 'InService'), ('i-2', 'InService')),
+            'api': states(('i-3', 'OutOfService'))})
+        self.monitor = HealthMonitor(self.connection)
+
+    def transitions(self, events):
+        return [(e.load_balancer_name, e.instance_id, e.old_state,
+                 e.new_state) for e in events]
+
+    def test_first_poll_reports_every_instance(self):
+        events = self.monitor.poll()
+        self.assertEqual(self.transitions(events), [
+            ('api', 'i-3', None, 'OutOfService'),
+            ('web', 'i-1', None, 'InService'),
+            ('web', 'i-2', None, 'InService')])
+        self.assertEqual(self.monitor.get_state('web', 'i-1'), 'InService')
+
+    def test_only_changes_are_reported(self):
+        self.monitor.poll()
+        self.assertEqual(self.monitor.poll(), [])
+        self.connection.health['web'] = states(('i-1', 'OutOfService'),
+                                               ('i-4', 'InService'))
+        events = self.monitor.poll()
+        self.assertEqual(self.transitions(events), [
+            ('web', 'i-1', 'InService', 'OutOfService'),
+            ('web', 'i-2', 'InService', None),
+            ('web', 'i-4', None, 'InService')])
+        self.assertEqual(self.monitor.get_state('web', 'i-2'), None)
+        self.assertEqual(self.monitor.polls, 3)
+
+    def test_failed_poll_keeps_states(self):
+        self.monitor.poll()
+        error = Exception('Throttling')
+        self.connection.health['web'] = error
+        self.assertEqual(self.monitor.poll(), [])
+        self.assertEqual(self.monitor.errors, {'web': error})
+        self.assertEqual(self.monitor.get_state('web', 'i-1'), 'InService')
+        self.connection.health['web'] = states(('i-1', 'InService'))
+        events = self.monitor.poll()
+        self.assertEqual(self.transitions(events),
+                         [('web', 'i-2', 'InService', None)])
+        self.assertEqual(self.monitor.errors, {})
+
+    def test_deleted_load_balancer(self):
+        self.monitor.poll()
+        del self.connection.health['api']
+        events = self.monitor.poll()
+        self.assertEqual(self.transitions(events),
+                         [('api', 'i-3', 'OutOfService', None)])
+
+    def test_explicit_names(self):
+        monitor = HealthMonitor(self.connection, ['web'])
+        events = monitor.poll()
+        self.assertEqual(len(events), 2)
+        self.assertEqual(self.connection.calls, ['web'])
+
+    def test_requests_are_concurrent(self):
+        names = ['lb-%d' % i for i in range(6)]
+        self.connection.health = dict((name, []) for name in names)
+        condition = threading.Condition()
+        active = [0, 0]
+
+        def describe(name):
+            condition.acquire()
+            try:
+                active[0] += 1
+                active[1] = max(active[1], active[0])
+                condition.notify_all()
+                deadline = time.time() + 2
+                while active[1] < 3 and time.time() < deadline:
+                    condition.wait(0.1)
+                active[0] -= 1
+            finally:
+                condition.release()
+            return []
+
+        self.connection.describe_instance_health = describe
+        monitor = HealthMonitor(self.connection, num_threads=3)
+        monitor.poll()
+        self.assertEqual(active[1], 3)
+
+    def test_background_polling(self):
+        received = []
+        done = threading.Event()
+
+        def handler(event):
+            received.append(event)
+            if len(received) == 3:
+                done.set()
+
+        monitor = HealthMonitor(self.connection, interval=60,
+                                handler=handler)
+        monitor.start()
+        done.wait(5)
+        monitor.close()
+        self.assertEqual(len(received), 3)
+        self.assertEqual(monitor.polls, 1)
+
+
+class TestHealthMonitorFactory(unittest.TestCase):
+
+    def test_health_monitor(self):
+        connection = ELBConnection('access', 'secret')
+        monitor = connection.health_monitor(['web'], num_threads=2)
+        self.assertTrue(isinstance(monitor, HealthMonitor))
+        self.assertEqual(monitor.load_balancer_names, ['web'])
+        self.assertEqual(monitor.num_threads, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import cPickle
+
+from tests.unit import unittest
+
+import mock
+
+from boto.ec2.connection import EC2Connection
+from boto.ec2.compact import CompactEC2Connection, CompactInstance
+from boto.ec2.instance import Instance
+
+
+INSTANCE = r"""
+        <item>
+          <instanceId>%(id)s</instanceId>
+          <imageId>ami-ed65ba84</imageId>
+          <instanceState>
+            <code>16</code>
+            <name>running</name>
+          </instanceState>
+          <privateDnsName>ip-10-0-0-1.ec2.internal</privateDnsName>
+          <dnsName>ec2-1-2-3-4.compute-1.amazonaws.com</dnsName>
+          <reason/>
+          <keyName>awskeypair</keyName>
+          <amiLaunchIndex>0</amiLaunchIndex>
+          <productCodes/>
+          <instanceType>m1.small</instanceType>
+          <launchTime>2012-05-30T19:21:18.000Z</launchTime>
+          <placement>
+            <availabilityZone>us-east-1a</availabilityZone>
+            <groupName/>
+            <tenancy>default</tenancy>
+          </placement>
+          <monitoring>
+            <state>enabled</state>
+          </monitoring>
+          <groupSet>
+            <item>
+              <groupId>sg-99a710f1</groupId>
+              <groupName>SSH</groupName>
+            </item>
+          </groupSet>
+          <architecture>x86_64</architecture>
+          <rootDeviceType>ebs</rootDeviceType>
+          <rootDeviceName>/dev/sda1</rootDeviceName>
+          <virtualizationType>paravirtual</virtualizationType>
+          <clientToken/>
+          %(tags)s
+          <hypervisor>xen</hypervisor>
+          <networkInterfaceSet/>
+          <ebsOptimized>false</ebsOptimized>
+          <futureElement>new</futureElement>
+        </item>"""
+
+TAGS = r"""<tagSet>
+            <item>
+              <key>Name</key>
+              <value>web</value>
+            </item>
+          </tagSet>"""
+
+DESCRIBE_INSTANCES = r"""<?xml version="1.0" encoding="UTF-8"?>
+<DescribeInstancesResponse xmlns="http://ec2.amazonaws.com/doc/2012-08-15/">
+  <requestId>98e3c9a4-848c-4d6d-8e8a-b1bdEXAMPLE</requestId>
+  <reservationSet>
+    <item>
+      <reservationId>r-1</reservationId>
+      <ownerId>123456789012</ownerId>
+      <groupSet>
+        <item>
+          <groupId>sg-99a710f1</groupId>
+          <groupName>SSH</groupName>
+        </item>
+      </groupSet>
+      <instancesSet>%s%s
+      </instancesSet>
+    </item>
+  </reservationSet>
+</DescribeInstancesResponse>""" % (INSTANCE % {'id': 'i-1', 'tags': TAGS},
+                                   INSTANCE % {'id': 'i-2', 'tags': ''})
+
+DESCRIBE_VOLUMES = r"""<?xml version="1.0" encoding="UTF-8"?>
+<DescribeVolumesResponse xmlns="http://ec2.amazonaws.com/doc/2012-08-15/">
+  <requestId>59dbff89-35bd-4eac-99ed-be587EXAMPLE</requestId>
+  <volumeSet>
+    <item>
+      <volumeId>vol-1</volumeId>
+      <size>80</size>
+      <snapshotId/>
+      <availabilityZone>us-east-1a</availabilityZone>
+      <status>in-use</status>
+      <createTime>2008-05-07T11:51:50.000Z</createTime>
+      <attachmentSet>
+        <item>
+          <volumeId>vol-1</volumeId>
+          <instanceId>i-1</instanceId>
+          <device>/dev/sdh</device>
+          <status>attached</status>
+          <attachTime>2008-05-07T12:51:50.000Z</attachTime>
+          <deleteOnTermination>false</deleteOnTermination>
+        </item>
+      </attachmentSet>
+      <volumeType>standard</volumeType>
+    </item>
+  </volumeSet>
+</DescribeVolumesResponse>"""
+
+DESCRIBE_SECURITY_GROUPS = r"""<?xml version="1.0" encoding="UTF-8"?>
+<DescribeSecurityGroupsResponse xmlns="http://ec2.amazonaws.com/doc/2012-08-15/">
+  <requestId>59dbff89-35bd-4eac-99ed-be587EXAMPLE</requestId>
+  <securityGroupInfo>
+    <item>
+      <ownerId>123456789012</ownerId>
+      <groupId>sg-1</groupId>
+      <groupName>WebServers</groupName>
+      <groupDescription>Web Servers</groupDescription>
+      <vpcId/>
+      <ipPermissions>
+        <item>
+          <ipProtocol>tcp</ipProtocol>
+          <fromPort>80</fromPort>
+          <toPort>80</toPort>
+          <groups>
+            <item>
+              <userId>123456789012</userId>
+              <groupId>sg-2</groupId>
+              <groupName>RangedPortsBySource</groupName>
+            </item>
+          </groups>
+          <ipRanges>
+            <item>
+              <cidrIp>0.0.0.0/0</cidrIp>
+            </item>
+          </ipRanges>
+        </item>
+      </ipPermissions>
+      <ipPermissionsEgress/>
+    </item>
+  </securityGroupInfo>
+</DescribeSecurityGroupsResponse>"""
+
+
+def make_connection(cls, body):
+    connection = cls(aws_access_key_id='aws_access_key_id',
+                     aws_secret_access_key='aws_secret_access_key')
+    response = mock.Mock()
+    response.read.return_value = body
+    response.status = 200
+    connection.make_request = mock.Mock(return_value=response)
+    return connection
+
+
+def public_attributes(obj):
+    names = set(dir(obj)) - set(dir(type(obj)))
+    return dict((name, getattr(obj, name)) for name in names
+                if name not in ('connection', 'tags'))
+
+
+class TestCompactObjects(unittest.TestCase):
+
+    def get_instances(self, cls):
+        connection = make_connection(cls, DESCRIBE_INSTANCES)
+        reservations = connection.get_all_instances()
+        return reservations[0], reservations[0].instances
+
+    def test_instances_have_the_same_attributes(self):
+        _, plain = self.get_instances(EC2Connection)
+        reservation, compact = self.get_instances(CompactEC2Connection)
+        self.assertTrue(isinstance(compact[0], Instance))
+        for plain_instance, compact_instance in zip(plain, compact):
+            plain_attrs = plain_instance.__dict__
+            for name, value in plain_attrs.items():
+                if name in ('connection', 'region', 'tags', 'groups',
+                            '_state', '_placement', 'product_codes'):
+                    continue
+                self.assertEqual(getattr(compact_instance, name), value,
+                                 name)
+            self.assertEqual(compact_instance.tags, plain_instance.tags)
+            self.assertEqual(compact_instance.state, 'running')
+            self.assertEqual(compact_instance.state_code, 16)
+            self.assertEqual(compact_instance.placement, 'us-east-1a')
+            self.assertEqual([g.name for g in compact_instance.groups],
+                             ['SSH'])
+        self.assertEqual(compact[0].futureElement, 'new')
+        self.assertEqual(compact[0].monitored, True)
+        self.assertEqual(reservation.owner_id, '123456789012')
+        self.assertEqual([g.id for g in reservation.groups], ['sg-99a710f1'])
+
+    def test_known_elements_need_no_instance_dictionary(self):
+        reservation, instances = self.get_instances(CompactEC2Connection)
+        self.assertFalse(getattr(reservation, '__dict__', None))
+        self.assertEqual(instances[0].__dict__, {'futureElement': 'new'})
+        for obj in (instances[0]._state, instances[0]._placement,
+                    instances[0].groups[0]):
+            self.assertFalse(getattr(obj, '__dict__', None))
+
+    def test_repeated_values_are_shared(self):
+        _, instances = self.get_instances(CompactEC2Connection)
+        first, second = instances
+        for name in ('instance_type', 'placement', 'state', 'image_id',
+                     'architecture'):
+            self.assertTrue(getattr(first, name) is getattr(second, name),
+                            name)
+        self.assertFalse(first.launch_time is second.launch_time)
+
+    def test_tags_are_allocated_lazily(self):
+        _, instances = self.get_instances(CompactEC2Connection)
+        self.assertEqual(instances[0].tags, {'Name': 'web'})
+        self.assertEqual(instances[1]._tags, None)
+        self.assertEqual(instances[1].tags, {})
+        instances[1].tags['Name'] = 'db'
+        self.assertEqual(instances[1].tags, {'Name': 'db'})
+
+    def test_update_copies_slots(self):
+        _, instances = self.get_instances(CompactEC2Connection)
+        instance = CompactInstance()
+        instance._update(instances[0])
+        self.assertEqual(instance.id, 'i-1')
+        self.assertEqual(instance.state, 'running')
+        self.assertEqual(instance.tags, {'Name': 'web'})
+        self.assertEqual(instance.futureElement, 'new')
+
+    def test_pickle(self):
+        _, instances = self.get_instances(CompactEC2Connection)
+        instances[0].connection = instances[0].region = None
+        instance = cPickle.loads(cPickle.dumps(instances[0], 2))
+        self.assertEqual(instance.id, 'i-1')
+        self.assertEqual(instance.placement, 'us-east-1a')
+        self.assertEqual(instance.tags, {'Name': 'web'})
+        self.assertEqual(instance.futureElement, 'new')
+
+    def test_volumes(self):
+        connection = make_connection(CompactEC2Connection, DESCRIBE_VOLUMES)
+        volume = connection.get_all_volumes()[0]
+        self.assertEqual(volume.id, 'vol-1')
+        self.assertEqual(volume.size, 80)
+        self.assertEqual(volume.zone, 'us-east-1a')
+        self.assertEqual(volume.status, 'in-use')
+        self.assertEqual(volume.type, 'standard')
+        self.assertEqual(volume.attach_data.instance_id, 'i-1')
+        self.assertEqual(volume.attach_data.device, '/dev/sdh')
+        self.assertEqual(volume.attachment_state(), 'attached')
+        self.assertFalse(getattr(volume, '__dict__', None))
+        self.assertFalse(getattr(volume.attach_data, '__dict__', None))
+
+    def test_security_groups(self):
+        connection = make_connection(CompactEC2Connection,
+                                     DESCRIBE_SECURITY_GROUPS)
+        group = connection.get_all_security_groups()[0]
+        plain = make_connection(EC2Connection, DESCRIBE_SECURITY_GROUPS)
+        plain_group = plain.get_all_security_groups()[0]
+        self.assertEqual(group.name, 'WebServers')
+        self.assertEqual(group.description, 'Web Servers')
+        self.assertEqual(len(group.rules), 1)
+        rule = group.rules[0]
+        self.assertEqual((rule.ip_protocol, rule.from_port, rule.to_port),
+                         ('tcp', '80', '80'))
+        self.assertEqual([str(grant) for grant in rule.grants],
+                         [str(grant) for grant in plain_group.rules[0].grants])
+        grant = rule.grants[0]
+        self.assertEqual(grant.group_id, 'sg-2')
+        self.assertEqual(grant.groupId, 'sg-2')
+        self.assertEqual(grant.owner_id, '123456789012')
+        self.assertEqual(rule.grants[1].cidr_ip, '0.0.0.0/0')
+        self.assertFalse(getattr(group, '__dict__', None))
+        self.assertFalse(getattr(rule, '__dict__', None))
+        self.assertFalse(getattr(grant, '__dict__', None))
+
+
+if __name__ == '__main__':
+    unittest.main()
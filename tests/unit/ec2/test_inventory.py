@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import os
+import shutil
+import tempfile
+
+from tests.unit import unittest
+
+from mock import patch
+
+from boto.ec2.connection import EC2Connection
+from boto.ec2.group import Group
+from boto.ec2.instance import Instance, InstanceState, Reservation
+from boto.ec2.inventory import Inventory
+from boto.ec2.securitygroup import SecurityGroup
+from boto.ec2.tag import Tag
+from boto.ec2.volume import Volume
+
+
+class TestInventory(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = EC2Connection('aws_access_key_id',
+                                        'aws_secret_access_key')
+        self.instances = {}
+        self.volumes = {}
+        self.tags = []
+        self.calls = []
+        for name in ('get_all_instances', 'get_all_volumes',
+                     'get_all_security_groups', 'get_all_tags'):
+            patcher = patch.object(self.connection, name,
+                                   side_effect=getattr(self, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.add_instance('i-1', 'us-east-1a', 'running', {'Role': 'web'})
+        self.add_instance('i-2', 'us-east-1b', 'pending', {'Role': 'web'},
+                          vpc_id='vpc-1')
+        self.add_instance('i-3', 'us-east-1a', 'running', {'Role': 'db'})
+        volume = Volume(self.connection)
+        volume.id = 'vol-1'
+        volume.zone = 'us-east-1a'
+        volume.status = 'creating'
+        volume.tags = [Tag(res_id='vol-1', name='Role', value='db')]
+        self.volumes['vol-1'] = volume
+        self.tags = [Tag(res_id='snap-1', name='Backup', value='daily')]
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def add_instance(self, instance_id, zone, state, tags, vpc_id=None):
+        instance = Instance(self.connection)
+        instance.id = instance_id
+        instance._placement.zone = zone
+        instance._state = InstanceState(name=state)
+        instance.tags.update(tags)
+        instance.vpc_id = vpc_id
+        group = Group()
+        group.name = 'default'
+        instance.groups = [group]
+        self.instances[instance_id] = instance
+
+    def _match(self, filters, id_filter, resource_id):
+        return not filters or resource_id in filters.get(id_filter, [])
+
+    def get_all_instances(self, instance_ids=None, filters=None):
+        self.calls.append(('instances', filters))
+        reservation = Reservation(self.connection)
+        reservation.instances = [
+            i for i in self.instances.values()
+            if self._match(filters, 'instance-id', i.id)]
+        return [reservation]
+
+    def get_all_volumes(self, volume_ids=None, filters=None):
+        self.calls.append(('volumes', filters))
+        return [v for v in self.volumes.values()
+                if self._match(filters, 'volume-id', v.id)]
+
+    def get_all_security_groups(self, groupnames=None, group_ids=None,
+                                filters=None):
+        self.calls.append(('security_groups', filters))
+        group = SecurityGroup(self.connection, name='default')
+        group.id = 'sg-1'
+        group.vpc_id = 'vpc-1'
+        return [group]
+
+    def get_all_tags(self, filters=None):
+        self.calls.append(('tags', filters))
+        tags = list(self.tags)
+        for instance in self.instances.values():
+            tags.extend(Tag(res_id=instance.id, name=name, value=value)
+                        for name, value in instance.tags.items())
+        for volume in self.volumes.values():
+            tags.extend(volume.tags)
+        return [t for t in tags
+                if self._match(filters, 'resource-id', t.res_id)]
+
+    def load(self):
+        inventory = Inventory(self.connection)
+        inventory.load()
+        return inventory
+
+    def ids(self, objects):
+        return sorted(obj.id for obj in objects)
+
+    def test_indexed_queries(self):
+        inventory = self.load()
+        self.assertEqual(len(inventory), 5)
+        self.assertEqual(len(self.calls), 4)
+        self.assertEqual(
+            self.ids(inventory.find('instances', tags={'Role': 'web'},
+                                    zone='us-east-1a')), ['i-1'])
+        self.assertEqual(
+            self.ids(inventory.find('instances', state='running')),
+            ['i-1', 'i-3'])
+        self.assertEqual(
+            self.ids(inventory.find('instances', tags={'Role': None})),
+            ['i-1', 'i-2', 'i-3'])
+        self.assertEqual(
+            self.ids(inventory.find('instances', vpc_id='vpc-1')), ['i-2'])
+        self.assertEqual(
+            self.ids(inventory.find('volumes', tags={'Role': 'db'})),
+            ['vol-1'])
+        self.assertEqual(
+            self.ids(inventory.find('security_groups', vpc_id='vpc-1')),
+            ['sg-1'])
+        self.assertEqual(inventory.find('instances', zone='us-west-1a'), [])
+        self.assertEqual(inventory.get('i-3').id, 'i-3')
+        self.assertEqual(inventory.get_tags('snap-1'), {'Backup': 'daily'})
+        self.assertTrue('vol-1' in inventory)
+
+    def test_refresh_by_ids(self):
+        inventory = self.load()
+        self.instances['i-1']._state = InstanceState(name='stopped')
+        del self.instances['i-3']
+        self.calls = []
+        inventory.refresh('instances', ids=['i-1', 'i-3'])
+        self.assertEqual(self.calls, [('instances',
+                                       {'instance-id': ['i-1', 'i-3']})])
+        self.assertEqual(
+            self.ids(inventory.find('instances', state='running')), [])
+        self.assertEqual(
+            self.ids(inventory.find('instances', state='stopped')), ['i-1'])
+        self.assertEqual(inventory.get('i-3'), None)
+
+    def test_refresh_tags(self):
+        inventory = self.load()
+        self.instances['i-1'].tags['Role'] = 'db'
+        inventory.refresh('tags', ids=['i-1'])
+        self.assertEqual(
+            self.ids(inventory.find('instances', tags={'Role': 'db'})),
+            ['i-1', 'i-3'])
+
+    def test_refresh_transitional(self):
+        inventory = self.load()
+        self.calls = []
+        self.assertEqual(inventory.refresh_transitional(), 2)
+        self.assertEqual(sorted(self.calls), [
+            ('instances', {'instance-id': ['i-2']}),
+            ('volumes', {'volume-id': ['vol-1']})])
+
+    def test_snapshot_round_trip(self):
+        path = os.path.join(self.tmpdir, 'inventory')
+        self.load().save(path)
+        connection = EC2Connection('aws_access_key_id',
+                                   'aws_secret_access_key')
+        inventory = Inventory.open(connection, path)
+        instances = inventory.find('instances', tags={'Role': 'web'})
+        self.assertEqual(self.ids(instances), ['i-1', 'i-2'])
+        self.assertTrue(instances[0].connection is connection)
+        self.assertEqual(inventory.get_tags('snap-1'), {'Backup': 'daily'})
+        self.assertEqual(sorted(inventory.loaded),
+                         ['instances', 'security_groups', 'tags', 'volumes'])
+
+    def test_get_inventory_uses_fresh_snapshots(self):
+        path = os.path.join(self.tmpdir, 'inventory')
+        self.connection.get_inventory(path)
+        self.assertEqual(len(self.calls), 4)
+        inventory = self.connection.get_inventory(path, max_age=60)
+        self.assertEqual(len(self.calls), 4)
+        self.assertEqual(len(inventory), 5)
+        self.connection.get_inventory(path, max_age=0)
+        self.assertEqual(len(self.calls), 8)
+
+    def test_get_inventory_loads_only_the_collections_asked_for(self):
+        path = os.path.join(self.tmpdir, 'inventory')
+        inventory = self.connection.get_inventory(
+            path, collections=['instances'])
+        self.assertEqual(self.calls, [('instances', None)])
+        self.assertEqual(sorted(inventory.loaded), ['instances'])
+        self.connection.get_inventory(path, collections=['instances'])
+        self.assertEqual(len(self.calls), 1)
+        # The missing collections are added to the snapshot.
+        inventory = self.connection.get_inventory(
+            path, collections=['instances', 'volumes'])
+        self.assertEqual(self.calls[1:], [('volumes', None)])
+        self.assertEqual(sorted(inventory.loaded), ['instances', 'volumes'])
+        self.assertEqual(self.ids(inventory.find('instances')),
+                         ['i-1', 'i-2', 'i-3'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import datetime
+import os
+import shutil
+import tempfile
+
+from tests.unit import unittest
+
+from boto.ec2.spotprice import PriceSeries, SpotPriceAggregator, to_epoch
+from boto.ec2.spotpricehistory import SpotPriceHistory
+from boto.resultset import ResultSet
+
+
+T0 = to_epoch('2012-10-01T00:00:00.000Z')
+
+
+def history(offset, price, instance_type='m1.small',
+            zone='us-east-1a', product='Linux/UNIX'):
+    item = SpotPriceHistory()
+    item.timestamp = datetime.datetime.utcfromtimestamp(
+        T0 + offset).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+    item.price = price
+    item.instance_type = instance_type
+    item.availability_zone = zone
+    item.product_description = product
+    return item
+
+
+class FakeConnection(object):
+
+    def __init__(self, items):
+        self.items = items
+        self.calls = []
+
+    def get_spot_price_history(self, start_time=None, end_time=None,
+                               instance_type=None, product_description=None,
+                               availability_zone=None, max_results=None,
+                               next_token=None):
+        self.calls.append((start_time, end_time, next_token))
+        start = to_epoch(start_time)
+        end = to_epoch(end_time)
+        items = [item for item in self.items
+                 if start <= to_epoch(item.timestamp) < end]
+        offset = int(next_token or 0)
+        page = ResultSet()
+        page.extend(items[offset:offset + max_results])
+        if offset + max_results < len(items):
+            page.next_token = str(offset + max_results)
+        return page
+
+
+class TestPriceSeries(unittest.TestCase):
+
+    def setUp(self):
+        self.series = PriceSeries('m1.small', 'us-east-1a', 'Linux/UNIX')
+        for offset, price in [(0, 0.03), (600, 0.05), (300, 0.04)]:
+            self.series.add(T0 + offset, price)
+
+    def test_points_are_sorted(self):
+        self.assertEqual(list(self.series.timestamps),
+                         [T0, T0 + 300, T0 + 600])
+        self.assertEqual(list(self.series.prices), [0.03, 0.04, 0.05])
+
+    def test_duplicate_points_are_not_added(self):
+        self.assertFalse(self.series.add(T0 + 300, 0.04))
+        self.assertEqual(len(self.series), 3)
+
+    def test_price_at(self):
+        self.assertEqual(self.series.price_at(T0 - 1), None)
+        self.assertEqual(self.series.price_at(T0 + 299), 0.03)
+        self.assertEqual(self.series.price_at('2012-10-01T00:05:00.000Z'),
+                         0.04)
+        self.assertEqual(self.series.price_at(T0 + 10000), 0.05)
+
+    def test_stats_are_time_weighted(self):
+        stats = self.series.stats(T0 + 150, T0 + 1200, (10, 50))
+        self.assertEqual(stats.minimum, 0.03)
+        self.assertEqual(stats.maximum, 0.05)
+        expected = (150 * 0.03 + 300 * 0.04 + 600 * 0.05) / 1050
+        self.assertAlmostEqual(stats.mean, expected)
+        self.assertEqual(stats.percentiles[50], 0.05)
+        self.assertEqual(stats.percentiles[10], 0.03)
+        self.assertEqual(stats.changes, 2)
+
+    def test_buckets(self):
+        buckets = self.series.buckets(T0 - 300, T0 + 900, 300)
+        self.assertEqual(len(buckets), 4)
+        self.assertEqual(buckets[0], None)
+        self.assertEqual([b.mean for b in buckets[1:]], [0.03, 0.04, 0.05])
+        self.assertEqual(buckets[1].start,
+                         datetime.datetime(2012, 10, 1, 0, 0))
+
+
+class TestSpotPriceAggregator(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.items = [history(i * 60, 0.01 * (i % 5 + 1)) for i in range(25)]
+        self.items.append(history(30, 0.2, zone='us-east-1b'))
+        self.connection = FakeConnection(self.items)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_update_follows_next_token(self):
+        aggregator = SpotPriceAggregator(self.connection, page_size=10)
+        added = aggregator.update(T0, T0 + 3600)
+        self.assertEqual(added, 26)
+        self.assertEqual(aggregator.requests, 3)
+        self.assertEqual([token for _, _, token in self.connection.calls],
+                         [None, '10', '20'])
+        series = aggregator.get_series('m1.small', 'us-east-1a',
+                                       'Linux/UNIX')
+        self.assertEqual(len(series), 25)
+        self.assertEqual(len(aggregator.find(availability_zone='us-east-1b')),
+                         1)
+
+    def test_only_new_windows_are_downloaded(self):
+        aggregator = SpotPriceAggregator(self.connection, page_size=100)
+        aggregator.update(T0 + 600, T0 + 1200)
+        self.assertEqual(aggregator.update(T0 + 600, T0 + 1200), 0)
+        self.assertEqual(len(self.connection.calls), 1)
+        aggregator.update(T0, T0 + 1800)
+        self.assertEqual(self.connection.calls[1:], [
+            ('2012-10-01T00:00:00.000Z', '2012-10-01T00:10:00.000Z', None),
+            ('2012-10-01T00:20:00.000Z', '2012-10-01T00:30:00.000Z', None)])
+        series = aggregator.get_series('m1.small', 'us-east-1a',
+                                       'Linux/UNIX')
+        self.assertEqual(len(series), 25)
+
+    def test_gaps_are_downloaded(self):
+        aggregator = SpotPriceAggregator(self.connection, page_size=100)
+        aggregator.update(T0, T0 + 600)
+        aggregator.update(T0 + 1200, T0 + 1800)
+        self.assertEqual(self.connection.calls[1], (
+            '2012-10-01T00:10:00.000Z', '2012-10-01T00:30:00.000Z', None))
+        aggregator.update(T0 + 600, T0 + 1200)
+        self.assertEqual(len(self.connection.calls), 2)
+        series = aggregator.get_series('m1.small', 'us-east-1a',
+                                       'Linux/UNIX')
+        self.assertEqual(len(series), 25)
+
+    def test_cache_is_reloaded(self):
+        path = os.path.join(self.tmpdir, 'prices')
+        aggregator = SpotPriceAggregator(self.connection, cache_path=path)
+        aggregator.update(T0, T0 + 600)
+        connection = FakeConnection(self.items)
+        aggregator = SpotPriceAggregator(connection, cache_path=path)
+        self.assertEqual(len(aggregator.series), 2)
+        aggregator.update(T0, T0 + 1200)
+        self.assertEqual(connection.calls, [
+            ('2012-10-01T00:10:00.000Z', '2012-10-01T00:20:00.000Z', None)])
+        series = aggregator.get_series('m1.small', 'us-east-1a',
+                                       'Linux/UNIX')
+        self.assertEqual(len(series), 20)
+
+    def test_connection_factory(self):
+        from boto.ec2.connection import EC2Connection
+        connection = EC2Connection('access', 'secret')
+        aggregator = connection.spot_price_aggregator()
+        self.assertTrue(isinstance(aggregator, SpotPriceAggregator))
+        self.assertTrue(aggregator.connection is connection)
+
+
+if __name__ == '__main__':
+    unittest.main()
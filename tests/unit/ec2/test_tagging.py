@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import threading
+
+from tests.unit import unittest
+
+from mock import patch
+
+from boto.ec2.autoscale import AutoScaleConnection
+from boto.ec2.autoscale.group import AutoScalingGroup
+from boto.ec2.autoscale.tag import Tag as AutoScaleTag
+from boto.ec2.connection import EC2Connection
+from boto.ec2.instance import Instance
+from boto.ec2.tag import Tag
+from boto.ec2.volume import Volume
+from boto.ec2 import tagging
+from boto.resultset import ResultSet
+
+
+class RecordingMixin(object):
+
+    def record(self, connection, *names):
+        self.calls = []
+        self.fail_ids = set()
+        self.lock = threading.Lock()
+        for name in names:
+            patcher = patch.object(connection, name,
+                                   side_effect=self.recorder(name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def recorder(self, name):
+        def call(*args):
+            self.lock.acquire()
+            try:
+                self.calls.append((name,) + args)
+            finally:
+                self.lock.release()
+            if self.fail_ids.intersection(args[0]):
+                raise Exception('failed')
+            return True
+        return call
+
+
+class TestEC2Tagging(RecordingMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.connection = EC2Connection('aws_access_key_id',
+                                        'aws_secret_access_key')
+        self.record(self.connection, 'create_tags', 'delete_tags')
+
+    def make_instance(self, instance_id, **tags):
+        instance = Instance(self.connection)
+        instance.id = instance_id
+        instance.tags.update(tags)
+        return instance
+
+    def test_identical_changes_are_grouped(self):
+        instances = [self.make_instance('i-%d' % i, Env='dev')
+                     for i in xrange(5)]
+        desired = dict((instance, {'Env': 'prod', 'Team': 'web'})
+                       for instance in instances)
+        desired['i-extra'] = {'Env': 'prod', 'Team': 'web'}
+        result = self.connection.apply_tags(desired)
+        self.assertEqual(self.calls, [
+            ('create_tags', ['i-0', 'i-1', 'i-2', 'i-3', 'i-4', 'i-extra'],
+             {'Env': 'prod', 'Team': 'web'})])
+        self.assertEqual(result.requests, 1)
+        self.assertEqual(result.created, 12)
+        self.assertEqual(instances[0].tags, {'Env': 'prod', 'Team': 'web'})
+
+    def test_only_differences_are_sent(self):
+        up_to_date = self.make_instance('i-1', Env='prod')
+        stale = self.make_instance('i-2', Env='prod', Old='x')
+        result = self.connection.apply_tags(
+            {up_to_date: {'Env': 'prod'}, stale: {'Env': 'prod'},
+             'i-3': {'Env': 'prod'}},
+            current={'i-3': {'Env': 'prod'}}, replace=True)
+        self.assertEqual(self.calls, [('delete_tags', ['i-2'], ['Old'])])
+        self.assertEqual(result.deleted, 1)
+        self.assertEqual(stale.tags, {'Env': 'prod'})
+
+    def test_large_groups_are_split(self):
+        desired = dict(('i-%04d' % i, {'Env': 'prod'}) for i in xrange(450))
+        result = self.connection.apply_tags(desired, num_threads=3)
+        self.assertEqual(sorted(len(call[1]) for call in self.calls),
+                         [50, 200, 200])
+        self.assertEqual(result.requests, 3)
+
+    def test_errors_are_reported(self):
+        self.fail_ids.add('i-2')
+        ok = self.make_instance('i-1')
+        failing = self.make_instance('i-2')
+        result = self.connection.apply_tags({ok: {'Env': 'prod'},
+                                             failing: {'Env': 'dev'}})
+        self.assertEqual(result.requests, 2)
+        self.assertEqual([ids for ids, _ in result.errors], [['i-2']])
+        self.assertEqual(ok.tags, {'Env': 'prod'})
+        self.assertEqual(failing.tags, {})
+
+    def test_volume_tags(self):
+        volume = Volume(self.connection)
+        volume.id = 'vol-1'
+        # Tags held as a list of Tag objects.
+        volume.tags = ResultSet([('item', Tag)])
+        volume.tags.append(Tag(self.connection, 'vol-1', name='Name',
+                               value='data'))
+        volume.tags.append(Tag(self.connection, 'vol-1', name='Old',
+                               value='x'))
+        result = self.connection.apply_tags(
+            {volume: {'Name': 'data', 'Env': 'prod'}}, replace=True)
+        self.assertEqual(sorted(self.calls), [
+            ('create_tags', ['vol-1'], {'Env': 'prod'}),
+            ('delete_tags', ['vol-1'], ['Old'])])
+        self.assertEqual((result.created, result.deleted), (1, 1))
+        self.assertEqual(tagging.tags_to_dict(volume.tags),
+                         {'Name': 'data', 'Env': 'prod'})
+
+    def test_update_errors_do_not_stop_the_workers(self):
+        instances = [self.make_instance('i-%d' % i) for i in xrange(3)]
+        for instance in instances:
+            instance.tags = object()
+        result = self.connection.apply_tags(
+            dict((instance, {'Env': instance.id}) for instance in instances),
+            current=dict(('i-%d' % i, {}) for i in xrange(3)), num_threads=1)
+        self.assertEqual(result.requests, 3)
+        self.assertEqual(result.errors, [])
+
+    def test_diff_tags(self):
+        self.assertEqual(tagging.diff_tags({'a': '1', 'b': '2'},
+                                           {'a': '1', 'c': '3'}, True),
+                         ({'c': '3'}, ['b']))
+
+
+class TestAutoScaleTagging(RecordingMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.connection = AutoScaleConnection('aws_access_key_id',
+                                              'aws_secret_access_key')
+        self.record(self.connection, 'create_or_update_tags', 'delete_tags')
+
+    def test_groups(self):
+        group = AutoScalingGroup(connection=self.connection, name='web')
+        group.tags = [AutoScaleTag(key='Env', value='dev',
+                                   resource_id='web'),
+                      AutoScaleTag(key='Old', value='x', resource_id='web')]
+        result = self.connection.apply_tags(
+            {group: {'Env': ('prod', True)}, 'db': {'Env': 'prod'}},
+            replace=True)
+        self.assertEqual(result.requests, 2)
+        self.assertEqual(result.created, 2)
+        self.assertEqual(result.deleted, 1)
+        calls = dict((call[0], call[1]) for call in self.calls)
+        created = sorted((t.resource_id, t.key, t.value, t.propagate_at_launch)
+                         for t in calls['create_or_update_tags'])
+        self.assertEqual(created, [('db', 'Env', 'prod', False),
+                                   ('web', 'Env', 'prod', True)])
+        self.assertEqual([(t.resource_id, t.key)
+                          for t in calls['delete_tags']], [('web', 'Old')])
+        self.assertEqual([(t.key, t.value) for t in group.tags],
+                         [('Env', 'prod')])
+
+    def test_parsed_propagate_at_launch(self):
+        tag = AutoScaleTag()
+        tag.endElement('PropagateAtLaunch', 'true', None)
+        self.assertTrue(tag.propagate_at_launch)
+        self.assertTrue(tag.propogate_at_launch)
+
+
+if __name__ == '__main__':
+    unittest.main()
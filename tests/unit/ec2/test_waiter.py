@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import subprocess
+import sys
+
+from tests.unit import unittest
+
+from mock import Mock, patch
+
+from boto.exception import WaiterError
+from boto.ec2.instance import Instance, InstanceState, Reservation
+from boto.ec2.volume import Volume
+from boto.ec2.waiter import Waiter, wait_for
+from boto.dynamodb.layer2 import Layer2
+from boto.dynamodb.table import Table
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeEC2Connection(object):
+    """Moves each resource through a list of states, one per request."""
+
+    def __init__(self):
+        self.states = {}
+        self.requests = []
+
+    def _next_state(self, resource_id):
+        states = self.states.get(resource_id)
+        if not states:
+            return None
+        if len(states) > 1:
+            return states.pop(0)
+        return states[0]
+
+    def get_all_instances(self, instance_ids=None, filters=None):
+        self.requests.append(('instances', filters))
+        reservation = Reservation(self)
+        for instance_id in filters['instance-id']:
+            state = self._next_state(instance_id)
+            if state is None:
+                continue
+            instance = Instance(self)
+            instance.id = instance_id
+            instance._state = InstanceState(name=state)
+            reservation.instances.append(instance)
+        return [reservation]
+
+    def get_all_volumes(self, volume_ids=None, filters=None):
+        self.requests.append(('volumes', filters))
+        volumes = []
+        for volume_id in filters['volume-id']:
+            state = self._next_state(volume_id)
+            if state is not None:
+                volume = Volume(self)
+                volume.id = volume_id
+                volume.status = state
+                volumes.append(volume)
+        return volumes
+
+
+def make_instance(connection, instance_id, state='pending'):
+    instance = Instance(connection)
+    instance.id = instance_id
+    instance._state = InstanceState(name=state)
+    return instance
+
+
+class TestWaiter(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.patchers = [patch('time.time', self.clock.time),
+                         patch('time.sleep', self.clock.sleep)]
+        for patcher in self.patchers:
+            patcher.start()
+        self.connection = FakeEC2Connection()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test_one_request_per_type_per_poll(self):
+        instances = []
+        for i in xrange(500):
+            instance_id = 'i-%d' % i
+            self.connection.states[instance_id] = ['pending', 'running']
+            instances.append(make_instance(self.connection, instance_id))
+        volume = Volume(self.connection)
+        volume.id = 'vol-1'
+        volume.status = 'creating'
+        self.connection.states['vol-1'] = ['creating', 'available']
+        waiter = Waiter(min_interval=1)
+        waiter.add_all(instances, 'running')
+        waiter.add(volume, ['available'])
+        waiter.wait()
+        # 500 instances take 3 DescribeInstances calls of 200 ids.
+        self.assertEqual(waiter.requests, 8)
+        self.assertEqual(len(waiter.done), 501)
+        self.assertEqual(waiter.pending, [])
+        self.assertTrue(all(i.state == 'running' for i in instances))
+        self.assertEqual(volume.status, 'available')
+
+    def test_interval_backs_off_without_progress(self):
+        self.connection.states['i-1'] = ['pending'] * 4 + ['running']
+        instance = make_instance(self.connection, 'i-1')
+        waiter = wait_for([instance], 'running', min_interval=1,
+                          max_interval=3, backoff=2)
+        self.assertEqual(self.clock.sleeps, [2, 3, 3, 3])
+        self.assertEqual(waiter.requests, 5)
+
+    def test_interval_resets_on_state_change(self):
+        self.connection.states['i-1'] = ['pending', 'pending', 'running']
+        self.connection.states['i-2'] = ['running']
+        instances = [make_instance(self.connection, 'i-1'),
+                     make_instance(self.connection, 'i-2', 'stopped')]
+        wait_for(instances, 'running', min_interval=1, backoff=2)
+        self.assertEqual(self.clock.sleeps, [1, 2])
+
+    def test_missing_resources_stay_pending(self):
+        instance = make_instance(self.connection, 'i-missing')
+        waiter = Waiter(min_interval=1, max_interval=1)
+        waiter.add(instance, 'running')
+        self.assertRaises(WaiterError, waiter.wait, 5)
+        self.assertEqual(waiter.pending, [instance])
+        self.assertEqual(self.clock.now, 1005.0)
+
+    def test_failure_states(self):
+        self.connection.states['i-1'] = ['terminated']
+        self.connection.states['i-2'] = ['running']
+        instances = [make_instance(self.connection, 'i-1'),
+                     make_instance(self.connection, 'i-2')]
+        try:
+            wait_for(instances, 'running', failure_states=['terminated'])
+        except WaiterError, e:
+            self.assertEqual(e.failed, [instances[0]])
+            self.assertEqual(e.pending, [])
+        else:
+            self.fail('WaiterError not raised')
+
+    def test_unknown_resources_are_rejected(self):
+        self.assertRaises(ValueError, Waiter().add, object(), 'running')
+
+    def test_table_refresh_waits_for_active(self):
+        layer2 = Layer2('access_key', 'secret_key')
+        layer2.layer1 = Mock()
+        description = {'Table': {'TableName': 'testtable',
+                                 'TableStatus': 'CREATING'}}
+        active = {'Table': {'TableName': 'testtable',
+                            'TableStatus': 'ACTIVE'}}
+        layer2.layer1.describe_table.side_effect = [description, description,
+                                                    active]
+        table = Table(layer2, description)
+        table.refresh(wait_for_active=True, retry_seconds=5)
+        self.assertEqual(table.status, 'ACTIVE')
+        self.assertEqual(self.clock.sleeps, [5, 5])
+        self.assertEqual(layer2.layer1.describe_table.call_count, 3)
+
+
+class TestWaiterLayering(unittest.TestCase):
+
+    def test_dynamodb_does_not_import_ec2(self):
+        code = ('import sys, boto.dynamodb.table; '
+                'print [m for m in sys.modules if m.startswith("boto.ec2")]')
+        output = subprocess.Popen([sys.executable, '-c', code],
+                                  stdout=subprocess.PIPE).communicate()[0]
+        self.assertEqual(output.strip(), '[]')
+
+
+if __name__ == '__main__':
+    unittest.main()
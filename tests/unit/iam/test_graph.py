@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import os
+import shutil
+import tempfile
+import threading
+import urllib
+
+from tests.unit import unittest
+from tests.unit import AWSMockServiceTestCase
+
+from boto.exception import BotoServerError
+from boto.iam.connection import IAMConnection
+from boto.iam.graph import IAMGraph, iter_items
+
+
+def response(action, **result):
+    return {'%s_response' % action: {'%s_result' % action: result}}
+
+
+def paged(action, list_key, items, max_items, marker):
+    offset = int(marker or 0)
+    size = max_items or len(items) or 1
+    result = {list_key: items[offset:offset + size],
+              'is_truncated': 'false'}
+    if offset + size < len(items):
+        result['is_truncated'] = 'true'
+        result['marker'] = str(offset + size)
+    return response(action, **result)
+
+
+class FakeIAM(object):
+
+    ResponseError = BotoServerError
+
+    def __init__(self):
+        self.users = {}
+        self.groups = {}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def add_user(self, name, groups=(), policies=None, keys=()):
+        self.users[name] = {'user_name': name, 'user_id': 'AID' + name,
+                            'groups': list(groups),
+                            'policies': policies or {}, 'keys': list(keys)}
+
+    def add_group(self, name, policies=None):
+        self.groups[name] = {'group_name': name, 'group_id': 'AGP' + name,
+                             'policies': policies or {}}
+
+    def _call(self, *args):
+        self._lock.acquire()
+        try:
+            self.calls.append(args)
+        finally:
+            self._lock.release()
+
+    def _summary(self, attrs, *keys):
+        return dict((key, attrs[key]) for key in keys)
+
+    def get_all_users(self, marker=None, max_items=None):
+        self._call('ListUsers', marker)
+        users = [self._summary(self.users[name], 'user_name', 'user_id')
+                 for name in sorted(self.users)]
+        return paged('list_users', 'users', users, max_items, marker)
+
+    def get_all_groups(self, marker=None, max_items=None):
+        self._call('ListGroups', marker)
+        groups = [self._summary(self.groups[name], 'group_name', 'group_id')
+                  for name in sorted(self.groups)]
+        return paged('list_groups', 'groups', groups, max_items, marker)
+
+    def get_user(self, user_name=None):
+        self._call('GetUser', user_name)
+        if user_name not in self.users:
+            raise BotoServerError(404, 'Not Found')
+        return response('get_user', user=self._summary(
+            self.users[user_name], 'user_name', 'user_id'))
+
+    def get_groups_for_user(self, user_name, marker=None, max_items=None):
+        self._call('ListGroupsForUser', user_name)
+        groups = [{'group_name': name}
+                  for name in self.users[user_name]['groups']]
+        return paged('list_groups_for_user', 'groups', groups, max_items,
+                     marker)
+
+    def get_all_access_keys(self, user_name, marker=None, max_items=None):
+        self._call('ListAccessKeys', user_name)
+        keys = [{'access_key_id': key, 'status': 'Active'}
+                for key in self.users[user_name]['keys']]
+        return paged('list_access_keys', 'access_key_metadata', keys,
+                     max_items, marker)
+
+    def get_all_user_policies(self, user_name, marker=None, max_items=None):
+        self._call('ListUserPolicies', user_name)
+        names = sorted(self.users[user_name]['policies'])
+        return paged('list_user_policies', 'policy_names', names,
+                     max_items, marker)
+
+    def get_user_policy(self, user_name, policy_name):
+        self._call('GetUserPolicy', user_name, policy_name)
+        document = self.users[user_name]['policies'][policy_name]
+        return response('get_user_policy',
+                        policy_document=urllib.quote(document))
+
+    def get_all_group_policies(self, group_name, marker=None,
+                               max_items=None):
+        self._call('ListGroupPolicies', group_name)
+        names = sorted(self.groups[group_name]['policies'])
+        return paged('list_group_policies', 'policy_names', names,
+                     max_items, marker)
+
+    def get_group_policy(self, group_name, policy_name):
+        self._call('GetGroupPolicy', group_name, policy_name)
+        document = self.groups[group_name]['policies'][policy_name]
+        return response('get_group_policy',
+                        policy_document=urllib.quote(document))
+
+
+class TestIAMGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.iam = FakeIAM()
+        self.iam.add_group('admins', {'all': '{"Statement": []}'})
+        self.iam.add_group('devs')
+        for n in range(5):
+            self.iam.add_user('user%d' % n, keys=['AKIA%d' % n])
+        self.iam.add_user('alice', ['admins', 'devs'],
+                          {'own': '{"Version": "2012-10-17"}'}, ['AKIAA'])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_sync_loads_the_graph(self):
+        graph = IAMGraph(self.iam, rate=None, page_size=2)
+        loaded = graph.sync()
+        self.assertEqual(len(loaded), 8)
+        self.assertEqual(sorted(graph.users), ['alice'] +
+                         ['user%d' % n for n in range(5)])
+        alice = graph.users['alice']
+        self.assertEqual(alice.groups, ['admins', 'devs'])
+        self.assertEqual(alice.policies, {'own': {'Version': '2012-10-17'}})
+        self.assertEqual(graph.get_members('admins'), ['alice'])
+        self.assertEqual(graph.get_effective_policies('alice'), [
+            ('user:alice', 'own', {'Version': '2012-10-17'}),
+            ('group:admins', 'all', {'Statement': []})])
+        self.assertEqual(graph.find_access_key('AKIA3').name, 'user3')
+        self.assertEqual(graph.requests, len(self.iam.calls))
+        # Six users over pages of two.
+        self.assertEqual([c for c in self.iam.calls if c[0] == 'ListUsers'],
+                         [('ListUsers', None), ('ListUsers', '2'),
+                          ('ListUsers', '4')])
+
+    def test_sync_only_loads_changed_principals(self):
+        graph = IAMGraph(self.iam, rate=None)
+        graph.sync()
+        self.iam.add_user('bob', ['devs'])
+        del self.iam.users['user0']
+        self.iam.users['user1']['user_id'] = 'AIDnew'
+        del self.iam.calls[:]
+        loaded = graph.sync()
+        self.assertEqual(sorted(loaded), [('user', 'bob'),
+                                          ('user', 'user1')])
+        self.assertFalse('user0' in graph.users)
+        self.assertEqual(graph.get_members('devs'), ['alice', 'bob'])
+        self.assertEqual(sorted(set(c[0] for c in self.iam.calls)),
+                         ['ListAccessKeys', 'ListGroups',
+                          'ListGroupsForUser', 'ListUserPolicies',
+                          'ListUsers'])
+
+    def test_max_age_reloads_everything(self):
+        graph = IAMGraph(self.iam, rate=None)
+        graph.sync()
+        self.assertEqual(graph.sync(), [])
+        self.assertEqual(len(graph.sync(max_age=0)), 8)
+
+    def test_errors_are_retried(self):
+        graph = IAMGraph(self.iam, rate=None)
+        get_all_access_keys = self.iam.get_all_access_keys
+
+        def failing(user_name, marker=None, max_items=None):
+            if user_name == 'user2':
+                raise BotoServerError(400, 'Throttling')
+            return get_all_access_keys(user_name, marker, max_items)
+
+        self.iam.get_all_access_keys = failing
+        graph.sync()
+        self.assertEqual(graph.errors.keys(), [('user', 'user2')])
+        self.assertFalse('user2' in graph.users)
+        self.iam.get_all_access_keys = get_all_access_keys
+        self.assertEqual(graph.sync(), [('user', 'user2')])
+        self.assertEqual(graph.errors, {})
+
+    def test_refresh(self):
+        graph = IAMGraph(self.iam, rate=None)
+        graph.sync()
+        self.iam.users['alice']['groups'] = ['devs']
+        del self.iam.users['user4']
+        loaded = graph.refresh(['alice', 'user4'])
+        self.assertEqual(loaded, [('user', 'alice')])
+        self.assertEqual(graph.get_members('admins'), [])
+        self.assertFalse('user4' in graph.users)
+
+    def test_policy_documents_can_be_skipped(self):
+        graph = IAMGraph(self.iam, rate=None, policy_documents=False)
+        graph.sync()
+        self.assertEqual(graph.users['alice'].policies, {'own': None})
+        self.assertFalse([c for c in self.iam.calls
+                          if c[0] == 'GetUserPolicy'])
+
+    def test_state_is_persisted(self):
+        path = os.path.join(self.tmpdir, 'iam.json')
+        graph = IAMGraph(self.iam, path, rate=None)
+        graph.sync()
+        graph = IAMGraph(self.iam, path, rate=None)
+        self.assertEqual(graph.users['alice'].groups, ['admins', 'devs'])
+        self.assertEqual(graph.sync(), [])
+
+
+class TestIAMPaging(AWSMockServiceTestCase):
+    connection_class = IAMConnection
+
+    def default_body(self):
+        return """
+        <ListUsersResponse>
+          <ListUsersResult>
+            <Users>
+              <member>
+                <UserId>AIDACKCEVSQ6C2EXAMPLE</UserId>
+                <Path>/division_abc/subdivision_xyz/engineering/</Path>
+                <UserName>Andrew</UserName>
+                <Arn>arn:aws:iam::123456789012:user/Andrew</Arn>
+              </member>
+            </Users>
+            <IsTruncated>true</IsTruncated>
+            <Marker>next</Marker>
+          </ListUsersResult>
+        </ListUsersResponse>
+        """
+
+    def test_iter_items_follows_markers(self):
+        self.set_http_response(status_code=200)
+        users = iter_items(self.service_connection.get_all_users, 'users')
+        self.assertEqual(users.next()['user_name'], 'Andrew')
+        self.assertEqual(users.next()['user_name'], 'Andrew')
+        self.assert_request_parameters({'Action': 'ListUsers',
+                                        'PathPrefix': '/',
+                                        'Marker': 'next'},
+                                       ignore_params_values=['Version'])
+
+
+if __name__ == '__main__':
+    unittest.main()
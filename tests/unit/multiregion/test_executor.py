@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import threading
+import time
+
+from tests.unit import unittest
+
+from boto.exception import RegionTimeoutError
+from boto.multiregion import RegionExecutor
+from boto.regioninfo import RegionInfo
+
+
+class FakeConnection(object):
+
+    def __init__(self, region=None, **kw_params):
+        self.region = region
+        self.kw_params = kw_params
+
+    def describe(self, suffix=''):
+        return self.region.name + suffix
+
+
+class FakeService(object):
+
+    def __init__(self, names):
+        self.names = names
+        self.calls = 0
+
+    def regions(self):
+        self.calls += 1
+        return [RegionInfo(name=name, endpoint='%s.example.com' % name,
+                           connection_cls=FakeConnection)
+                for name in self.names]
+
+
+class TestRegionExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.service = FakeService(['us-east-1', 'eu-west-1', 'us-west-2'])
+
+    def test_calls_every_region(self):
+        executor = RegionExecutor(self.service, aws_access_key_id='key')
+        results = executor.call('describe', suffix='!').results()
+        self.assertEqual(results, {'us-east-1': 'us-east-1!',
+                                   'eu-west-1': 'eu-west-1!',
+                                   'us-west-2': 'us-west-2!'})
+        connection = executor.get_connection('us-east-1')
+        self.assertEqual(connection.kw_params, {'aws_access_key_id': 'key'})
+
+    def test_regions_and_connections_are_cached(self):
+        executor = RegionExecutor(self.service)
+        first = dict(executor.map(lambda c: c))
+        second = dict(executor.map(lambda c: c))
+        self.assertEqual(self.service.calls, 1)
+        for name in first:
+            self.assertTrue(first[name] is second[name])
+
+    def test_region_names(self):
+        executor = RegionExecutor(self.service.regions,
+                                  region_names=['eu-west-1'])
+        self.assertEqual(executor.get_region_names(), ['eu-west-1'])
+        self.assertEqual(list(executor.call('describe')),
+                         [('eu-west-1', 'eu-west-1')])
+
+    def test_calls_run_concurrently(self):
+        condition = threading.Condition()
+        started = []
+
+        def wait_for_all(connection):
+            # Only returns once every region has started.
+            condition.acquire()
+            try:
+                started.append(connection.region.name)
+                condition.notify_all()
+                while len(started) < 3:
+                    condition.wait(5)
+            finally:
+                condition.release()
+            return len(started)
+
+        executor = RegionExecutor(self.service, timeout=5)
+        results = executor.map(wait_for_all)
+        self.assertEqual(results.results().values(), [3, 3, 3])
+        self.assertEqual(results.errors, {})
+
+    def test_regions_connect_concurrently(self):
+        condition = threading.Condition()
+        connecting = []
+
+        class SlowConnection(FakeConnection):
+            def __init__(self, region=None, **kw_params):
+                # Only returns once every region is connecting.
+                condition.acquire()
+                try:
+                    connecting.append(region.name)
+                    condition.notify_all()
+                    deadline = time.time() + 5
+                    while len(connecting) < 3 and time.time() < deadline:
+                        condition.wait(0.1)
+                finally:
+                    condition.release()
+                FakeConnection.__init__(self, region, **kw_params)
+
+        executor = RegionExecutor(self.service, timeout=5)
+        for region in executor.get_regions().values():
+            region.connection_cls = SlowConnection
+        started = time.time()
+        results = executor.map(lambda c: c.region.name)
+        self.assertEqual(sorted(results.results()),
+                         ['eu-west-1', 'us-east-1', 'us-west-2'])
+        self.assertEqual(len(connecting), 3)
+        self.assertTrue(time.time() - started < 4)
+
+    def test_racing_connections_keep_the_first_stored(self):
+        executor = RegionExecutor(self.service)
+        connections = []
+        threads = [threading.Thread(
+            target=lambda: connections.append(
+                executor.get_connection('us-east-1')))
+            for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for connection in connections:
+            self.assertTrue(connection is executor.get_connection('us-east-1'))
+
+    def test_errors_and_timeouts(self):
+        event = threading.Event()
+
+        def func(connection):
+            name = connection.region.name
+            if name == 'eu-west-1':
+                raise ValueError('failed')
+            if name == 'us-west-2':
+                event.wait(5)
+            return name
+
+        executor = RegionExecutor(self.service)
+        results = executor.map(func, timeout=0.2)
+        self.assertEqual(list(results), [('us-east-1', 'us-east-1')])
+        event.set()
+        self.assertTrue(isinstance(results.errors['eu-west-1'], ValueError))
+        error = results.errors['us-west-2']
+        self.assertTrue(isinstance(error, RegionTimeoutError))
+        self.assertEqual(error.region, 'us-west-2')
+        self.assertEqual(results.pending, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
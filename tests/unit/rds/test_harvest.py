@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import os
+import shutil
+import tempfile
+import threading
+
+from tests.unit import unittest
+from tests.unit import AWSMockServiceTestCase
+
+from boto.rds import RDSConnection
+from boto.rds.dbinstance import DBInstance
+from boto.rds.dbsnapshot import DBSnapshot
+from boto.rds.event import Event
+from boto.rds.harvest import Harvester, iter_pages
+from boto.resultset import ResultSet
+
+
+def event(source, minute, message='backup'):
+    e = Event()
+    e.source_identifier = source
+    e.source_type = 'db-instance'
+    e.date = '2012-10-01T00:%02d:00.000Z' % minute
+    e.message = '%s %d' % (message, minute)
+    return e
+
+
+def snapshot(instance_id, n, status='available'):
+    s = DBSnapshot(id='%s-snap-%d' % (instance_id, n))
+    s.instance_id = instance_id
+    s.status = status
+    return s
+
+
+def paged(records, max_records, marker):
+    offset = int(marker or 0)
+    page = ResultSet()
+    page.extend(records[offset:offset + max_records])
+    if offset + max_records < len(records):
+        page.marker = str(offset + max_records)
+    return page
+
+
+class FakeConnection(object):
+
+    def __init__(self):
+        self.events = {}
+        self.snapshots = {}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _call(self, *args):
+        self._lock.acquire()
+        try:
+            self.calls.append(args)
+        finally:
+            self._lock.release()
+
+    def get_all_events(self, source_identifier=None, source_type=None,
+                       start_time=None, max_records=None, marker=None):
+        self._call('events', source_identifier, start_time, marker)
+        if source_identifier is None:
+            events = sum(self.events.values(), [])
+        else:
+            events = self.events.get(source_identifier, [])
+        if start_time is not None:
+            start = start_time.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+            events = [e for e in events if e.date >= start]
+        return paged(sorted(events, key=lambda e: e.date), max_records,
+                     marker)
+
+    def get_all_dbinstances(self, max_records=None, marker=None):
+        self._call('instances', marker)
+        instances = [DBInstance(id=name) for name in sorted(self.snapshots)]
+        return paged(instances, max_records, marker)
+
+    def get_all_dbsnapshots(self, instance_id=None, max_records=None,
+                            marker=None):
+        self._call('snapshots', instance_id, marker)
+        return paged(self.snapshots[instance_id], max_records, marker)
+
+
+class TestIterPages(unittest.TestCase):
+
+    def test_pages_are_followed(self):
+        connection = FakeConnection()
+        connection.snapshots['db1'] = [snapshot('db1', n) for n in range(7)]
+        for prefetch in (True, False):
+            del connection.calls[:]
+            snapshots = list(iter_pages(connection.get_all_dbsnapshots, 3,
+                                        prefetch, instance_id='db1'))
+            self.assertEqual(len(snapshots), 7)
+            self.assertEqual(connection.calls,
+                             [('snapshots', 'db1', None),
+                              ('snapshots', 'db1', '3'),
+                              ('snapshots', 'db1', '6')])
+
+    def test_errors_are_raised(self):
+        def method(max_records=None, marker=None):
+            raise ValueError('boom')
+        self.assertRaises(ValueError, list, iter_pages(method))
+
+
+class TestHarvester(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.connection = FakeConnection()
+        self.connection.events = {
+            'db1': [event('db1', n) for n in range(5)],
+            'db2': [event('db2', 3)]}
+        self.connection.snapshots = {
+            'db1': [snapshot('db1', n) for n in range(4)],
+            'db2': [snapshot('db2', 0, 'creating')]}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_events_high_water_mark(self):
+        harvester = Harvester(self.connection, page_size=2)
+        events = harvester.harvest_events(['db1', 'db2'])
+        self.assertEqual(len(events), 6)
+        self.assertEqual(harvester.harvest_events(['db1', 'db2']), [])
+        self.connection.events['db1'].append(event('db1', 4, 'restart'))
+        self.connection.events['db1'].append(event('db1', 9))
+        del self.connection.calls[:]
+        events = harvester.harvest_events(['db1', 'db2'])
+        self.assertEqual([e.message for e in events],
+                         ['restart 4', 'backup 9'])
+        starts = sorted((call[1], call[2].minute)
+                        for call in self.connection.calls
+                        if call[3] is None)
+        self.assertEqual(starts, [('db1', 4), ('db2', 3)])
+
+    def test_all_sources(self):
+        harvester = Harvester(self.connection)
+        self.assertEqual(len(harvester.harvest_events()), 6)
+        self.assertEqual(harvester.harvest_events(), [])
+
+    def test_snapshots(self):
+        harvester = Harvester(self.connection, page_size=3)
+        snapshots = harvester.harvest_dbsnapshots()
+        self.assertEqual([s.id for s in snapshots],
+                         ['db1-snap-%d' % n for n in range(4)])
+        self.connection.snapshots['db2'][0].status = 'available'
+        del self.connection.snapshots['db1'][0]
+        snapshots = harvester.harvest_dbsnapshots(['db1', 'db2'])
+        self.assertEqual([s.id for s in snapshots], ['db2-snap-0'])
+        self.assertEqual(harvester.snapshots['db1'],
+                         ['db1-snap-%d' % n for n in range(1, 4)])
+
+    def test_errors(self):
+        harvester = Harvester(self.connection)
+        del self.connection.snapshots['db2']
+        snapshots = harvester.harvest_dbsnapshots(['db1', 'db2'])
+        self.assertEqual(len(snapshots), 4)
+        self.assertEqual(harvester.errors.keys(), [('snapshots', 'db2')])
+
+    def test_state_is_persisted(self):
+        path = os.path.join(self.tmpdir, 'state.json')
+        harvester = Harvester(self.connection, path)
+        harvester.harvest_events(['db1'])
+        harvester.harvest_dbsnapshots(['db1'])
+        harvester = Harvester(self.connection, path)
+        self.assertEqual(harvester.harvest_events(['db1']), [])
+        self.assertEqual(harvester.harvest_dbsnapshots(['db1']), [])
+
+
+class TestRDSEventPaging(AWSMockServiceTestCase):
+    connection_class = RDSConnection
+
+    def default_body(self):
+        return """
+        <DescribeEventsResponse>
+          <DescribeEventsResult>
+            <Marker>next-page</Marker>
+            <Events>
+              <Event>
+                <Message>Backing up DB instance</Message>
+                <SourceType>db-instance</SourceType>
+                <Date>2012-10-01T00:01:00.123Z</Date>
+                <SourceIdentifier>db1</SourceIdentifier>
+              </Event>
+            </Events>
+          </DescribeEventsResult>
+        </DescribeEventsResponse>
+        """
+
+    def test_marker_is_parsed(self):
+        self.set_http_response(status_code=200)
+        events = self.service_connection.get_all_events(max_records=20)
+        self.assertEqual(events.marker, 'next-page')
+        self.assertEqual(events[0].source_identifier, 'db1')
+
+    def test_harvester_factory(self):
+        harvester = self.service_connection.harvester(num_threads=2)
+        self.assertTrue(isinstance(harvester, Harvester))
+        self.assertEqual(harvester.num_threads, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import threading
+from StringIO import StringIO
+
+from tests.unit import unittest
+
+from mock import patch
+
+from boto.exception import SDBResponseError
+from boto.resultset import ResultSet
+from boto.sdb.bulk import BulkLoader, read_xml, read_jsonl
+from boto.sdb.domain import Domain
+from boto.sdb.item import Item
+
+
+OLD_DUMP = """<?xml version="1.0" encoding="UTF-8"?>
+<Domain id="test">
+\t<Item id="a">
+\t\t<attribute id="color">
+\t\t\t<value><![CDATA[ red]]></value>
+\t\t\t<value><![CDATA[ blue]]></value>
+\t\t</attribute>
+\t</Item>
+\t<Item id="b">
+\t\t<attribute id="size">
+\t\t\t<value><![CDATA[ 1]]></value>
+\t\t</attribute>
+\t</Item>
+</Domain>
+"""
+
+
+class FakeSDBConnection(object):
+
+    converter = None
+
+    def __init__(self, items=None, bad_items=(), unavailable=0):
+        self.items = items or {}
+        self.bad_items = set(bad_items)
+        self.unavailable = unavailable
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def batch_put_attributes(self, domain, items, replace=True):
+        self.lock.acquire()
+        try:
+            self.requests.append(sorted(items))
+            assert len(items) <= 25
+            if self.unavailable:
+                self.unavailable -= 1
+                raise SDBResponseError(503, 'Service Unavailable')
+            if self.bad_items.intersection(items):
+                raise SDBResponseError(400, 'Bad Request')
+            self.items.update(items)
+        finally:
+            self.lock.release()
+        return True
+
+    def select(self, domain, query, next_token=None, consistent_read=False):
+        rs = ResultSet()
+        for name in sorted(self.items):
+            item = Item(domain, name)
+            item.update(self.items[name])
+            rs.append(item)
+        rs.next_token = None
+        return rs
+
+
+class TestBulkLoader(unittest.TestCase):
+    def setUp(self):
+        self.connection = FakeSDBConnection()
+        self.domain = Domain(self.connection, 'test')
+
+    def items(self, n):
+        return [('item-%03d' % i, {'n': [str(i)]}) for i in range(n)]
+
+    def test_batches_of_25(self):
+        progress = []
+        loader = BulkLoader(self.domain, num_workers=3,
+                            progress=lambda *args: progress.append(args))
+        loader.load(self.items(60))
+        loader.close()
+        self.assertEqual(sorted(len(r) for r in self.connection.requests),
+                         [10, 25, 25])
+        self.assertEqual(len(self.connection.items), 60)
+        self.assertEqual(loader.loaded, 60)
+        self.assertEqual(progress[-1], (60, 0))
+
+    def test_progress_errors_do_not_stop_the_workers(self):
+        def progress(loaded, failed):
+            raise ValueError('broken callback')
+
+        loader = BulkLoader(self.domain, num_workers=1, progress=progress)
+        loader.load(self.items(200))
+        loader.close()
+        self.assertEqual(loader.loaded, 200)
+        self.assertEqual(len(self.connection.items), 200)
+
+    def test_duplicate_names_start_a_new_batch(self):
+        loader = BulkLoader(self.domain, num_workers=1)
+        loader.put('a', {'x': '1'})
+        loader.put('a', {'x': '2'})
+        loader.close()
+        self.assertEqual(self.connection.requests, [['a'], ['a']])
+        self.assertEqual(self.connection.items['a'], {'x': '2'})
+
+    @patch('time.sleep')
+    def test_server_errors_are_retried(self, sleep):
+        self.connection.unavailable = 2
+        loader = BulkLoader(self.domain, num_workers=1)
+        loader.load(self.items(5))
+        loader.close()
+        self.assertEqual(len(self.connection.requests), 3)
+        self.assertEqual(loader.loaded, 5)
+
+    @patch('time.sleep')
+    def test_gives_up_after_max_retries(self, sleep):
+        self.connection.unavailable = 10
+        loader = BulkLoader(self.domain, num_workers=1, max_retries=2)
+        loader.load(self.items(5))
+        loader.close()
+        self.assertEqual(len(self.connection.requests), 3)
+        self.assertEqual(loader.failed, 5)
+
+    def test_only_bad_items_fail(self):
+        self.connection.bad_items = set(['item-007'])
+        loader = BulkLoader(self.domain, num_workers=2)
+        loader.load(self.items(25))
+        loader.close()
+        self.assertEqual(loader.loaded, 24)
+        self.assertEqual(loader.failed, 1)
+        self.assertEqual([name for name, e in loader.errors], ['item-007'])
+        self.assertTrue(isinstance(loader.errors[0][1], SDBResponseError))
+        self.assertFalse('item-007' in self.connection.items)
+
+
+class TestDumpFormats(unittest.TestCase):
+    def test_read_old_xml_dump(self):
+        items = list(read_xml(StringIO(OLD_DUMP), chunk_size=16))
+        self.assertEqual(items, [('a', {'color': ['red', 'blue']}),
+                                 ('b', {'size': ['1']})])
+
+    def test_from_xml(self):
+        connection = FakeSDBConnection()
+        domain = Domain(connection, 'test')
+        loader = domain.from_xml(StringIO(OLD_DUMP))
+        self.assertEqual(loader.loaded, 2)
+        self.assertEqual(connection.items['a'], {'color': ['red', 'blue']})
+
+    def test_xml_round_trip(self):
+        attrs = {'text': [' padded ', 'a]]>b', u'caf\xe9'],
+                 'quote': '"<&>"'}
+        connection = FakeSDBConnection({'it"em': attrs})
+        domain = Domain(connection, 'test')
+        fp = domain.to_xml()
+        items = list(read_xml(fp))
+        self.assertEqual(len(items), 1)
+        name, loaded = items[0]
+        self.assertEqual(name, 'it"em')
+        self.assertEqual(sorted(loaded['text']),
+                         sorted([' padded ', 'a]]>b', u'caf\xe9']))
+        self.assertEqual(loaded['quote'], ['"<&>"'])
+
+    def test_jsonl_round_trip(self):
+        connection = FakeSDBConnection({'a': {'x': ['1', '2']},
+                                        'b': {'y': '3'}})
+        domain = Domain(connection, 'test')
+        fp = StringIO()
+        progress = []
+        self.assertEqual(domain.export(fp, format='jsonl',
+                                       progress=progress.append), 2)
+        self.assertEqual(progress, [2])
+        fp.seek(0)
+        self.assertEqual(list(read_jsonl(fp)),
+                         [('a', {'x': ['1', '2']}), ('b', {'y': ['3']})])
+        fp.seek(0)
+        target = FakeSDBConnection()
+        Domain(target, 'copy').load(fp, format='jsonl')
+        self.assertEqual(target.items, {'a': {'x': ['1', '2']},
+                                        'b': {'y': ['3']}})
+
+    def test_unknown_format(self):
+        domain = Domain(FakeSDBConnection(), 'test')
+        self.assertRaises(ValueError, domain.load, StringIO(''), 'csv')
+        self.assertRaises(ValueError, domain.export, StringIO(), 'csv')
+
+
+if __name__ == '__main__':
+    unittest.main()
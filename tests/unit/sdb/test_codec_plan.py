@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import datetime
+
+from tests.unit import unittest
+
+import boto
+from boto.sdb.db.model import Model
+from boto.sdb.db.property import StringProperty, IntegerProperty
+from boto.sdb.db.property import LongProperty, FloatProperty
+from boto.sdb.db.property import BooleanProperty, DateTimeProperty
+from boto.sdb.db.property import ListProperty, MapProperty
+from boto.sdb.db.property import ReferenceProperty
+from boto.sdb.db.manager.xmlmanager import XMLManager
+
+
+class Target(Model):
+    name = StringProperty()
+
+
+class Record(Model):
+    name = StringProperty()
+    count = IntegerProperty()
+    big = LongProperty()
+    score = FloatProperty()
+    flag = BooleanProperty()
+    when = DateTimeProperty()
+    tags = ListProperty(str)
+    nums = ListProperty(int)
+    targets = ListProperty(Target)
+    scores = MapProperty(float)
+    target = ReferenceProperty(Target)
+
+
+VALUES = {
+    'name': 'record',
+    'count': -42,
+    'big': 2 ** 40,
+    'score': -0.125,
+    'flag': True,
+    'when': datetime.datetime(2012, 10, 1, 12, 30, 5),
+    'tags': ['b', 'a'],
+    'nums': [3, 1, 2],
+    'targets': [Target('t1'), Target('t2')],
+    'scores': {'x y': 1.5, 'z': -2.0},
+    'target': Target('t3'),
+}
+
+
+class TestCodecPlan(unittest.TestCase):
+    def setUp(self):
+        self.converter = Record._manager.converter
+
+    def test_plan_is_compiled_by_the_metaclass(self):
+        plan = Record.__dict__['_codec_plan']
+        self.assertTrue(plan is not None)
+        self.assertTrue(plan is self.converter.get_plan(Record))
+
+    def test_encoders_match_encode_prop(self):
+        plan = self.converter.get_plan(Record)
+        for prop, encode in plan.encoders:
+            value = VALUES[prop.name]
+            self.assertEqual(encode(value),
+                             self.converter.encode_prop(prop, value))
+        self.assertEqual(len(plan.encoders), len(VALUES))
+
+    def test_decoders_match_decode_prop(self):
+        plan = self.converter.get_plan(Record)
+        attrs = {}
+        for prop, encode in plan.encoders:
+            attrs[prop.name] = encode(VALUES[prop.name])
+        decoded = plan.decode(attrs)
+        for prop in Record.properties(hidden=False):
+            expected = prop.make_value_from_datastore(
+                self.converter.decode_prop(prop, attrs[prop.name]))
+            self.assertEqual(decoded[prop.name], expected)
+        self.assertEqual(sorted(decoded['nums']), [1, 2, 3])
+        self.assertEqual(decoded['scores'], {'x y': 1.5, 'z': -2.0})
+        self.assertEqual([t.id for t in decoded['targets']], ['t1', 't2'])
+        self.assertEqual(decoded['target'], 't3')
+
+    def test_single_list_value(self):
+        prop = Record.find_property('nums')
+        encode = self.converter.compile_encoder(prop)
+        self.assertEqual(encode(5), self.converter.encode_prop(prop, 5))
+        decode = self.converter.compile_decoder(prop)
+        self.assertEqual(decode('000:2147483653'), [5])
+
+    def test_adding_a_property_resets_the_plan(self):
+        class Extended(Model):
+            name = StringProperty()
+
+        plan = self.converter.get_plan(Extended)
+        self.assertEqual(len(plan.encoders), 1)
+        extra = IntegerProperty()
+        extra.__property_config__(Extended, 'extra')
+        Extended.extra = extra
+        self.assertEqual(len(Extended.properties(hidden=False)), 2)
+        self.assertEqual(len(self.converter.get_plan(Extended).encoders), 2)
+
+    def test_properties_are_cached(self):
+        first = Record.properties(hidden=False)
+        first.pop()
+        self.assertEqual(len(Record.properties(hidden=False)), len(VALUES))
+
+
+class TestXMLManagerModel(unittest.TestCase):
+
+    def setUp(self):
+        boto.config.add_section('DB_XMLRecord')
+        boto.config.set('DB_XMLRecord', 'db_type', 'XML')
+
+    def tearDown(self):
+        boto.config.remove_section('DB_XMLRecord')
+
+    def test_model_without_plans(self):
+        class XMLRecord(Model):
+            name = StringProperty()
+
+        self.assertTrue(isinstance(XMLRecord._manager, XMLManager))
+        self.assertFalse(hasattr(XMLRecord._manager.converter, 'get_plan'))
+        self.assertEqual(XMLRecord._prop_names, ['name'])
+
+
+if __name__ == '__main__':
+    unittest.main()
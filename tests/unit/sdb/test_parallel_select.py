@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import re
+import threading
+
+from tests.unit import unittest
+import mock
+
+from boto.resultset import ResultSet
+from boto.sdb.domain import Domain
+from boto.sdb.queryresultset import shard_query, item_name_shards
+from boto.sdb.queryresultset import split_query
+from boto.sdb.queryresultset import default_boundaries
+
+
+class FakeSDBConnection(object):
+    """Answers select expressions restricted by item name ranges."""
+
+    page_size = 3
+
+    def __init__(self, names, fail_on=None):
+        self.names = sorted(names)
+        self.fail_on = fail_on
+        self.sort_key = None
+        self.queries = []
+        self.lock = threading.Lock()
+
+    def select(self, domain, query, next_token=None, consistent_read=False):
+        self.lock.acquire()
+        try:
+            self.queries.append(query)
+        finally:
+            self.lock.release()
+        if self.fail_on and self.fail_on in query:
+            raise ValueError('select failed')
+        lower = re.search(r"itemName\(\) >= '([^']*)'", query)
+        upper = re.search(r"itemName\(\) < '([^']*)'", query)
+        names = [n for n in self.names
+                 if (lower is None or n >= lower.group(1)) and
+                    (upper is None or n < upper.group(1))]
+        if self.sort_key is not None:
+            names.sort(key=self.sort_key)
+        start = int(next_token or 0)
+        rs = ResultSet()
+        rs.extend(names[start:start + self.page_size])
+        rs.next_token = None
+        if start + self.page_size < len(names):
+            rs.next_token = str(start + self.page_size)
+        return rs
+
+
+NAMES = ['%s%d' % (c, i) for c in 'adkqz' for i in range(5)] + ['0', 'M']
+
+
+class TestShardQuery(unittest.TestCase):
+    def test_no_where_clause(self):
+        self.assertEqual(shard_query('select * from `d`', "itemName() < 'm'"),
+                         "select * from `d` where itemName() < 'm'")
+
+    def test_where_clause(self):
+        self.assertEqual(
+            shard_query("select * from `d` where a = '1' or b = '2'",
+                        "itemName() < 'm'"),
+            "select * from `d` where (a = '1' or b = '2') and "
+            "itemName() < 'm'")
+
+    def test_order_by_and_limit(self):
+        self.assertEqual(
+            shard_query("select * from `d` where a > '1' order by a "
+                        "limit 10", "itemName() < 'm'"),
+            "select * from `d` where (a > '1') and itemName() < 'm' "
+            "order by a limit 10")
+        self.assertEqual(
+            shard_query("select * from `d` LIMIT 10", "itemName() < 'm'"),
+            "select * from `d` where itemName() < 'm' LIMIT 10")
+
+    def test_keywords_in_literals_are_ignored(self):
+        self.assertEqual(
+            shard_query("select * from `d` where `limit` = 'where order by'",
+                        "itemName() < 'm'"),
+            "select * from `d` where (`limit` = 'where order by') and "
+            "itemName() < 'm'")
+        self.assertEqual(
+            shard_query("select * from `where` where a = 'it''s limit' "
+                        "limit 5", "itemName() < 'm'"),
+            "select * from `where` where (a = 'it''s limit') and "
+            "itemName() < 'm' limit 5")
+
+    def test_unparseable_queries(self):
+        self.assertRaises(ValueError, split_query,
+                          "select * from `d` where a = 'unterminated")
+        self.assertRaises(ValueError, split_query,
+                          "select * from `d` limit 5 where a = '1'")
+
+    def test_item_name_shards(self):
+        self.assertEqual(item_name_shards(['g', "o'k"]),
+                         ["itemName() < 'g'",
+                          "itemName() >= 'g' and itemName() < 'o''k'",
+                          "itemName() >= 'o''k'"])
+        self.assertEqual(item_name_shards([]), [''])
+
+    def test_default_boundaries(self):
+        boundaries = default_boundaries(4)
+        self.assertEqual(len(boundaries), 3)
+        self.assertEqual(boundaries, sorted(boundaries))
+
+
+class TestParallelSelect(unittest.TestCase):
+    def setUp(self):
+        self.connection = FakeSDBConnection(NAMES)
+        self.domain = Domain(self.connection, 'test')
+
+    def test_unordered_returns_every_item(self):
+        rs = self.domain.parallel_select('select * from `test`',
+                                         num_threads=4)
+        self.assertEqual(sorted(rs), sorted(NAMES))
+
+    def test_ordered_by_shard(self):
+        rs = self.domain.parallel_select('select * from `test`',
+                                         boundaries=['b', 'l', 'r'],
+                                         num_threads=2, ordered=True)
+        self.assertEqual(list(rs), sorted(NAMES))
+
+    def test_merge_by_key(self):
+        shards = ["itemName() < 'k'", "itemName() >= 'k'"]
+        key = lambda name: name[1:] + name[0]
+        self.connection.sort_key = key
+        rs = self.domain.parallel_select('select * from `test`',
+                                         shards=shards, key=key)
+        self.assertEqual(list(rs), sorted(NAMES, key=key))
+
+    def test_max_items(self):
+        rs = self.domain.parallel_select('select * from `test`',
+                                         num_threads=3, max_items=7)
+        self.assertEqual(len(list(rs)), 7)
+
+    def test_unparseable_query_is_not_sharded(self):
+        self.domain.select = mock.Mock(return_value=iter(['a0']))
+        query = "select * from `test` where a = 'unterminated"
+        rs = self.domain.parallel_select(query, max_items=3)
+        self.assertEqual(list(rs), ['a0'])
+        self.domain.select.assert_called_with(query, max_items=3,
+                                              consistent_read=False)
+
+    def test_unparseable_query_is_sorted_by_key(self):
+        self.domain.select = mock.Mock(return_value=iter(['b', 'c', 'a']))
+        query = "select * from `test` where a = 'unterminated"
+        rs = self.domain.parallel_select(query, key=lambda name: name,
+                                         max_items=2)
+        self.assertEqual(list(rs), ['a', 'b'])
+
+    def test_empty_shards_are_rejected(self):
+        self.assertRaises(ValueError, self.domain.parallel_select,
+                          'select * from `test`', shards=[])
+
+    def test_shard_errors_are_raised(self):
+        self.connection.fail_on = "itemName() >= 'l'"
+        rs = self.domain.parallel_select('select * from `test`',
+                                         boundaries=['l'])
+        self.assertRaises(ValueError, list, rs)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import re
+
+from tests.unit import unittest
+
+from boto.sdb.db.model import Model
+from boto.sdb.db.property import StringProperty, ReferenceProperty
+from boto.sdb.db.session import Session, get_session
+
+
+class FakeItem(dict):
+    def __init__(self, name, attrs):
+        dict.__init__(self, attrs)
+        self.name = name
+
+
+class FakeDomain(object):
+    """Stores items in memory and counts the requests made."""
+
+    def __init__(self, name='test'):
+        self.name = name
+        self.items = {}
+        self.requests = []
+
+    def get_attributes(self, id, consistent_read=False):
+        self.requests.append(('get_attributes', id))
+        return FakeItem(id, self.items.get(id, {}))
+
+    def select(self, query, consistent_read=False, **kwargs):
+        self.requests.append(('select', query))
+        match = re.search(r'itemName\(\) in \((.*)\)', query)
+        if match:
+            names = re.findall(r"'([^']*)'", match.group(1))
+        else:
+            types = re.findall(r"`__type__` = '([^']*)'", query)
+            names = [n for n in sorted(self.items)
+                     if self.items[n]['__type__'] in types]
+        return [FakeItem(n, self.items[n]) for n in names if n in self.items]
+
+    def put_attributes(self, id, attrs, replace=True, expected_value=None):
+        self.requests.append(('put_attributes', id))
+        self.items.setdefault(id, {}).update(attrs)
+
+    def batch_put_attributes(self, items, replace=True):
+        self.requests.append(('batch_put_attributes', sorted(items)))
+        for id, attrs in items.items():
+            self.items.setdefault(id, {}).update(attrs)
+
+    def delete_attributes(self, id, attrs=None):
+        self.requests.append(('delete_attributes', id))
+        if attrs is None:
+            del self.items[id]
+        else:
+            for name in attrs:
+                self.items[id].pop(name, None)
+
+
+class Customer(Model):
+    name = StringProperty()
+
+
+class Order(Model):
+    status = StringProperty()
+    customer = ReferenceProperty(Customer, collection_name='orders')
+
+
+def item(cls, **attrs):
+    attrs.update({'__type__': cls.__name__, '__module__': cls.__module__,
+                  '__lineage__': cls.get_lineage()})
+    return attrs
+
+
+class TestSession(unittest.TestCase):
+    def setUp(self):
+        self.domain = FakeDomain()
+        Customer._manager._domain = self.domain
+        Order._manager._domain = self.domain
+        for i in range(3):
+            self.domain.items['c%d' % i] = item(Customer, name='customer %d' % i)
+        for i in range(6):
+            self.domain.items['o%d' % i] = item(Order, status='open',
+                                                customer='c%d' % (i % 3))
+
+    def tearDown(self):
+        Customer._manager._domain = None
+        Order._manager._domain = None
+
+    def requests(self, name):
+        return [r for r in self.domain.requests if r[0] == name]
+
+    def test_without_session_references_are_loaded_one_by_one(self):
+        names = [o.customer.name for o in Order.find()]
+        self.assertEqual(len(names), 6)
+        self.assertEqual(len(self.requests('get_attributes')), 6)
+
+    def test_references_are_prefetched(self):
+        with Session() as session:
+            self.assertTrue(get_session() is session)
+            orders = list(Order.find())
+            names = [o.customer.name for o in orders]
+        self.assertTrue(get_session() is None)
+        self.assertEqual(names, ['customer 0', 'customer 1', 'customer 2'] * 2)
+        self.assertEqual(self.requests('get_attributes'), [])
+        selects = self.requests('select')
+        self.assertEqual(len(selects), 2)
+        self.assertTrue('itemName() in (' in selects[1][1])
+        self.assertTrue(orders[0].customer is orders[3].customer)
+
+    def test_identity_map(self):
+        with Session() as session:
+            first = Customer.get_by_id('c1')
+            second = Customer.get_by_id('c1')
+            self.assertTrue(first is second)
+            self.assertEqual(len(self.requests('get_attributes')), 1)
+            self.assertEqual(session.hits, 1)
+            self.assertEqual(session.loads, 1)
+
+    def test_lazy_reference_loads_once(self):
+        with Session(prefetch_references=False):
+            orders = list(Order.find())
+            names = [o.customer.name for o in orders]
+        self.assertEqual(names[0], 'customer 0')
+        self.assertEqual(len(self.requests('get_attributes')), 3)
+
+    def test_writes_are_batched(self):
+        with Session():
+            for i in range(30):
+                Customer(name='new %d' % i).put()
+            self.assertEqual(self.requests('put_attributes'), [])
+        batches = self.requests('batch_put_attributes')
+        self.assertEqual([len(b[1]) for b in batches], [25, 5])
+        self.assertEqual(len(self.domain.items), 39)
+
+    def test_conditional_put_is_immediate(self):
+        with Session():
+            customer = Customer.get_by_id('c0')
+            customer.name = 'renamed'
+            customer.put(expected_value=['name', 'customer 0'])
+            self.assertEqual(self.requests('put_attributes'), [('put_attributes', 'c0')])
+        self.assertEqual(self.requests('batch_put_attributes'), [])
+
+    def test_no_flush_on_error(self):
+        try:
+            with Session():
+                Customer(name='lost').put()
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertEqual(self.requests('batch_put_attributes'), [])
+        self.assertTrue(get_session() is None)
+
+    def test_delete_discards_object(self):
+        with Session() as session:
+            customer = Customer.get_by_id('c2')
+            customer.put()
+            customer.delete()
+            self.assertEqual(session._dirty, [])
+        self.assertFalse('c2' in self.domain.items)
+        self.assertEqual(self.requests('batch_put_attributes'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
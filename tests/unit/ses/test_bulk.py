@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import threading
+
+from tests.unit import unittest
+
+from mock import patch
+
+from boto.ses import exceptions as ses_exceptions
+from boto.ses.bulk import BulkSender
+
+
+class FakeSESConnection(object):
+
+    def __init__(self, max_send_rate=1000, max_24h=10000, sent_24h=0):
+        self.max_send_rate = max_send_rate
+        self.max_24h = max_24h
+        self.sent_24h = sent_24h
+        self.quota_requests = 0
+        self.sent = []
+        self.throttle = 0
+        self.reject = set()
+        self.lock = threading.Lock()
+
+    def get_send_quota(self):
+        self.quota_requests += 1
+        return {'GetSendQuotaResponse': {'GetSendQuotaResult': {
+            'Max24HourSend': str(self.max_24h),
+            'MaxSendRate': str(self.max_send_rate),
+            'SentLast24Hours': str(self.sent_24h)}}}
+
+    def _send(self, kwargs):
+        self.lock.acquire()
+        try:
+            if self.throttle:
+                self.throttle -= 1
+                raise ses_exceptions.SESMaxSendingRateExceededError(
+                    400, 'Maximum sending rate exceeded.')
+            if kwargs.get('source') in self.reject:
+                raise ses_exceptions.SESAddressNotVerifiedError(
+                    400, 'Email address is not verified.')
+            self.sent.append(kwargs)
+            return {'MessageId': str(len(self.sent))}
+        finally:
+            self.lock.release()
+
+    def send_email(self, **kwargs):
+        return self._send(kwargs)
+
+    def send_raw_email(self, **kwargs):
+        return self._send(kwargs)
+
+
+class TestBulkSender(unittest.TestCase):
+
+    def test_sends_messages(self):
+        conn = FakeSESConnection()
+        sender = BulkSender(conn, num_workers=3)
+        futures = [sender.send_email('from@example.com', 'subject', 'body',
+                                     ['to%d@example.com' % i])
+                   for i in xrange(20)]
+        sender.close()
+        self.assertEqual(len(conn.sent), 20)
+        self.assertEqual(sender.sent, 20)
+        self.assertEqual(sender.failed, 0)
+        self.assertTrue(all(f.result(1)['MessageId'] for f in futures))
+        self.assertEqual(sender.max_send_rate, 1000)
+
+    def test_send_raw_email(self):
+        conn = FakeSESConnection()
+        sender = BulkSender(conn, num_workers=1)
+        future = sender.send_raw_email('raw', destinations=['a@example.com'])
+        sender.close()
+        self.assertEqual(future.result(1), {'MessageId': '1'})
+        self.assertEqual(conn.sent[0]['raw_message'], 'raw')
+
+    def test_paced_to_send_rate(self):
+        conn = FakeSESConnection(max_send_rate=10)
+        sender = BulkSender(conn, num_workers=1, rate_fraction=0.5)
+        self.assertEqual(sender._bucket.rate, 5)
+        self.assertEqual(sender._bucket.capacity, 5)
+        sender.close()
+
+    def test_daily_quota_fails_locally(self):
+        conn = FakeSESConnection(max_24h=10, sent_24h=7)
+        sender = BulkSender(conn, num_workers=1)
+        ok = sender.send_email('from@example.com', 's', 'b',
+                               ['a@example.com', 'b@example.com'])
+        over = sender.send_email('from@example.com', 's', 'b',
+                                 ['c@example.com', 'd@example.com'])
+        sender.close()
+        self.assertTrue(ok.result(1))
+        self.assertTrue(isinstance(over.exception(1),
+                                   ses_exceptions.SESDailyQuotaExceededError))
+        self.assertEqual(len(conn.sent), 1)
+        self.assertEqual(sender.remaining_24h, 1)
+        self.assertTrue('d@example.com' in sender.failures)
+
+    def test_failed_sends_give_back_their_quota(self):
+        conn = FakeSESConnection(max_24h=10, sent_24h=7)
+
+        def send_email(**kwargs):
+            raise ValueError('MessageRejected')
+
+        conn.send_email = send_email
+        sender = BulkSender(conn, num_workers=1)
+        future = sender.send_email('from@example.com', 's', 'b',
+                                   ['a@example.com', 'b@example.com'])
+        sender.close()
+        self.assertTrue(isinstance(future.exception(1), ValueError))
+        self.assertEqual(sender.remaining_24h, 3)
+
+    @patch('time.sleep')
+    def test_throttled_messages_are_retried(self, sleep):
+        conn = FakeSESConnection()
+        conn.throttle = 2
+        sender = BulkSender(conn, num_workers=1)
+        future = sender.send_email('from@example.com', 's', 'b',
+                                   'a@example.com')
+        sender.close()
+        self.assertTrue(future.result(1))
+        self.assertEqual(sender.retried, 2)
+
+    @patch('time.sleep')
+    def test_throttling_gives_up_after_max_retries(self, sleep):
+        conn = FakeSESConnection()
+        conn.throttle = 10
+        sender = BulkSender(conn, num_workers=1, max_retries=1)
+        future = sender.send_email('from@example.com', 's', 'b',
+                                   'a@example.com')
+        sender.close()
+        self.assertTrue(isinstance(
+            future.exception(1),
+            ses_exceptions.SESMaxSendingRateExceededError))
+        self.assertEqual(sender.failed, 1)
+
+    def test_errors_are_recorded_per_recipient(self):
+        conn = FakeSESConnection()
+        conn.reject.add('bad@example.com')
+        sender = BulkSender(conn, num_workers=2)
+        bad = sender.send_email('bad@example.com', 's', 'b',
+                                ['a@example.com'], cc_addresses=['b@example.com'])
+        good = sender.send_email('good@example.com', 's', 'b',
+                                 ['c@example.com'])
+        sender.close()
+        self.assertTrue(good.result(1))
+        self.assertRaises(ses_exceptions.SESAddressNotVerifiedError,
+                          bad.result, 1)
+        self.assertEqual(sorted(sender.failures),
+                         ['a@example.com', 'b@example.com'])
+
+    def test_quota_is_refreshed(self):
+        conn = FakeSESConnection(max_send_rate=5)
+        sender = BulkSender(conn, num_workers=1, quota_refresh_interval=0)
+        conn.max_send_rate = 50
+        sender.send_email('from@example.com', 's', 'b', 'a@example.com')
+        sender.close()
+        self.assertEqual(conn.quota_requests, 2)
+        self.assertEqual(sender.max_send_rate, 50)
+        self.assertEqual(sender._bucket.rate, 50)
+
+    def test_closed_sender_rejects_messages(self):
+        sender = BulkSender(FakeSESConnection(), num_workers=1)
+        sender.close()
+        self.assertRaises(ValueError, sender.send_email, 'a', 's', 'b', 'c')
+
+
+if __name__ == '__main__':
+    unittest.main()
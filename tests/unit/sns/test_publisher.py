@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import threading
+
+from tests.unit import unittest
+from tests.unit import AWSMockServiceTestCase
+
+from mock import patch
+
+from boto.compat import json
+from boto.exception import BotoServerError
+from boto.sns.connection import SNSConnection
+from boto.sns.publisher import Publisher, get_error_code
+
+
+TOPIC = 'arn:aws:sns:us-east-1:123456789012:topic'
+
+PUBLISH_RESPONSE = json.dumps({
+    'PublishResponse': {
+        'PublishResult': {'MessageId': 'message-id'},
+        'ResponseMetadata': {'RequestId': 'request-id'}}})
+
+THROTTLED = json.dumps({'Error': {'Code': 'Throttling',
+                                  'Message': 'Rate exceeded'}})
+
+INVALID = json.dumps({'Error': {'Code': 'InvalidParameter',
+                                'Message': 'Invalid parameter'}})
+
+
+class TestPublishVerb(AWSMockServiceTestCase):
+    connection_class = SNSConnection
+
+    def default_body(self):
+        return PUBLISH_RESPONSE
+
+    def test_small_message_uses_get(self):
+        self.set_http_response(status_code=200)
+        result = self.service_connection.publish(TOPIC, 'hello')
+        self.assertEqual(self.actual_request.method, 'GET')
+        self.assertEqual(
+            result['PublishResponse']['PublishResult']['MessageId'],
+            'message-id')
+
+    def test_large_message_uses_post(self):
+        self.set_http_response(status_code=200)
+        self.service_connection.publish(TOPIC, 'x' * 2000, 'subject')
+        self.assertEqual(self.actual_request.method, 'POST')
+        self.assertEqual(self.actual_request.params['Message'], 'x' * 2000)
+
+    def test_payload_size_counts_utf8_bytes(self):
+        self.set_http_response(status_code=200)
+        # 600 characters but 1200 bytes once UTF-8 encoded.
+        self.service_connection.publish(TOPIC, u'\xe9' * 600)
+        self.assertEqual(self.actual_request.method, 'POST')
+
+
+class FakeSNSConnection(object):
+    host = 'sns.us-east-1.amazonaws.com'
+
+    def __init__(self, errors=None):
+        # errors maps a message to the bodies of the errors raised on
+        # its successive attempts.
+        self.errors = errors or {}
+        self.published = []
+        self.lock = threading.Lock()
+
+    def publish(self, topic, message, subject=None):
+        self.lock.acquire()
+        try:
+            errors = self.errors.get(message)
+            if errors:
+                status, body = errors.pop(0)
+                raise BotoServerError(status, 'Error', body)
+            self.published.append((topic, message, subject))
+        finally:
+            self.lock.release()
+        return json.loads(PUBLISH_RESPONSE)
+
+
+class TestPublisher(unittest.TestCase):
+    def test_publishes_concurrently(self):
+        connection = FakeSNSConnection()
+        publisher = Publisher(connection, max_in_flight=4)
+        futures = [publisher.publish(TOPIC, 'm%d' % i, 'subject')
+                   for i in range(50)]
+        publisher.close()
+        self.assertEqual(len(connection.published), 50)
+        self.assertEqual(futures[0].result()['PublishResponse']
+                         ['PublishResult']['MessageId'], 'message-id')
+        self.assertEqual(publisher.stats[TOPIC].published, 50)
+
+    @patch('time.sleep')
+    def test_throttled_publishes_are_retried(self, sleep):
+        connection = FakeSNSConnection({'m': [(400, THROTTLED),
+                                              (503, '')]})
+        publisher = Publisher(connection, max_in_flight=1)
+        future = publisher.publish(TOPIC, 'm')
+        publisher.close()
+        self.assertEqual(future.exception(), None)
+        stats = publisher.stats[TOPIC]
+        self.assertEqual(stats.retried, 2)
+        self.assertEqual(stats.published, 1)
+        self.assertEqual(stats.errors['Throttling'], 1)
+        self.assertEqual(sleep.call_count, 2)
+        for call in sleep.call_args_list:
+            self.assertTrue(0 <= call[0][0] <= 0.1)
+
+    @patch('time.sleep')
+    def test_gives_up_after_max_retries(self, sleep):
+        connection = FakeSNSConnection({'m': [(400, THROTTLED)] * 5})
+        publisher = Publisher(connection, max_in_flight=1, max_retries=2)
+        future = publisher.publish(TOPIC, 'm')
+        publisher.close()
+        self.assertRaises(BotoServerError, future.result)
+        stats = publisher.stats[TOPIC]
+        self.assertEqual((stats.retried, stats.failed), (2, 1))
+        self.assertEqual(stats.errors, {'Throttling': 3})
+
+    def test_client_errors_are_not_retried(self):
+        connection = FakeSNSConnection({'m': [(400, INVALID)]})
+        publisher = Publisher(connection, max_in_flight=1)
+        future = publisher.publish(TOPIC, 'm')
+        publisher.close()
+        self.assertEqual(get_error_code(future.exception()),
+                         'InvalidParameter')
+        self.assertEqual(publisher.stats[TOPIC].failed, 1)
+
+    def test_publish_after_close(self):
+        publisher = Publisher(FakeSNSConnection())
+        publisher.close()
+        self.assertRaises(ValueError, publisher.publish, TOPIC, 'm')
+
+
+if __name__ == '__main__':
+    unittest.main()
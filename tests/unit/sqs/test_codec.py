@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import base64
+
+from tests.unit import unittest
+
+from mock import Mock
+
+from boto.exception import SQSDecodeError
+from boto.sqs.batchresults import BatchResults, ResultEntry
+from boto.sqs.codec import MessageCodec, CodecMessage, codec_message_class
+from boto.sqs.message import Message
+from boto.sqs.queue import Queue
+
+
+class FakeKey(object):
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+
+    def set_contents_from_string(self, data):
+        self.bucket.objects[self.name] = data
+
+    def get_contents_as_string(self):
+        return self.bucket.objects[self.name]
+
+
+class FakeBucket(object):
+    def __init__(self, name='payloads'):
+        self.name = name
+        self.objects = {}
+
+    def new_key(self, name):
+        return FakeKey(self, name)
+
+    def delete_key(self, name):
+        del self.objects[name]
+
+
+class TestMessageCodec(unittest.TestCase):
+    def test_small_body_is_plain_base64(self):
+        codec = MessageCodec()
+        self.assertEqual(codec.encode('hello'), base64.b64encode('hello'))
+        self.assertEqual(codec.decode(base64.b64encode('hello')), 'hello')
+
+    def test_compression(self):
+        codec = MessageCodec()
+        data = 'abcdefgh' * 1000
+        body = codec.encode(data)
+        self.assertTrue(body.startswith('boto/1;z=zlib;'))
+        self.assertTrue(len(body) < 200)
+        self.assertEqual(codec.decode(body), data)
+
+    def test_bz2_compression(self):
+        codec = MessageCodec(compression='bz2')
+        data = 'abcdefgh' * 1000
+        body = codec.encode(data)
+        self.assertTrue(body.startswith('boto/1;z=bz2;'))
+        self.assertEqual(MessageCodec().decode(body), data)
+
+    def test_incompressible_body_is_not_compressed(self):
+        codec = MessageCodec(min_compress_size=0)
+        self.assertEqual(codec.encode('ab'), base64.b64encode('ab'))
+
+    def test_no_compression(self):
+        codec = MessageCodec(compression=None)
+        data = 'a' * 1000
+        self.assertEqual(codec.encode(data), base64.b64encode(data))
+
+    def test_unknown_compression(self):
+        self.assertRaises(ValueError, MessageCodec, compression='nope')
+        self.assertRaises(SQSDecodeError, MessageCodec().decode,
+                          'boto/1;z=nope;')
+
+    def test_offload_to_s3(self):
+        bucket = FakeBucket()
+        codec = MessageCodec(compression=None, s3_bucket=bucket,
+                             offload_threshold=100)
+        data = 'x' * 1000
+        body = codec.encode(data)
+        self.assertTrue(body.startswith('boto/1;s3=payloads/sqs-payloads/'))
+        self.assertEqual(bucket.objects.values(), [data])
+        self.assertEqual(codec.decode(body), data)
+        bucket_name, key_name = codec.get_payload_key(body)
+        self.assertEqual(bucket_name, 'payloads')
+        codec.delete_payload(body)
+        self.assertEqual(bucket.objects, {})
+
+    def test_offload_compressed(self):
+        bucket = FakeBucket()
+        codec = MessageCodec(s3_bucket=bucket, offload_threshold=10)
+        data = 'abcdefgh' * 1000
+        body = codec.encode(data)
+        self.assertTrue(body.startswith('boto/1;z=zlib;s3=payloads/'))
+        self.assertTrue(len(bucket.objects.values()[0]) < len(data))
+        self.assertEqual(codec.decode(body), data)
+
+    def test_offload_without_bucket_fails_to_decode(self):
+        codec = MessageCodec()
+        self.assertRaises(SQSDecodeError, codec.decode,
+                          'boto/1;s3=payloads/key;')
+
+
+class TestCodecMessage(unittest.TestCase):
+    def setUp(self):
+        self.bucket = FakeBucket()
+        self.codec = MessageCodec(s3_bucket=self.bucket,
+                                  offload_threshold=100)
+        self.message_class = codec_message_class(self.codec)
+
+    def receive(self, body):
+        message = self.message_class()
+        message.endElement('Body', body, None)
+        message.endElement('MessageId', 'id-1', None)
+        message.endElement('ReceiptHandle', 'handle-1', None)
+        return message
+
+    def test_reads_plain_messages(self):
+        body = Message(body='hello').get_body_encoded()
+        self.assertEqual(self.receive(body).get_body(), 'hello')
+
+    def test_round_trip_with_offload(self):
+        data = ''.join(chr(i % 256) for i in range(5000))
+        body = self.message_class(body=data).get_body_encoded()
+        self.assertEqual(len(self.bucket.objects), 1)
+        self.assertEqual(self.receive(body).get_body(), data)
+
+    def test_len_does_not_offload(self):
+        message = self.message_class(body='x' * 5000)
+        self.assertTrue(len(message) > 0)
+        self.assertEqual(self.bucket.objects, {})
+
+    def test_delete_removes_payload(self):
+        body = self.message_class(body='x' * 5000).get_body_encoded()
+        message = self.receive(body)
+        message.queue = Mock()
+        message.queue.delete_message.return_value = True
+        message.delete()
+        self.assertEqual(self.bucket.objects, {})
+
+    def test_delete_message_batch_removes_payload(self):
+        body = self.message_class(body='x' * 5000).get_body_encoded()
+        message = self.receive(body)
+        rs = BatchResults(None)
+        entry = ResultEntry()
+        entry['id'] = 'id-1'
+        rs.results.append(entry)
+        connection = Mock()
+        connection.delete_message_batch.return_value = rs
+        queue = Queue(connection, message_class=self.message_class)
+        queue.delete_message_batch([message])
+        self.assertEqual(self.bucket.objects, {})
+
+    def test_serializer_hooks(self):
+        class UpperMessage(CodecMessage):
+            def serialize(self, value):
+                return value.upper()
+
+        body = UpperMessage(body='hello').get_body_encoded()
+        self.assertEqual(CodecMessage().decode(body), 'HELLO')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import threading
+import time
+
+from tests.unit import unittest
+
+from boto.sqs.batchresults import BatchResults, ResultEntry
+from boto.sqs.consumer import Consumer, batch_chunks
+from boto.sqs.message import Message
+
+
+def make_message(n):
+    message = Message(body='body-%d' % n)
+    message.id = 'id-%d' % n
+    message.receipt_handle = 'handle-%d' % n
+    return message
+
+
+def batch_results(messages):
+    rs = BatchResults(None)
+    for message in messages:
+        entry = ResultEntry()
+        entry['id'] = message.id
+        rs.results.append(entry)
+    return rs
+
+
+class FakeQueue(object):
+    id = 'https://queue.amazonaws.com/123456789012/testqueue'
+
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.deleted = []
+        self.visibility_changes = []
+        self.lock = threading.Lock()
+
+    def get_timeout(self):
+        return 30
+
+    def get_messages(self, num_messages=1, visibility_timeout=None,
+                     attributes=None, wait_time_seconds=None):
+        self.lock.acquire()
+        try:
+            batch = self.messages[:num_messages]
+            del self.messages[:num_messages]
+        finally:
+            self.lock.release()
+        if not batch:
+            time.sleep(0.01)
+        return batch
+
+    def delete_message_batch(self, messages):
+        assert len(messages) <= 10
+        self.lock.acquire()
+        try:
+            self.deleted.extend(messages)
+        finally:
+            self.lock.release()
+        return batch_results(messages)
+
+    def change_message_visibility_batch(self, messages):
+        assert len(messages) <= 10
+        self.visibility_changes.append(messages)
+        return batch_results([m for m, _ in messages])
+
+
+class TestBatchChunks(unittest.TestCase):
+    def test_chunks_of_ten(self):
+        messages = [make_message(i) for i in range(25)]
+        chunks = batch_chunks(messages)
+        self.assertEqual([len(c) for c in chunks], [10, 10, 5])
+
+    def test_duplicate_ids_are_split(self):
+        first = make_message(1)
+        again = make_message(1)
+        chunks = batch_chunks([first, again, make_message(2)])
+        self.assertEqual(len(chunks), 2)
+        for chunk in chunks:
+            ids = [m.id for m in chunk]
+            self.assertEqual(len(ids), len(set(ids)))
+
+
+class TestConsumer(unittest.TestCase):
+    def wait_for(self, condition, timeout=5):
+        deadline = time.time() + timeout
+        while not condition() and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_handles_and_deletes_messages(self):
+        queue = FakeQueue([make_message(i) for i in range(35)])
+        handled = []
+        consumer = Consumer(queue, handled.append, num_workers=4,
+                            wait_time_seconds=0, flush_interval=0.05)
+        consumer.start()
+        self.wait_for(lambda: len(queue.deleted) == 35)
+        consumer.stop()
+        self.assertEqual(len(handled), 35)
+        self.assertEqual(sorted(m.id for m in queue.deleted),
+                         sorted('id-%d' % i for i in range(35)))
+        self.assertEqual(consumer.received, 35)
+        self.assertEqual(consumer.processed, 35)
+        self.assertEqual(consumer.deleted, 35)
+        self.assertEqual(consumer.visibility_timeout, 30)
+        self.assertEqual(consumer._held, {})
+
+    def test_failed_messages_are_not_deleted(self):
+        queue = FakeQueue([make_message(i) for i in range(4)])
+
+        def handler(message):
+            if message.id == 'id-2':
+                raise ValueError('bad message')
+
+        consumer = Consumer(queue, handler, num_workers=2,
+                            wait_time_seconds=0, flush_interval=0.05)
+        consumer.start()
+        self.wait_for(lambda: consumer.processed + consumer.failed == 4)
+        consumer.stop()
+        self.assertEqual(consumer.failed, 1)
+        self.assertEqual(sorted(m.id for m in queue.deleted),
+                         ['id-0', 'id-1', 'id-3'])
+
+    def test_stop_flushes_pending_deletes(self):
+        queue = FakeQueue([make_message(i) for i in range(3)])
+        consumer = Consumer(queue, lambda m: None, num_workers=1,
+                            wait_time_seconds=0, flush_interval=60)
+        consumer.start()
+        self.wait_for(lambda: consumer.processed == 3)
+        consumer.stop()
+        self.assertEqual(len(queue.deleted), 3)
+
+    def test_stop_from_another_thread(self):
+        queue = FakeQueue([make_message(i) for i in range(3)])
+        consumer = Consumer(queue, lambda m: None, num_workers=2,
+                            wait_time_seconds=0, flush_interval=0.02)
+        errors = []
+
+        def run():
+            try:
+                consumer.run()
+            except Exception, e:
+                errors.append(e)
+
+        runner = threading.Thread(target=run)
+        runner.start()
+        self.wait_for(lambda: consumer.processed == 3)
+        stoppers = [threading.Thread(target=consumer.stop)
+                    for _ in range(3)]
+        for thread in stoppers:
+            thread.start()
+        for thread in stoppers:
+            thread.join(5)
+        runner.join(5)
+        self.assertFalse(runner.is_alive())
+        self.assertEqual(errors, [])
+        self.assertEqual(consumer._batcher, None)
+        self.assertEqual(len(queue.deleted), 3)
+
+    def test_failed_deletes_are_released(self):
+        queue = FakeQueue([make_message(i) for i in range(3)])
+
+        def delete_message_batch(messages):
+            raise ValueError('InternalError')
+
+        queue.delete_message_batch = delete_message_batch
+        consumer = Consumer(queue, lambda m: None, num_receivers=1,
+                            num_workers=1, wait_time_seconds=0,
+                            visibility_timeout=0.1, flush_interval=0.02)
+        consumer.start()
+        self.wait_for(lambda: consumer.processed == 3)
+        time.sleep(0.2)
+        consumer.stop()
+        self.assertEqual(consumer.deleted, 0)
+        self.assertEqual(consumer._held, {})
+        self.assertEqual(queue.visibility_changes, [])
+
+    def test_heartbeat_extends_slow_messages(self):
+        queue = FakeQueue([make_message(1)])
+        release = threading.Event()
+        consumer = Consumer(queue, lambda m: release.wait(5),
+                            num_receivers=1, num_workers=1,
+                            wait_time_seconds=0, visibility_timeout=0.1,
+                            flush_interval=0.02)
+        consumer.start()
+        self.wait_for(lambda: consumer.extended > 0)
+        release.set()
+        consumer.stop()
+        self.assertTrue(consumer.extended > 0)
+        entries = queue.visibility_changes[0]
+        self.assertEqual(entries[0][0].id, 'id-1')
+        self.assertEqual(entries[0][1], 0.1)
+        self.assertEqual(len(queue.deleted), 1)
+
+    def test_no_heartbeat(self):
+        queue = FakeQueue([make_message(1)])
+        release = threading.Event()
+        consumer = Consumer(queue, lambda m: release.wait(5),
+                            num_receivers=1, num_workers=1,
+                            wait_time_seconds=0, visibility_timeout=0.1,
+                            heartbeat=False, flush_interval=0.02)
+        consumer.start()
+        time.sleep(0.2)
+        release.set()
+        consumer.stop()
+        self.assertEqual(queue.visibility_changes, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import threading
+
+from tests.unit import unittest
+import mock
+
+from boto.exception import SQSError
+from boto.sqs.batchresults import BatchResults, ResultEntry
+from boto.sqs.message import RawMessage
+from boto.sqs.producer import Producer
+
+
+def entry(**kwargs):
+    e = ResultEntry()
+    e.update(kwargs)
+    return e
+
+
+class FakeQueue(object):
+    id = 'https://queue.amazonaws.com/123456789012/testqueue'
+
+    def __init__(self, fail=None):
+        # fail maps a body to a list of (sender_fault, code) errors
+        # returned on successive attempts.
+        self.fail = fail or {}
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def write_batch(self, messages):
+        self.lock.acquire()
+        try:
+            self.requests.append(list(messages))
+        finally:
+            self.lock.release()
+        assert len(messages) <= 10
+        assert sum(len(m[1].encode('utf-8')) for m in messages) <= 64 * 1024
+        rs = BatchResults(None)
+        for id, body, delay in messages:
+            errors = self.fail.get(body)
+            if errors:
+                sender_fault, code = errors.pop(0)
+                rs.errors.append(entry(id=id, sender_fault=sender_fault,
+                                       error_code=code,
+                                       error_message='failed'))
+            else:
+                rs.results.append(entry(id=id, message_id='mid-' + body,
+                                        message_md5='md5'))
+        return rs
+
+    def sent_bodies(self):
+        return [m[1] for request in self.requests for m in request]
+
+
+class TestProducer(unittest.TestCase):
+    def test_messages_are_batched(self):
+        queue = FakeQueue()
+        producer = Producer(queue, linger=10)
+        futures = [producer.write(RawMessage(body='m%d' % i))
+                   for i in range(25)]
+        producer.close()
+        self.assertEqual([len(r) for r in queue.requests], [10, 10, 5])
+        for i, future in enumerate(futures):
+            message = future.result()
+            self.assertEqual(message.id, 'mid-m%d' % i)
+            self.assertEqual(message.md5, 'md5')
+        self.assertEqual(producer.sent, 25)
+        self.assertEqual(producer.batches, 3)
+
+    def test_batches_limited_by_size(self):
+        queue = FakeQueue()
+        producer = Producer(queue, linger=10)
+        body = 'x' * (30 * 1024)
+        for i in range(3):
+            producer.write(RawMessage(body=body))
+        producer.close()
+        self.assertEqual([len(r) for r in queue.requests], [2, 1])
+
+    def test_batches_limited_by_encoded_size(self):
+        queue = FakeQueue()
+        producer = Producer(queue, linger=10)
+        body = u'\xe9' * (20 * 1024)
+        for i in range(3):
+            producer.write(RawMessage(body=body))
+        producer.close()
+        self.assertEqual([len(r) for r in queue.requests], [1, 1, 1])
+
+    def test_linger_sends_partial_batch(self):
+        queue = FakeQueue()
+        producer = Producer(queue, linger=0.01)
+        future = producer.write(RawMessage(body='hello'), delay_seconds=5)
+        self.assertEqual(future.result(5).id, 'mid-hello')
+        self.assertEqual(queue.requests, [[('0', 'hello', 5)]])
+        producer.close()
+
+    def test_only_failed_entries_are_retried(self):
+        queue = FakeQueue(fail={'b': [('false', 'InternalError')]})
+        producer = Producer(queue, linger=10)
+        futures = [producer.write(RawMessage(body=b)) for b in 'abc']
+        producer.flush()
+        self.assertEqual(len(queue.requests), 2)
+        self.assertEqual(queue.requests[1], [('0', 'b', 0)])
+        self.assertEqual([f.result().id for f in futures],
+                         ['mid-a', 'mid-b', 'mid-c'])
+        self.assertEqual(producer.retried, 1)
+        producer.close()
+
+    def test_sender_fault_is_not_retried(self):
+        queue = FakeQueue(fail={'b': [('true', 'InvalidMessageContents')]})
+        producer = Producer(queue, linger=10)
+        future = producer.write(RawMessage(body='b'))
+        producer.close()
+        self.assertEqual(len(queue.requests), 1)
+        error = future.exception()
+        self.assertTrue(isinstance(error, SQSError))
+        self.assertEqual(error.error_code, 'InvalidMessageContents')
+        self.assertRaises(SQSError, future.result)
+        self.assertEqual(producer.failed, 1)
+
+    def test_gives_up_after_max_retries(self):
+        queue = FakeQueue(fail={'b': [('false', 'InternalError')] * 5})
+        producer = Producer(queue, linger=10, max_retries=2)
+        future = producer.write(RawMessage(body='b'))
+        producer.close()
+        self.assertEqual(len(queue.requests), 3)
+        self.assertEqual(future.exception().status, 500)
+
+    def test_retries_back_off(self):
+        queue = FakeQueue(fail={'b': [('false', 'InternalError')] * 3})
+        producer = Producer(queue, linger=10, max_retries=3)
+        sleep = mock.Mock()
+        with mock.patch('time.sleep', sleep):
+            future = producer.write(RawMessage(body='b'))
+            producer.close()
+        self.assertEqual(future.result().id, 'mid-b')
+        self.assertEqual([c[0][0] for c in sleep.call_args_list],
+                         [0.2, 0.4, 0.8])
+
+    def test_request_errors_are_retried(self):
+        queue = FakeQueue()
+        calls = []
+        write_batch = queue.write_batch
+
+        def flaky_write_batch(messages):
+            calls.append(messages)
+            if len(calls) == 1:
+                raise SQSError(503, 'Service Unavailable')
+            return write_batch(messages)
+
+        queue.write_batch = flaky_write_batch
+        producer = Producer(queue, linger=10)
+        futures = [producer.write(RawMessage(body=b)) for b in 'ab']
+        producer.close()
+        self.assertEqual(len(calls), 2)
+        self.assertEqual([f.result().id for f in futures], ['mid-a', 'mid-b'])
+
+    def test_write_after_close(self):
+        producer = Producer(FakeQueue())
+        producer.close()
+        self.assertRaises(ValueError, producer.write, RawMessage(body='a'))
+
+
+if __name__ == '__main__':
+    unittest.main()
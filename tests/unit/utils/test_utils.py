@@ -23,6 +23,9 @@ import unittest
 import hashlib
 import hmac
 
+import mock
+
+from boto.utils import Future
 from boto.utils import Password
 from boto.utils import pythonize_name
 
@@ -105,5 +108,31 @@ class TestPythonizeName(unittest.TestCase):
         self.assertEqual(pythonize_name('HTTPStatus200Ok'), 'http_status_200_ok')
 
 
+class TestFuture(unittest.TestCase):
+    def test_result(self):
+        future = Future()
+        future.set_result(42)
+        self.assertTrue(future.done())
+        self.assertEqual(future.result(0), 42)
+        self.assertEqual(future.exception(0), None)
+
+    def test_exception(self):
+        future = Future()
+        error = ValueError('failed')
+        future.set_exception(error)
+        self.assertEqual(future.exception(0), error)
+        self.assertRaises(ValueError, future.result, 0)
+
+    def test_timeout(self):
+        self.assertRaises(RuntimeError, Future().result, 0.01)
+
+    def test_wait_returning_none(self):
+        # Event.wait returns None before Python 2.7.
+        future = Future()
+        future.set_result(42)
+        with mock.patch.object(future._event, 'wait', return_value=None):
+            self.assertEqual(future.result(1), 42)
+
+
 if __name__ == '__main__':
     unittest.main()